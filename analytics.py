@@ -0,0 +1,190 @@
+"""Data behind the report page, from SQLite or from DuckDB.
+
+SqliteReports builds the report frames from the Database getters and
+pandas, as the page always has. DuckDBReports computes the same frames
+in an in-process DuckDB:
+- the monthly aggregations,
+- the month x category/tag pivots,
+- the explosion of comma-joined tags.
+
+DuckDB reads either the Parquet snapshot (refreshed incrementally when
+it is behind) or the SQLite file itself through DuckDB's sqlite extension.
+
+Pick the backend with EXPENSE_ANALYTICS=sqlite (default), duckdb, or
+duckdb-sqlite.
+"""
+import os
+import threading
+
+import pandas as pd
+
+import snapshot
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+BACKENDS = ('sqlite', 'duckdb', 'duckdb-sqlite')
+
+
+def _month_grid(frame, start_date, end_date):
+    # Every month in range, including those with no spending.
+    return frame.reindex(pd.date_range(start=start_date, end=end_date, freq='MS')).fillna(0)
+
+
+class SqliteReports:
+    name = 'sqlite'
+
+    def __init__(self, db):
+        self.db = db
+
+    def expenses_by_month(self, months):
+        """DataFrame of Month, Expenses for the last `months` months."""
+        df = pd.DataFrame(self.db.get_expenses_by_month(months), columns=['Month', 'Expenses'])
+        df['Month'] = pd.to_datetime(df['Month'])
+        return df.sort_values('Month').tail(months).reset_index(drop=True)
+
+    def expenses_by_category(self, start_date, end_date):
+        """Months x categories of summed amounts, zero-filled."""
+        df = pd.DataFrame(self.db.get_expenses_by_category_and_month(start_date, end_date),
+                          columns=['Month', 'Category', 'Expenses'])
+        df['Month'] = pd.to_datetime(df['Month'])
+        return _month_grid(df.pivot(index='Month', columns='Category', values='Expenses'), start_date, end_date)
+
+    def expenses_by_tag(self, start_date, end_date):
+        """Months x tags of summed amounts, zero-filled."""
+        df = pd.DataFrame(self.db.get_expenses_by_tag_and_month(start_date, end_date),
+                          columns=['Month', 'Tags', 'Amount'])
+        df['Month'] = pd.to_datetime(df['Month'])
+        return _month_grid(df.pivot(index='Month', columns='Tags', values='Amount'), start_date, end_date)
+
+
+class DuckDBReports:
+    name = 'duckdb'
+
+    def __init__(self, db, source='snapshot', directory=None):
+        if duckdb is None:
+            raise ImportError("The DuckDB backend needs duckdb (pip install duckdb)")
+        self.db = db
+        self.source = source
+        self.directory = directory or os.path.join(os.path.dirname(os.path.abspath(db.pool.db_name)),
+                                                   snapshot.DEFAULT_DIRECTORY)
+        self.connection = duckdb.connect()
+        self._refresh_lock = threading.Lock()
+        self._checked_generation = None
+        if source == 'sqlite':
+            self.connection.execute(f"ATTACH '{os.path.abspath(db.pool.db_name)}' AS expenses (TYPE sqlite, READ_ONLY)")
+            relation = 'expenses.transactions'
+        else:
+            self.refresh()
+            files = os.path.join(self.directory, 'transactions', '**', '*.parquet')
+            relation = f"read_parquet('{files}', hive_partitioning = true, union_by_name = true)"
+        self.connection.execute(f'''
+            CREATE VIEW transactions AS
+            SELECT id, CAST(date AS DATE) AS date, category, type, tag, amount FROM {relation}
+        ''')
+
+    def refresh(self):
+        """Bring the Parquet snapshot up to date if transactions changed."""
+        if self.source == 'sqlite':
+            return
+        with self._refresh_lock:
+            # Like the query cache, only re-check after a commit.
+            generation = self.db.pool.generation
+            if generation != self._checked_generation and not snapshot.is_current(self.db, self.directory):
+                snapshot.write_snapshot(self.db, self.directory)
+            self._checked_generation = generation
+
+    def _query(self, query, params=()):
+        self.refresh()
+        # A cursor per call, since Streamlit runs sessions on several threads.
+        return self.connection.cursor().execute(query, list(params)).df()
+
+    def _pivot(self, totals, start_date, end_date, column):
+        # totals selects (Month, {column}, value) rows between :start and
+        # :end; months without data get zeros for every column, like the
+        # pandas reindex/fillna. PIVOT with columns found at run time cannot
+        # take bound parameters, so the dates are inlined as ISO literals.
+        months = pd.date_range(start=start_date, end=end_date, freq='MS')
+        if months.empty:
+            return pd.DataFrame(index=months)
+        bounds = {name: f"DATE '{pd.Timestamp(value).date().isoformat()}'"
+                  for name, value in (('start', start_date), ('end', end_date),
+                                      ('first', months[0]), ('last', months[-1]))}
+        frame = self._query(f'''
+            WITH totals AS ({totals.format(**bounds)}),
+            grid AS (
+                SELECT months.Month, names.{column}
+                FROM (SELECT generate_series AS Month
+                      FROM generate_series(CAST({bounds['first']} AS TIMESTAMP),
+                                           CAST({bounds['last']} AS TIMESTAMP), INTERVAL 1 MONTH)) months
+                CROSS JOIN (SELECT DISTINCT {column} FROM totals) names
+            )
+            PIVOT (
+                SELECT grid.Month, grid.{column}, COALESCE(totals.value, 0) AS value
+                FROM grid LEFT JOIN totals USING (Month, {column})
+            ) ON {column} USING SUM(value) GROUP BY Month ORDER BY Month
+        ''')
+        if frame.empty:
+            return pd.DataFrame(index=months)
+        frame = frame.set_index('Month').set_axis(months)
+        frame.columns.name = None
+        return frame[sorted(frame.columns)].astype(float)
+
+    def expenses_by_month(self, months):
+        df = self._query('''
+            SELECT date_trunc('month', date) AS Month, SUM(amount) AS Expenses
+            FROM transactions
+            WHERE date >= date_trunc('month', current_date) - to_months(CAST(? AS INTEGER))
+            GROUP BY Month
+            ORDER BY Month
+        ''', (months,))
+        df['Month'] = pd.to_datetime(df['Month']).astype('datetime64[ns]')
+        return df.tail(months).reset_index(drop=True)
+
+    def expenses_by_category(self, start_date, end_date):
+        return self._pivot('''
+            SELECT date_trunc('month', date) AS Month, category, SUM(amount) AS value
+            FROM transactions
+            WHERE date BETWEEN {start} AND {end}
+            GROUP BY ALL
+        ''', start_date, end_date, 'category')
+
+    def expenses_by_tag(self, start_date, end_date):
+        # Tags are split, trimmed and de-duplicated per transaction, as
+        # tags.split_tags does for the SQLite tag index.
+        return self._pivot('''
+            WITH tagged AS (
+                SELECT DISTINCT id, date, amount, trim(unnest(string_split(tag, ',')), ' \t\r\n') AS tag
+                FROM transactions
+                WHERE date BETWEEN {start} AND {end} AND tag IS NOT NULL
+            )
+            SELECT date_trunc('month', date) AS Month, tag, SUM(amount) AS value
+            FROM tagged
+            WHERE tag != ''
+            GROUP BY ALL
+        ''', start_date, end_date, 'tag')
+
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def get_reports(db, backend=None):
+    """The report backend for db, chosen by EXPENSE_ANALYTICS unless
+    backend is given. Falls back to SQLite if DuckDB is not installed."""
+    backend = backend or os.environ.get('EXPENSE_ANALYTICS', 'sqlite')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown analytics backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    if backend != 'sqlite' and duckdb is None:
+        backend = 'sqlite'
+    with _reports_lock:
+        reports = _reports.get((id(db), backend))
+        if reports is None:
+            if backend == 'sqlite':
+                reports = SqliteReports(db)
+            else:
+                reports = DuckDBReports(db, source='sqlite' if backend == 'duckdb-sqlite' else 'snapshot')
+            _reports[(id(db), backend)] = reports
+        return reports
@@ -0,0 +1,1414 @@
+"""Performance benchmarks and checks for the expense tracker.
+
+Run a single benchmark with, for example:
+
+    python benchmarks.py startup --rows 1000 100000
+
+Checks (such as `parser`) exit with a non-zero status when they fail, so
+they can gate CI. Correctness tests live in tests/ and run with pytest.
+
+Each benchmark builds its own synthetic database in a temporary directory
+and never touches expense_tracker.db.
+"""
+import argparse
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from connection_pool import ConnectionProfile, ROLLBACK_JOURNAL_PROFILE
+from database import Database
+from migrations import MIGRATIONS
+
+CATEGORIES = ['Groceries', 'Housing', 'Utilities', 'Transportation', 'Healthcare',
+              'Personal Care', 'Entertainment and Leisure', 'Other']
+TAGS = ['Fruits', 'Dairy', 'Meat', 'Vegetables', 'Bakery', 'Snacks', 'Drinks', 'Household']
+STORES = ['PENNY', 'REWE', 'LIDL', 'ALDI', 'EDEKA', 'DM']
+
+
+def synthetic_transactions(rows, days=3 * 365, seed=42):
+    rng = random.Random(seed)
+    first_day = date.today() - timedelta(days=days)
+    for i in range(rows):
+        yield (
+            f"Item {rng.randrange(2000)}",
+            ','.join(rng.sample(TAGS, rng.randint(1, 2))),
+            float(rng.randint(1, 3)),
+            rng.choice(CATEGORIES),
+            first_day + timedelta(days=rng.randrange(days)),
+            'income' if rng.random() < 0.02 else 'expense',
+            rng.choice(STORES),
+            round(rng.uniform(0.3, 60), 2),
+        )
+
+
+RECORD_FIELDS = ('item', 'tags', 'quantity', 'category', 'date', 'type', 'store_name', 'amount')
+
+
+def synthetic_records(rows, days=3 * 365, seed=42):
+    for row in synthetic_transactions(rows, days=days, seed=seed):
+        yield dict(zip(RECORD_FIELDS, row))
+
+
+def seed_database(path, rows, profile=None, chunk_size=100_000):
+    db = Database(path, profile=profile)
+    records = synthetic_records(rows)
+    while True:
+        chunk = [record for _, record in zip(range(chunk_size), records)]
+        if not chunk:
+            break
+        db.add_transactions_bulk(chunk)
+    db.close()
+
+
+def timed(func, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def bench_startup(args):
+    print(f"{'rows':>10} {'legacy init (ms)':>18} {'versioned open (ms)':>20}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            seed_database(path, rows)
+
+            def legacy_init():
+                # What Database.__init__ did before migrations were versioned:
+                # rerun its five steps on every start. Later migrations only
+                # ever ran once.
+                db = Database(path)
+                with db.pool.writer() as cursor:
+                    for _, _, migrate in MIGRATIONS[:5]:
+                        migrate(cursor)
+                db.close()
+
+            def versioned_open():
+                Database(path).close()
+
+            print(f"{rows:>10} {timed(legacy_init) * 1000:>18.2f} {timed(versioned_open) * 1000:>20.2f}")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_concurrency(path, profile, readers, duration, batch):
+    db = Database(path, max_readers=readers, profile=profile, cache_bytes=0)
+    today = date.today()
+    start = today - timedelta(days=30)
+    stop = threading.Event()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                db.get_daily_spending(start, today)
+                db.get_expenses_by_category(start, today)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    def writer():
+        records = list(synthetic_records(batch, days=30))
+        while not stop.is_set():
+            try:
+                db.add_transactions_bulk(records)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writes = db.pool_stats()['writes']
+    db.close()
+    return latencies, errors, writes
+
+
+def bench_concurrency(args):
+    profiles = [('rollback journal', ROLLBACK_JOURNAL_PROFILE), ('wal', ConnectionProfile())]
+    print(f"{args.readers} readers, 1 writer ({args.batch} rows/commit), {args.duration}s per profile")
+    print(f"{'profile':>18} {'reads':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'commits':>8} {'errors':>7}")
+    for name, profile in profiles:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'concurrency.db')
+            seed_database(path, args.rows, profile=profile)
+            latencies, errors, writes = run_concurrency(path, profile, args.readers, args.duration, args.batch)
+        p50 = percentile(latencies, 50) * 1000 if latencies else float('nan')
+        p99 = percentile(latencies, 99) * 1000 if latencies else float('nan')
+        print(f"{name:>18} {len(latencies):>8} {p50:>10.2f} {p99:>10.2f} {writes:>8} {len(errors):>7}")
+
+
+def legacy_expenses_by_tag(db, months):
+    # get_expenses_by_tag before tags were normalized: split every row in Python.
+    transactions = db._fetchall('''
+        SELECT tag, amount
+        FROM transactions
+        WHERE date >= date('now', '-' || ? || ' months')
+    ''', (months,))
+    tag_expenses = {}
+    for tag, amount in transactions:
+        if tag:
+            for t in tag.split(','):
+                t = t.strip()
+                tag_expenses[t] = tag_expenses.get(t, 0) + amount
+    return sorted(tag_expenses.items(), key=lambda x: x[1], reverse=True)
+
+
+def legacy_tag_report(db, start, end):
+    # report_page's tag breakdown before tags were normalized.
+    import pandas as pd
+    df = pd.DataFrame(db.get_transactions_with_tags(start, end), columns=['Month', 'Tags', 'Amount'])
+    df['Tags'] = df['Tags'].str.split(',')
+    df = df.explode('Tags')
+    df['Tags'] = df['Tags'].str.strip()
+    return df.groupby(['Month', 'Tags'])['Amount'].sum().reset_index()
+
+
+def legacy_transactions_by_tag(db, tag):
+    rows = db._fetchall('''
+        SELECT item, tag, amount, category, store_name, date
+        FROM transactions
+        WHERE tag LIKE ?
+        ORDER BY date DESC
+    ''', (f'%{tag}%',))
+    return [row for row in rows if tag in (t.strip() for t in row[1].split(','))]
+
+
+def bench_tags(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tags.db')
+        started = time.perf_counter()
+        seed_database(path, args.rows)
+        print(f"Seeded {args.rows} transactions in {time.perf_counter() - started:.1f}s")
+        db = Database(path, cache_bytes=0)
+        end = date.today()
+        start = (end - timedelta(days=365)).replace(day=1)
+        cases = [
+            ('expenses by tag (12 months)',
+             lambda: legacy_expenses_by_tag(db, 12), lambda: db.get_expenses_by_tag(12)),
+            ('tag report by month (12 months)',
+             lambda: legacy_tag_report(db, start, end), lambda: db.get_expenses_by_tag_and_month(start, end)),
+            (f'transactions with tag {TAGS[0]!r}',
+             lambda: legacy_transactions_by_tag(db, TAGS[0]), lambda: db.get_transactions_by_tag(TAGS[0])),
+        ]
+        print(f"{'case':>34} {'comma strings (ms)':>20} {'tag index (ms)':>16}")
+        for name, legacy, indexed in cases:
+            print(f"{name:>34} {timed(legacy, args.repeat) * 1000:>20.1f} {timed(indexed, args.repeat) * 1000:>16.1f}")
+        db.close()
+
+
+def render_dashboard(db):
+    # The queries main_dashboard issues on every rerun, after the check for
+    # other processes' commits that get_database makes at the top of it.
+    db.pool.check_external_writes()
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    db.get_monthly_spending(today.year, today.month)
+    db.get_daily_spending(month_start, month_end, columnar=True, type='expense')
+    db.get_expenses_by_category(today - timedelta(days=30), today)
+
+
+def bench_cache(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        seed_database(path, args.rows)
+        db = Database(path)
+
+        def run(label):
+            before = db.pool_stats()
+            started = time.perf_counter()
+            render_dashboard(db)
+            elapsed = time.perf_counter() - started
+            after = db.pool_stats()
+            print(f"{label:>28} {elapsed * 1000:>10.3f} {after['read_checkouts'] - before['read_checkouts']:>12} "
+                  f"{after['version_checks'] - before['version_checks']:>15}")
+
+        print(f"{'dashboard render':>28} {'ms':>10} {'SQL queries':>12} {'version checks':>15}")
+        run('cold')
+        for i in range(args.reruns):
+            run(f'rerun {i + 1}, no new data')
+        db.add_transaction(12.5, 'Groceries', date.today(), 'expense', 'PENNY', 'Milk', ['Dairy'])
+        run('after add_transaction')
+        run('rerun, no new data')
+
+        # A write from another connection, as from manage.py or a second
+        # Streamlit worker, must invalidate this process's cache too.
+        month = date.today()
+        before = db.get_monthly_spending(month.year, month.month)
+        other = Database(path)
+        other.add_transaction(7.5, 'Groceries', month, 'expense', 'PENNY', 'Bread', [])
+        other.close()
+        run('after another connection')
+        after = db.get_monthly_spending(month.year, month.month)
+        print(db.cache_stats())
+        db.close()
+        if abs(after - before - 7.5) > 1e-6:
+            print(f"FAIL: monthly spending {before} -> {after} after a write from another connection")
+            sys.exit(1)
+
+
+def bench_receipts(args):
+    import io
+    from openai import OpenAI
+    from receipt_pipeline import BatchReport, extract_receipts
+    from stub_vision_server import start_stub_server
+
+    with open(args.image, 'rb') as f:
+        image_bytes = f.read()
+    server, base_url = start_stub_server(latency=args.latency, fail_rate=args.fail_rate, seed=1)
+    client = OpenAI(api_key='stub', base_url=base_url)
+    try:
+        print(f"{args.files} receipts, stub latency {args.latency}s, fail rate {args.fail_rate}")
+        for workers in args.workers:
+            files = [(f'receipt-{i}.jpg', io.BytesIO(image_bytes)) for i in range(args.files)]
+            report = BatchReport()
+            results = extract_receipts(files, max_workers=workers, backoff=0.05, report=report, client=client,
+                                       use_cache=False)
+            for _ in results:
+                pass
+            print(f"  {workers:>2} workers: {report.summary()}")
+    finally:
+        server.shutdown()
+
+
+def legacy_encode_receipt_image(uploaded_file):
+    # encode_receipt_image before preprocessing: a full-size JPEG re-save.
+    import base64
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.open(uploaded_file).save(buffer, format='JPEG')
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def bench_images(args):
+    import io
+    from openai import OpenAI
+    from PIL import Image
+    from image_preprocessing import PreprocessOptions
+    from stub_vision_server import start_stub_server
+    from vision import encode_receipt_image, request_receipt_info
+
+    source = Image.open(args.image)
+    samples = []
+    for scale in args.scale:
+        # Upscaled copies stand in for full-resolution phone photos.
+        image = source.resize((source.width * scale, source.height * scale)) if scale > 1 else source
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=92)
+        samples.append((f"{image.width}x{image.height}", buffer.getvalue()))
+
+    encoders = [('legacy', legacy_encode_receipt_image)]
+    for max_edge in args.max_edge:
+        for quality in args.quality:
+            options = PreprocessOptions(max_edge=max_edge, quality=quality)
+            encoders.append((f"edge {max_edge} q{quality}",
+                             lambda f, options=options: encode_receipt_image(f, options)))
+
+    server, base_url = start_stub_server(latency=args.latency, upload_kbps=args.upload_kbps)
+    client = OpenAI(api_key='stub', base_url=base_url, max_retries=0)
+    try:
+        print(f"stub latency {args.latency}s, upload {args.upload_kbps:g} kbit/s")
+        print(f"{'input':>11} {'encoder':>16} {'payload KB':>11} {'encode ms':>10} {'end-to-end ms':>14}")
+        for label, image_bytes in samples:
+            print(f"{label:>11} {'(file)':>16} {len(image_bytes) / 1024:>11.1f}")
+            for name, encode in encoders:
+                started = time.perf_counter()
+                encoded = encode(io.BytesIO(image_bytes))
+                encoded_at = time.perf_counter()
+                request_receipt_info(client, encoded)
+                finished = time.perf_counter()
+                print(f"{'':>11} {name:>16} {len(encoded) / 1024:>11.1f} "
+                      f"{(encoded_at - started) * 1000:>10.1f} {(finished - started) * 1000:>14.1f}")
+    finally:
+        server.shutdown()
+
+
+def scanned_pdf(source, pages):
+    """rec1.pdf's scanned page repeated `pages` times."""
+    import io
+    import pypdf
+    writer = pypdf.PdfWriter()
+    page = pypdf.PdfReader(source).pages[0]
+    for _ in range(pages):
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def text_pdf(pages, lines_per_page=40, seed=42):
+    """A minimal PDF whose pages carry a text layer of statement lines."""
+    rng = random.Random(seed)
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for number in range(pages):
+        lines = [f"{date(2024, 1, 1) + timedelta(days=rng.randrange(365)):%d-%m-%Y}  "
+                 f"{rng.choice(STORES)} Item {rng.randrange(2000)} {rng.randint(1, 3)} x {rng.uniform(0.5, 20):.2f} EUR"
+                 for _ in range(lines_per_page)]
+        text = ' '.join(f"({line}) Tj T*" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td (Page {number + 1}) Tj T* {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    output, offsets = '%PDF-1.4\n', []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    output += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return output.encode('latin-1')
+
+
+def bench_pdfs(args):
+    import io
+    from openai import OpenAI
+    from pdf_receipts import iter_pdf_pages
+    from receipt_pipeline import BatchReport, extract_receipts
+    from stub_vision_server import start_stub_server
+
+    server, base_url = start_stub_server(latency=args.latency)
+    client = OpenAI(api_key='stub', base_url=base_url)
+    try:
+        print(f"stub latency {args.latency}s, {args.workers} extraction workers")
+        print(f"{'document':>16} {'read 1 proc s':>14} {f'read {args.processes} procs s':>15} "
+              f"{'text pages':>11} {'extract s':>10}")
+        for pages in args.pages:
+            for kind, data in [('scanned', scanned_pdf(args.pdf, pages)), ('text', text_pdf(pages))]:
+                read_times = []
+                for processes in (1, args.processes):
+                    started = time.perf_counter()
+                    read = list(iter_pdf_pages('statement.pdf', data, processes))
+                    read_times.append(time.perf_counter() - started)
+                report = BatchReport()
+                for _ in extract_receipts([('statement.pdf', io.BytesIO(data))], max_workers=args.workers,
+                                          report=report, client=client, use_cache=False):
+                    pass
+                text_pages = sum(page.text is not None for page in read)
+                print(f"{f'{pages} pages {kind}':>16} {read_times[0]:>14.2f} {read_times[1]:>15.2f} "
+                      f"{text_pages:>11} {report.elapsed:>10.2f}")
+                if report.failed:
+                    print(f"    {report.summary()}")
+    finally:
+        server.shutdown()
+
+
+def legacy_process_receipt(text):
+    # process_receipt before the streaming parser.
+    import json
+    for match in re.findall(r'\[\s*\{[^]]*\}\s*\]', text, re.DOTALL):
+        try:
+            return json.loads(match)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def random_chunks(text, rng, max_chunks=40):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, max_chunks))))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+def parser_corpus(directory, rng):
+    """Saved responses plus variants the regex parser gets wrong: prose
+    around the JSON, brackets inside strings, a corrupted item, and replies
+    cut off mid-item."""
+    import json
+    from extraction_cache import iter_saved_responses
+    from receipt_parser import parse_receipt_items
+    corpus = []
+    for source, response in iter_saved_responses(directory):
+        items, _ = parse_receipt_items(response)
+        name = os.path.basename(source)
+        corpus.append((name, response, items, 0))
+        corpus.append((f"{name} +prose", f"Here is the receipt [as requested]:\n{response}\nLet me know [if] needed.",
+                       items, 0))
+        nested = [dict(item, Item=f"{item['Item']} [2x] {{promo}}") for item in items]
+        corpus.append((f"{name} +brackets", json.dumps(nested, ensure_ascii=False, indent=2), nested, 0))
+        if len(items) > 2:
+            broken = json.dumps(items, ensure_ascii=False, indent=2).replace('"Amount":', '"Amount"', 1)
+            corpus.append((f"{name} +corrupt", broken, items[1:], 1))
+        for cut in sorted(rng.sample(range(len(response)), 3)):
+            corpus.append((f"{name} cut@{cut}", response[:cut], None, None))
+    return corpus
+
+
+def check_parser(args):
+    import json
+    from receipt_parser import ItemStreamParser, iter_receipt_items, parse_receipt_items
+
+    rng = random.Random(args.seed)
+    corpus = parser_corpus(args.dir, rng)
+    failures = []
+    legacy_wrong = 0
+    for name, text, expected, expected_errors in corpus:
+        items, errors = parse_receipt_items(text)
+        if expected is not None and (items != expected or len(errors) != expected_errors):
+            failures.append(f"{name}: {len(items)} items, {len(errors)} errors; expected "
+                            f"{len(expected)} items, {expected_errors} errors")
+        for _ in range(args.chunkings):
+            parser = ItemStreamParser()
+            streamed = list(iter_receipt_items(random_chunks(text, rng), parser))
+            if (streamed, parser.errors) != (items, errors):
+                failures.append(f"{name}: result depends on how the reply is chunked")
+                break
+        if expected is not None and (legacy_process_receipt(text) or []) != expected:
+            legacy_wrong += 1
+
+    # Random structural damage must never raise or depend on chunking.
+    originals = [text for name, text, _, errors in corpus if errors == 0 and '+' not in name]
+    for trial in range(args.mutations):
+        text = list(rng.choice(originals))
+        for _ in range(rng.randint(1, 5)):
+            position = rng.randrange(len(text))
+            if rng.random() < 0.5:
+                del text[position]
+            else:
+                text.insert(position, rng.choice('[]{}",:\\'))
+        text = ''.join(text)
+        try:
+            items, errors = parse_receipt_items(text)
+            parser = ItemStreamParser()
+            streamed = list(iter_receipt_items(random_chunks(text, rng), parser))
+        except Exception as e:
+            failures.append(f"mutation {trial}: {type(e).__name__}: {e}")
+            continue
+        if (streamed, parser.errors) != (items, errors):
+            failures.append(f"mutation {trial}: result depends on how the reply is chunked")
+
+    # Replies cut off mid-item keep every item that was complete.
+    for name, text, expected, _ in corpus:
+        if expected is None:
+            full = next(items for other, _, items, _ in corpus if other == name.split(' cut@')[0])
+            items, _ = parse_receipt_items(text)
+            if items != full[:len(items)]:
+                failures.append(f"{name}: items are not a prefix of the full reply")
+
+    print(f"{len(corpus)} replies, {args.chunkings} random chunkings each, {args.mutations} mutated replies; "
+          f"the regex parser gets {legacy_wrong} of the complete ones wrong")
+
+    item = json.dumps({'Item': 'Bananen', 'Item Type': 'Fruits', 'Quantity': '1', 'Amount': '0.43 EUR',
+                       'Category': 'Groceries', 'Store Name': 'PENNY', 'Date': '02-08-2024'})
+    print(f"{'reply':>24} {'regex ms':>10} {'streaming ms':>13}")
+    for items in args.items:
+        complete = '[' + ', '.join([item] * items) + ']'
+        # max_tokens cuts long replies off before the closing bracket.
+        truncated = complete[:-len(item) // 2]
+        for label, text in [(f"{items} items", complete), (f"{items} items, cut off", truncated)]:
+            regex_time = timed(lambda: legacy_process_receipt(text), repeat=3)
+            parse_time = timed(lambda: parse_receipt_items(text), repeat=3)
+            print(f"{label:>24} {regex_time * 1000:>10.1f} {parse_time * 1000:>13.1f}")
+
+    if failures:
+        print(f"{len(failures)} parser check(s) failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Streaming parser agrees with itself under every chunking.")
+
+
+def format_decimal(value, rng, decimals=2):
+    text = f"{value:.{decimals}f}"
+    return text.replace('.', ',') if rng.random() < 0.5 else text
+
+
+def synthetic_receipt_lines(rows, seed=42):
+    """Receipt lines in the formats the model produces, each with its true
+    line total (None for lines that cannot be read)."""
+    rng = random.Random(seed)
+    for i in range(rows):
+        kind = rng.random()
+        day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+        if kind < 0.6:
+            count = rng.randint(1, 3)
+            total = round(count * rng.uniform(0.3, 15), 2)
+            quantity = rng.choice([str(count), f"{count} Stk", f"{count}x"])
+            amount = rng.choice(['{}', '{} EUR', '€ {}', '{} €']).format(format_decimal(total, rng))
+        elif kind < 0.8:
+            weight, price = round(rng.uniform(0.1, 2), 3), round(rng.uniform(0.8, 20), 2)
+            quantity = rng.choice([f"{format_decimal(weight, rng, 3)} kg", f"{weight * 1000:.0f} g"])
+            amount = f"{format_decimal(price, rng)} {rng.choice(['EUR/kg', '€/kg', 'EUR / kg'])}"
+            total = round(weight * price, 2)
+        elif kind < 0.9:
+            grams, price = rng.choice([100, 150, 250, 500]), round(rng.uniform(0.5, 4), 2)
+            quantity, amount = f"{grams} g", f"{format_decimal(price, rng)} €/100g"
+            total = round(grams / 100 * price, 2)
+        elif kind < 0.98:
+            total = round(rng.uniform(1000, 5000), 2)
+            quantity = '1'
+            amount = rng.choice([f"{total:,.2f} EUR", f"{total:,.2f}".replace(',', 'X').replace('.', ',')
+                                 .replace('X', '.') + ' €'])
+        else:
+            quantity, amount, total = '1', rng.choice(['n/a', '', 'EUR']), None
+        yield {'Item': f"Item {i}", 'Item Type': 'Groceries', 'Quantity': quantity, 'Amount': amount,
+               'Category': 'Groceries', 'Store Name': rng.choice(STORES), 'Date': f"{day:%d-%m-%Y}"}, total
+
+
+def legacy_normalize(transactions):
+    # The per-row normalize_transactions the receipt page used before.
+    from database import parse_quantity
+    normalized, failed = [], 0
+    for transaction in transactions:
+        try:
+            normalized.append(dict(transaction,
+                                   Quantity=float(parse_quantity(transaction['Quantity'])),
+                                   Amount=float(parse_quantity(transaction['Amount'])),
+                                   Date=datetime.strptime(transaction['Date'], '%d-%m-%Y').date()))
+        except (KeyError, ValueError):
+            failed += 1
+            normalized.append(None)
+    return normalized, failed
+
+
+def bench_normalize(args):
+    import pandas as pd
+    from receipt_normalization import normalize_receipt_frame
+
+    lines, totals = zip(*synthetic_receipt_lines(args.rows))
+    frame = pd.DataFrame(list(lines))
+
+    started = time.perf_counter()
+    legacy, legacy_failed = legacy_normalize(lines)
+    legacy_seconds = time.perf_counter() - started
+    normalized, report = normalize_receipt_frame(frame)
+
+    def wrong(amounts):
+        return sum(1 for amount, total in zip(amounts, totals)
+                   if total is not None and (amount is None or abs(amount - total) > 0.011))
+
+    legacy_wrong = wrong(row and row['Amount'] for row in legacy)
+    amounts = normalized['Amount'].reindex(frame.index)
+    new_wrong = wrong(None if pd.isna(amount) else amount for amount in amounts)
+    unreadable = sum(total is None for total in totals)
+
+    print(f"{args.rows:,} synthetic receipt lines, {unreadable:,} unreadable by design")
+    print(f"{'':>11} {'seconds':>8} {'lines/s':>10} {'failed':>7} {'wrong total':>12}")
+    print(f"{'per row':>11} {legacy_seconds:>8.2f} {args.rows / legacy_seconds:>10,.0f} "
+          f"{legacy_failed:>7,} {legacy_wrong:>12,}")
+    print(f"{'vectorized':>11} {report.seconds:>8.2f} {report.rows_per_second:>10,.0f} "
+          f"{report.failed:>7,} {new_wrong:>12,}")
+    print(report.summary())
+    if new_wrong or report.failed != unreadable:
+        print("Vectorized normalization disagrees with the known line totals.")
+        sys.exit(1)
+
+
+# (item, category, item type) for the categorizer benchmark.
+CATALOG = [
+    ('Milch 3,5%', 'Groceries', 'Dairy'), ('Joghurt Natur', 'Groceries', 'Dairy'), ('Gouda Scheiben', 'Groceries', 'Dairy'),
+    ('Butter', 'Groceries', 'Dairy'), ('Eier M', 'Groceries', 'Dairy'), ('Quark Magerstufe', 'Groceries', 'Dairy'),
+    ('Bananen', 'Groceries', 'Fruits'), ('Aepfel Elstar', 'Groceries', 'Fruits'), ('Mango', 'Groceries', 'Fruits'),
+    ('Avocado', 'Groceries', 'Fruits'), ('Erdbeeren', 'Groceries', 'Fruits'), ('Zitronen', 'Groceries', 'Fruits'),
+    ('Tomaten Rispen', 'Groceries', 'Vegetables'), ('Gurke', 'Groceries', 'Vegetables'),
+    ('Kartoffeln festkochend', 'Groceries', 'Vegetables'), ('Zwiebeln', 'Groceries', 'Vegetables'),
+    ('Paprika Rot', 'Groceries', 'Vegetables'), ('Brokkoli', 'Groceries', 'Vegetables'),
+    ('Vollkorntoast', 'Groceries', 'Bakery'), ('Roggenbroetchen', 'Groceries', 'Bakery'),
+    ('Weizen Tortillas', 'Groceries', 'Bakery'), ('Croissant Butter', 'Groceries', 'Bakery'),
+    ('Haehnchenbrust', 'Groceries', 'Meat'), ('Hackfleisch gemischt', 'Groceries', 'Meat'),
+    ('Salami Scheiben', 'Groceries', 'Meat'), ('Lachsfilet', 'Groceries', 'Fish'),
+    ('Apfelringe', 'Groceries', 'Snacks'), ('Kartoffelchips Paprika', 'Groceries', 'Snacks'),
+    ('Schokolade Vollmilch', 'Groceries', 'Snacks'), ('Gummibaerchen', 'Groceries', 'Snacks'),
+    ('Mineralwasser Still', 'Groceries', 'Drinks'), ('Orangensaft', 'Groceries', 'Drinks'),
+    ('Kaffee Bohnen', 'Groceries', 'Drinks'), ('Apfelschorle', 'Groceries', 'Drinks'),
+    ('Spaghetti', 'Groceries', 'Pasta'), ('Lasagne Bolognese', 'Groceries', 'Ready Meals'),
+    ('Pizza Margherita', 'Groceries', 'Ready Meals'), ('Hummus Natur', 'Groceries', 'Spreads'),
+    ('Bluetenhonig', 'Groceries', 'Spreads'), ('Erdnussbutter', 'Groceries', 'Spreads'),
+    ('Zahnpasta', 'Personal Care', 'Hygiene'), ('Zahnbuerste', 'Personal Care', 'Hygiene'),
+    ('Duschgel', 'Personal Care', 'Hygiene'), ('Shampoo Repair', 'Personal Care', 'Hygiene'),
+    ('Haarfarbe Dunkelbraun', 'Personal Care', 'Cosmetics'), ('Deo Spray', 'Personal Care', 'Hygiene'),
+    ('Kontaktlinsenloesung', 'Healthcare', 'Healthcare'), ('Ibuprofen 400', 'Healthcare', 'Medicine'),
+    ('Pflaster', 'Healthcare', 'Medicine'), ('Vitamin D Tabletten', 'Healthcare', 'Medicine'),
+    ('Spuelmittel', 'Housing', 'Household'), ('Waschmittel Color', 'Housing', 'Household'),
+    ('Kuechenrolle', 'Housing', 'Household'), ('Toilettenpapier', 'Housing', 'Household'),
+    ('Muellbeutel', 'Housing', 'Household'), ('Gluehbirne LED', 'Utilities', 'Electrical'),
+    ('Batterien AA', 'Utilities', 'Electrical'), ('Bahnticket', 'Transportation', 'Travel'),
+    ('Busfahrkarte', 'Transportation', 'Travel'), ('Kinokarte', 'Entertainment and Leisure', 'Leisure'),
+]
+
+
+def item_variant(name, rng):
+    """How the same product shows up on different receipts."""
+    words = name.split()
+    variant = rng.random()
+    if variant < 0.2:
+        words = [word.upper() for word in words]
+    elif variant < 0.35:
+        # Receipt printers abbreviate long words.
+        words = [word[:6].upper() + '.' if len(word) > 7 else word.upper() for word in words]
+    elif variant < 0.5:
+        words = [rng.choice(STORES)] + words
+    elif variant < 0.6:
+        words = words + [rng.choice(['500G', '1L', '250 g', '6ST', '1,5L'])]
+    elif variant < 0.7:
+        words = [word.lower() for word in words]
+    return ' '.join(words)
+
+
+def bench_categorizer(args):
+    from categorizer import Categorizer
+
+    rng = random.Random(args.seed)
+    held_out = set(rng.sample(range(len(CATALOG)), len(CATALOG) // 10))
+    known = [entry for index, entry in enumerate(CATALOG) if index not in held_out]
+    history = Counter()
+    for _ in range(args.history):
+        name, category, item_type = rng.choice(known)
+        history[(item_variant(name, rng), category, item_type)] += 1
+    rows = [(item, category, item_type, count) for (item, category, item_type), count in history.items()]
+
+    started = time.perf_counter()
+    categorizer = Categorizer.train(rows)
+    train_seconds = time.perf_counter() - started
+
+    def evaluate(entries, samples):
+        results = []
+        for _ in range(samples):
+            name, category, item_type = rng.choice(entries)
+            item = item_variant(name, rng)
+            started = time.perf_counter()
+            prediction = categorizer.predict(item)
+            results.append((prediction, category, time.perf_counter() - started))
+        return results
+
+    print(f"{len(rows):,} distinct history rows from {args.history:,} purchases; trained in {train_seconds * 1000:.0f} ms")
+    print(f"{'items':>16} {'layer':>11} {'share':>7} {'accuracy':>9}")
+    confident_wrong = confident = 0
+    for label, entries in [('known products', known),
+                           ('new products', [CATALOG[index] for index in sorted(held_out)])]:
+        results = evaluate(entries, args.samples)
+        by_layer = defaultdict(list)
+        for prediction, category, _ in results:
+            sure = prediction.confidence >= args.min_confidence
+            by_layer[prediction.source if sure else 'ask model'].append(prediction.category == category)
+            if sure:
+                confident += 1
+                confident_wrong += prediction.category != category
+        for layer, outcomes in sorted(by_layer.items()):
+            print(f"{label:>16} {layer:>11} {len(outcomes) / len(results):>7.1%} {sum(outcomes) / len(outcomes):>9.1%}")
+        latency = statistics.mean(seconds for _, _, seconds in results)
+        print(f"{label:>16} {'':>11} {len(results):,} items, {latency * 1e6:.0f} us per prediction")
+
+    precision = 1 - confident_wrong / confident if confident else 1.0
+    print(f"Predictions at confidence >= {args.min_confidence} skip the model and are {precision:.1%} correct")
+    if precision < args.min_precision:
+        print(f"Confident predictions fall below {args.min_precision:.0%} precision.")
+        sys.exit(1)
+
+
+def write_bank_export(path, rows, bad_every=1_000, seed=42):
+    """A Sparkasse-style CSV export; every bad_every-th row has an
+    unreadable amount. Returns the number of bad rows."""
+    import csv
+    bad = 0
+    with open(path, 'w', newline='', encoding='latin-1') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Auftragskonto', 'Buchungstag', 'Valutadatum', 'Buchungstext', 'Verwendungszweck',
+                         'Beguenstigter/Zahlungspflichtiger', 'Betrag', 'Waehrung'])
+        for i, (item, _, _, _, day, type, store, amount) in enumerate(synthetic_transactions(rows, seed=seed)):
+            amount = f"{amount if type == 'income' else -amount:,.2f}".replace(',', ' ').replace('.', ',')
+            if bad_every and i % bad_every == bad_every - 1:
+                amount, bad = 'n/a', bad + 1
+            writer.writerow(['DE00123', day.strftime('%d.%m.%y'), day.strftime('%d.%m.%y'),
+                             'KARTENZAHLUNG', item, store, amount.replace(' ', '.'), 'EUR'])
+    return bad
+
+
+def bench_import(args):
+    import tracemalloc
+    from importer import get_profile, import_transactions
+
+    profile = get_profile('sparkasse')
+    failures = []
+    print(f"{'rows':>9} {'file MB':>8} {'import/s':>10} {'re-import/s':>12} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            export = os.path.join(tmp, f'export-{rows}.csv')
+            bad = write_bank_export(export, rows)
+
+            db = Database(os.path.join(tmp, f'import-{rows}.db'))
+            first = import_transactions(db, export, profile, chunk_size=args.chunk_size)
+            again = import_transactions(db, export, profile, chunk_size=args.chunk_size)
+            db.close()
+
+            db = Database(os.path.join(tmp, f'traced-{rows}.db'))
+            tracemalloc.start()
+            import_transactions(db, export, profile, chunk_size=args.chunk_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            db.close()
+
+            print(f"{rows:>9,} {os.path.getsize(export) / 1e6:>8.1f} {first.rows_per_second:>10,.0f} "
+                  f"{again.rows_per_second:>12,.0f} {peak / 1e6:>8.1f}")
+            if (first.inserted, first.failed) != (rows - bad, bad):
+                failures.append(f"{rows} rows: first import {first.summary()}, expected {bad} failed")
+            if again.inserted or again.duplicates != rows - bad:
+                failures.append(f"{rows} rows: re-import {again.summary()}, expected nothing new")
+
+    if failures:
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+def bench_snapshot(args):
+    import pandas as pd
+    import snapshot
+
+    columns = ['id', 'date', 'item', 'tag', 'quantity', 'category', 'type', 'store_name', 'amount']
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path, directory = os.path.join(tmp, 'snapshot.db'), os.path.join(tmp, 'snapshots')
+        seed_database(path, args.rows)
+        db = Database(path)
+        start = date.today().replace(day=1) - timedelta(days=90)
+
+        def fetchall_frame(start_date=None):
+            # What the pages do: fetchall into tuples, then a DataFrame.
+            where = 'WHERE date >= ?' if start_date else ''
+            rows = db._fetchall(f"SELECT {', '.join(columns)} FROM transactions {where}",
+                                (start_date,) if start_date else ())
+            df = pd.DataFrame(rows, columns=columns)
+            df['date'] = pd.to_datetime(df['date'])
+            return df
+
+        def arrow_frame(start_date=None):
+            return snapshot.to_frame(snapshot.read_table('transactions', directory, start_date=start_date))
+
+        started = time.perf_counter()
+        full = snapshot.write_snapshot(db, directory)
+        full_seconds = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(directory) for name in names)
+        print(f"{args.rows:,} transactions; full snapshot in {full_seconds:.2f}s, {size / 1e6:.1f} MB on disk")
+
+        print(f"{'read':>16} {'fetchall':>9} {'arrow':>9}")
+        for label, start_date in (('all rows', None), ('last 3 months', start)):
+            legacy, arrow = timed(lambda: fetchall_frame(start_date), args.repeat), \
+                timed(lambda: arrow_frame(start_date), args.repeat)
+            print(f"{label:>16} {legacy:>8.3f}s {arrow:>8.3f}s")
+            expected, got = fetchall_frame(start_date), arrow_frame(start_date)
+            if len(expected) != len(got) or abs(expected['amount'].sum() - float(got['amount'].sum())) > 0.01:
+                failures.append(f"{label}: snapshot has {len(got)} rows, database {len(expected)}")
+
+        next_month = (date.today().replace(day=1) + timedelta(days=32)).replace(day=1)
+        db.add_transactions_bulk({**record, 'date': next_month + timedelta(days=i % 28)}
+                                 for i, record in enumerate(synthetic_records(args.append, seed=7)))
+        append = snapshot.write_snapshot(db, directory)
+        print(f"append {args.append:,} rows in a new month: {append.seconds:.2f}s ({append.summary()})")
+        if append.written['transactions'] != 1 or not snapshot.is_current(db, directory):
+            failures.append(f"incremental snapshot rewrote {append.written['transactions']} months")
+        if snapshot.read_table('transactions', directory, columns=['id']).num_rows != db.get_last_transaction_id():
+            failures.append("snapshot row count differs from the database after appending")
+        db.close()
+
+    if failures:
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+REPORT_CASES = [('by amount', 'expenses_by_month', 3), ('by amount', 'expenses_by_month', 12),
+                ('by category', 'expenses_by_category', 3), ('by category', 'expenses_by_category', 12),
+                ('by tag', 'expenses_by_tag', 3), ('by tag', 'expenses_by_tag', 12)]
+
+
+def report_args(method, months):
+    # The date range report_page uses for a time period of `months`.
+    if method == 'expenses_by_month':
+        return (months,)
+    end = (date.today().replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return (end - timedelta(days=30 * months)).replace(day=1), end
+
+
+def check_analytics(args):
+    import pandas as pd
+    import analytics
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f'analytics-{rows}.db')
+            seed_database(path, rows)
+            db = Database(path)
+            backends = {'sqlite': analytics.SqliteReports(db)}
+            started = time.perf_counter()
+            backends['duckdb'] = analytics.DuckDBReports(db, directory=os.path.join(tmp, f'snapshots-{rows}'))
+            setup = f"snapshot written in {time.perf_counter() - started:.2f}s"
+            try:
+                backends['duckdb-sqlite'] = analytics.DuckDBReports(db, source='sqlite')
+            except Exception as e:
+                setup += f"; duckdb-sqlite skipped ({str(e).splitlines()[0][:60]})"
+            print(f"\n{rows:,} transactions, {setup}")
+            print(f"{'report':>22}" + ''.join(f"{name:>15}" for name in backends))
+
+            for label, method, months in REPORT_CASES:
+                call_args = report_args(method, months)
+                expected = getattr(backends['sqlite'], method)(*call_args)
+                line = f"{label + f' ({months} mo)':>22}"
+                for name, reports in backends.items():
+                    def run():
+                        # Time the query, not the getter cache.
+                        db.query_cache.clear()
+                        return getattr(reports, method)(*call_args)
+                    line += f"{timed(run, args.repeat) * 1000:>12.1f} ms"
+                    try:
+                        pd.testing.assert_frame_equal(expected, run(), check_names=False, check_freq=False,
+                                                      check_dtype=False, rtol=1e-9)
+                    except AssertionError as e:
+                        failures.append(f"{rows} rows, {name} {label} ({months} mo): {str(e).splitlines()[0]}")
+                print(line)
+            db.close()
+
+    if failures:
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("\nEvery backend produced the same report frames.")
+
+
+def bench_columnar(args):
+    import tracemalloc
+    import pandas as pd
+    from database import TRANSACTION_COLUMNS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'columnar.db')
+        seed_database(path, args.rows)
+        db = Database(path)
+
+        def tuples():
+            # What the pages did: fetchall, DataFrame, then to_datetime.
+            df = pd.DataFrame(db.get_transactions(), columns=list(TRANSACTION_COLUMNS))
+            df['Date'] = pd.to_datetime(df['Date'])
+            return df
+
+        def columnar():
+            return db.get_transactions(columnar=True)
+
+        print(f"get_transactions over {args.rows:,} rows")
+        print(f"{'':>10} {'seconds':>8} {'peak MB':>8} {'frame MB':>9}")
+        frames = {}
+        for label, build in (('tuples', tuples), ('columnar', columnar)):
+            def run():
+                db.query_cache.clear()
+                return build()
+            seconds = timed(run, args.repeat)
+            db.query_cache.clear()
+            tracemalloc.start()
+            frames[label] = build()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = frames[label].memory_usage(deep=True).sum()
+            print(f"{label:>10} {seconds:>8.2f} {peak / 1e6:>8.1f} {size / 1e6:>9.1f}")
+        db.close()
+
+    try:
+        pd.testing.assert_frame_equal(frames['tuples'], frames['columnar'], check_dtype=False,
+                                      check_categorical=False)
+    except AssertionError as e:
+        print(f"Columnar frame differs from the tuple path: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def bench_charts(args):
+    import plotly.express as px
+    import plotly.io as pio
+    import plotly.tools
+    import charts
+    from analytics import SqliteReports
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'charts.db')
+        seed_database(path, args.rows)
+        db = Database(path)
+        reports = SqliteReports(db)
+        today = date.today()
+        month_start = today.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        year_start = (month_end - timedelta(days=365)).replace(day=1)
+
+        def express_figures():
+            # How the dashboard and report page built their figures before.
+            daily = db.get_daily_spending(month_start, month_end, columnar=True)
+            fig = px.bar(daily, x='Date', y='Amount', text='Amount', color='Amount',
+                         color_continuous_scale=px.colors.qualitative.Set3)
+            fig.update_traces(texttemplate='%{text:.2f}€', textposition='outside')
+            yield fig
+            categories = db.get_expenses_by_category(today - timedelta(days=30), today, columnar=True)
+            yield px.pie(categories, values='Amount', names='Category',
+                         color_discrete_sequence=px.colors.qualitative.Set3)
+            pivot = reports.expenses_by_tag(year_start, month_end)
+            fig = charts.go.Figure()
+            for tag in pivot.columns:
+                fig.add_trace(charts.go.Bar(x=pivot.index, y=pivot[tag], name=tag,
+                                            text=pivot[tag].round(2), textposition='inside'))
+            yield fig
+
+        def daily():
+            daily = db.get_daily_spending(month_start, month_end, columnar=True, type='expense')
+            return charts.daily_expenses_figure(daily['Date'], daily['Amount'], 'Daily')
+
+        def categories():
+            categories = db.get_expenses_by_category(today - timedelta(days=30), today, columnar=True)
+            return charts.category_pie_figure(categories['Category'], categories['Amount'])
+
+        def tags():
+            return charts.stacked_monthly_figure(reports.expenses_by_tag(year_start, month_end), 'Tags', 'Tag')
+
+        builders = {'daily': daily, 'categories': categories, 'tags': tags}
+
+        def lean_figures():
+            return (build() for build in builders.values())
+
+        def cached_figures():
+            return (charts.cached_figure(db, name, (), build) for name, build in builders.items())
+
+        def render(figures):
+            # What st.plotly_chart does with each figure before sending it.
+            return sum(len(pio.to_json(plotly.tools.return_figure_from_figure_or_data(figure, True),
+                                       validate=False)) for figure in figures())
+
+        print(f"Dashboard and tag report figures, {args.rows:,} rows (query results cached)")
+        print(f"{'':>16} {'ms/rerun':>9} {'JSON KB':>8}")
+        render(express_figures)
+        for label, figures in (('plotly.express', express_figures), ('lean', lean_figures),
+                               ('lean, cached', cached_figures)):
+            render(figures)
+            seconds = timed(lambda: render(figures), args.repeat)
+            print(f"{label:>16} {seconds * 1000:>9.2f} {render(figures) / 1024:>8.1f}")
+        print(charts.figure_cache.stats())
+        db.close()
+
+
+def bench_spending(args):
+    import numpy as np
+    import pandas as pd
+    import spending
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'spending.db')
+        seed_database(path, args.rows)
+        db = Database(path)
+        end = date.today()
+        failures = []
+
+        def window_and_ffill(start):
+            # Running totals over transactions in SQL, with missing days
+            # filled in by pandas, as the chart did for a single month.
+            df = pd.DataFrame(db._fetchall('''
+                SELECT date, SUM(SUM(amount)) OVER (ORDER BY date)
+                FROM transactions
+                WHERE date BETWEEN ? AND ? AND type = 'expense'
+                GROUP BY date
+            ''', (start, end)), columns=['date', 'total'])
+            df['date'] = pd.to_datetime(df['date'])
+            full = pd.DataFrame({'date': pd.date_range(start, end)})
+            return pd.merge(full, df, on='date', how='left').ffill().fillna(0)['total'].to_numpy()
+
+        print(f"Cumulative spending per day, {args.rows:,} transactions")
+        print(f"{'range':>10} {'days':>6} {'SQL window + ffill ms':>21} {'cumsum cold ms':>15} {'cumsum warm ms':>15}")
+        for years in args.years:
+            start = end - timedelta(days=365 * years)
+
+            def cold():
+                db.query_cache.clear()
+                return spending.cumulative_spending(db, start, end)
+
+            baseline = timed(lambda: window_and_ffill(start), args.repeat)
+            engine_cold = timed(cold, args.repeat)
+            engine_warm = timed(lambda: spending.cumulative_spending(db, start, end), args.repeat)
+            series = spending.cumulative_spending(db, start, end)
+            print(f"{years:>8}y {len(series.dates):>6} {baseline * 1000:>21.2f} {engine_cold * 1000:>15.2f} "
+                  f"{engine_warm * 1000:>15.2f}")
+            if not np.allclose(series.total, window_and_ffill(start)):
+                failures.append(f"cumulative totals over {years} years differ from the SQL window")
+
+        rolling = spending.rolling_spending(db, end - timedelta(days=364), end, window=30)
+        series = spending.cumulative_spending(db, end - timedelta(days=364 + 30), end)
+        if not np.allclose(rolling.total, series.total[30:] - series.total[:-30]):
+            failures.append("rolling 30-day totals differ from differences of the running total")
+        for year, month in ((end.year, end.month), (end.year - 1, 1), (end.year - 2, 6)):
+            totals = db.get_cumulative_spending(year, month)
+            if not math.isclose(totals[-1][1] if totals else 0, db.get_monthly_spending(year, month)):
+                failures.append(f"get_cumulative_spending({year}, {month}) does not end at the month's total")
+        print(f"Year to date: {spending.year_to_date(db).total[-1]:,.2f}")
+        db.close()
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+# Modules main.py must not import before the first page is drawn.
+DEFERRED_IMPORTS = ('openai', 'streamlit_calendar', 'plotly.express', 'duckdb', 'pyarrow.dataset',
+                    'transactions_page', 'receipt_analysis', 'calendar_component', 'report_page', 'import_page')
+# Median `import main` time. It measures 370-450 ms, and importing openai
+# eagerly alone would add about 800 ms.
+STARTUP_BUDGET_MS = 800
+
+
+def measure_import_main(repeat=5):
+    """Import main in fresh interpreters under -X importtime.
+
+    Returns (ms per run, [(direct import of main, ms)] from the last run,
+    the DEFERRED_IMPORTS that were loaded). A first, unmeasured run creates
+    the database and bytecode caches.
+    """
+    import json
+    import subprocess
+
+    # `streamlit run` has imported streamlit before it executes main.py, so
+    # only the imports main.py adds are counted.
+    script = ("import json, sys, streamlit; import main; "
+              f"print(json.dumps(sorted(set({DEFERRED_IMPORTS!r}) & set(sys.modules))))")
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get('PYTHONPATH')])))
+    samples, main_children = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(repeat + 1):
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=tmp, env=env,
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                raise RuntimeError(f"import main failed:\n{process.stderr}")
+            # A module's imports are listed before it, one level deeper.
+            children = []
+            for line in process.stderr.splitlines():
+                if not line.startswith('import time:') or 'cumulative' in line:
+                    continue
+                _, cumulative, name = line.split('|')
+                depth, ms = len(name) - len(name.lstrip()), int(cumulative) / 1000
+                if depth == 3:
+                    children.append((name.strip(), ms))
+                elif depth == 1:
+                    if name.strip() == 'main':
+                        main_children = children
+                        if run:
+                            samples.append(ms)
+                    children = []
+        loaded = json.loads(process.stdout.strip().splitlines()[-1])
+    return samples, main_children, loaded
+
+
+def check_importtime(args):
+    samples, main_children, loaded = measure_import_main(args.repeat)
+    median = statistics.median(samples)
+    print(f"{'import main (ms)':>24} {median:>8.1f}  (median of {args.repeat}, budget {args.budget_ms:.0f})")
+    for name, ms in sorted(main_children, key=lambda child: -child[1])[:args.top]:
+        print(f"{name:>24} {ms:>8.1f}")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import main took {median:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"imported at startup but should be deferred: {', '.join(loaded)}")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+def bench_calendar(args):
+    from calendar_component import add_months
+
+    month = date.today().replace(day=1)
+    start, end = add_months(month, -1), add_months(month, 2) - timedelta(days=1)
+    print(f"{args.per_month} notes per month")
+    print(f"{'years':>6} {'notes':>8} {'per-date (ms)':>14} {'queries':>8} {'window (ms)':>12} {'queries':>8}")
+    failures = []
+    for years in args.years:
+        count = args.per_month * 12 * years
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'calendar.db'))
+            rng = random.Random(years)
+            with db.pool.writer() as cursor:
+                cursor.executemany('INSERT INTO notes (date, note, color) VALUES (?, ?, ?)', [
+                    (date.today() - timedelta(days=rng.randrange(years * 365)), f"Note {i}", '#3DD56D')
+                    for i in range(count)
+                ])
+
+            def per_date():
+                # What calendar_page did: every date with notes, then its
+                # notes once for the list and once for the events.
+                events = []
+                dates = db.get_dates_with_notes()
+                for day in dates:
+                    db.get_notes(day)
+                for day in dates:
+                    events.extend((day, note['id']) for note in db.get_notes(day))
+                return events
+
+            def window():
+                notes = db.get_notes_in_range(start, end)
+                return [(day, note['id']) for day, day_notes in notes.items() for note in day_notes]
+
+            results = []
+            for build in (per_date, window):
+                def run():
+                    db.query_cache.clear()
+                    return build()
+                seconds = timed(run, args.repeat)
+                reads = db.pool_stats()['read_checkouts']
+                results.append((seconds, sorted(run()), db.pool_stats()['read_checkouts'] - reads))
+            (old, old_events, old_queries), (new, new_events, new_queries) = results
+            print(f"{years:>6} {count:>8} {old * 1000:>14.2f} {old_queries:>8} {new * 1000:>12.2f} {new_queries:>8}")
+            if new_events != [event for event in old_events if start <= event[0] <= end]:
+                failures.append(f"{years} years of notes: windowed notes differ from the per-date lookups")
+            db.close()
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+def random_rule(rng):
+    from recurrence import WEEKDAYS
+
+    freq = rng.choice(['DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'])
+    parts = [f'FREQ={freq}', f'INTERVAL={rng.randint(1, 4)}']
+    if rng.random() < 0.3:
+        parts.append(f'COUNT={rng.randint(1, 60)}')
+    start = date(2010, 1, 1) + timedelta(days=rng.randrange(4000))
+    if rng.random() < 0.3:
+        parts.append(f"UNTIL={(start + timedelta(days=rng.randrange(3000))).strftime('%Y%m%d')}")
+    if freq == 'WEEKLY' and rng.random() < 0.6:
+        parts.append('BYDAY=' + ','.join(rng.sample(WEEKDAYS, rng.randint(1, 4))))
+    if freq == 'MONTHLY' and rng.random() < 0.6:
+        parts.append('BYMONTHDAY=' + ','.join(str(rng.choice([1, 15, 28, 29, 30, 31, -1, -2]))
+                                              for _ in range(rng.randint(1, 2))))
+    if freq == 'YEARLY' and rng.random() < 0.2:
+        start = date(2012, 2, 29)
+    return ';'.join(parts), start
+
+
+def bench_recurrence(args):
+    from dateutil.rrule import rrulestr
+    from calendar_component import add_months
+    from recurrence import Rule
+
+    def at_midnight(day):
+        return datetime.combine(day, datetime.min.time())
+
+    # Window expansion must match dateutil's RFC 5545 implementation.
+    rng = random.Random(args.seed)
+    failures = []
+    for _ in range(args.fuzz):
+        text, start = random_rule(rng)
+        window_start = start + timedelta(days=rng.randrange(-100, 4000))
+        window_end = window_start + timedelta(days=rng.randrange(120))
+        expected = [day.date() for day in rrulestr(text, dtstart=at_midnight(start)).between(
+            at_midnight(window_start), at_midnight(window_end), inc=True)]
+        if Rule.parse(text, start).occurrences(window_start, window_end) != expected:
+            failures.append(f"{text} from {start}: occurrences {window_start} to {window_end} differ from dateutil")
+    print(f"{args.fuzz:,} random rules checked against dateutil, {len(failures)} mismatches")
+
+    month = date.today().replace(day=1)
+    rule_start = add_months(month, -12 * args.years)
+    rules = ['FREQ=DAILY', 'FREQ=WEEKLY;BYDAY=MO,WE,FR', 'FREQ=MONTHLY;BYMONTHDAY=1', 'FREQ=MONTHLY;BYMONTHDAY=-1',
+             'FREQ=YEARLY']
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'recurrence.db'))
+        for i in range(args.rules):
+            db.add_recurring_rule(f"Rule {i}", rules[i % len(rules)], rule_start, kind='transaction', amount=9.99)
+        shown = (add_months(month, -1), month, add_months(month, 1))
+
+        def materialized():
+            # Every occurrence from each rule's start up to the shown months.
+            occurrences = 0
+            for rule in db.get_recurring_rules():
+                occurrences += len(rrulestr(rule['rule'], dtstart=at_midnight(rule['start_date'])).between(
+                    at_midnight(rule['start_date']), at_midnight(add_months(month, 2)), inc=True))
+            return occurrences
+
+        def windowed():
+            db.query_cache.clear()
+            return sum(len(entries) for shown_month in shown
+                       for entries in db.get_recurring_occurrences(shown_month).values())
+
+        def next_month():
+            # Paging forward: two of the three months are already cached.
+            db.query_cache.clear()
+            for shown_month in shown:
+                db.get_recurring_occurrences(shown_month)
+            started = time.perf_counter()
+            for shown_month in shown[1:] + (add_months(month, 2),):
+                db.get_recurring_occurrences(shown_month)
+            return time.perf_counter() - started
+
+        print(f"{args.rules} rules started {args.years} years ago, three months shown")
+        print(f"{'':>30} {'ms':>8} {'occurrences':>12}")
+        print(f"{'expand from start (dateutil)':>30} {timed(materialized, args.repeat) * 1000:>8.2f} "
+              f"{materialized():>12,}")
+        print(f"{'windowed, cold':>30} {timed(windowed, args.repeat) * 1000:>8.2f} {windowed():>12,}")
+        print(f"{'next month':>30} {statistics.median(next_month() for _ in range(args.repeat)) * 1000:>8.2f}")
+        db.close()
+
+    for failure in failures[:20]:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    startup = subparsers.add_parser('startup', help='Database open cost vs. table size')
+    startup.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    startup.set_defaults(func=bench_startup)
+
+    concurrency = subparsers.add_parser('concurrency', help='Reader latency with a concurrent writer')
+    concurrency.add_argument('--readers', type=int, default=8)
+    concurrency.add_argument('--rows', type=int, default=50_000)
+    concurrency.add_argument('--batch', type=int, default=40)
+    concurrency.add_argument('--duration', type=float, default=5.0)
+    concurrency.set_defaults(func=bench_concurrency)
+
+    tags = subparsers.add_parser('tags', help='Comma-joined tag strings vs. the normalized tag index')
+    tags.add_argument('--rows', type=int, default=1_000_000)
+    tags.add_argument('--repeat', type=int, default=3)
+    tags.set_defaults(func=bench_tags)
+
+    cache = subparsers.add_parser('cache', help='Dashboard reruns with and without new data')
+    cache.add_argument('--rows', type=int, default=100_000)
+    cache.add_argument('--reruns', type=int, default=3)
+    cache.set_defaults(func=bench_cache)
+
+    images = subparsers.add_parser('images', help='Receipt upload size and latency with image preprocessing')
+    images.add_argument('--image', default='recipts/rec1.jpg')
+    images.add_argument('--scale', type=int, nargs='+', default=[1, 5])
+    images.add_argument('--max-edge', type=int, nargs='+', default=[1600, 1024])
+    images.add_argument('--quality', type=int, nargs='+', default=[70])
+    images.add_argument('--latency', type=float, default=0.5)
+    images.add_argument('--upload-kbps', type=float, default=10_000)
+    images.set_defaults(func=bench_images)
+
+    pdfs = subparsers.add_parser('pdfs', help='Multi-page PDF reading and extraction against the stub server')
+    pdfs.add_argument('--pdf', default='recipts/rec1.pdf')
+    pdfs.add_argument('--pages', type=int, nargs='+', default=[1, 8, 32])
+    pdfs.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    pdfs.add_argument('--workers', type=int, default=8)
+    pdfs.add_argument('--latency', type=float, default=0.5)
+    pdfs.set_defaults(func=bench_pdfs)
+
+    parser_check = subparsers.add_parser('parser', help='Fuzz the streaming receipt parser; compare with the regex')
+    parser_check.add_argument('--dir', default='extracted_data')
+    parser_check.add_argument('--chunkings', type=int, default=50)
+    parser_check.add_argument('--mutations', type=int, default=500)
+    parser_check.add_argument('--items', type=int, nargs='+', default=[10, 200, 2000])
+    parser_check.add_argument('--seed', type=int, default=1)
+    parser_check.set_defaults(func=check_parser)
+
+    normalize = subparsers.add_parser('normalize', help='Vectorized receipt line normalization vs. per-row parsing')
+    normalize.add_argument('--rows', type=int, default=100_000)
+    normalize.set_defaults(func=bench_normalize)
+
+    import_check = subparsers.add_parser('import', help='Bank export import speed, memory and deduplication')
+    import_check.add_argument('--rows', type=int, nargs='+', default=[20_000, 200_000])
+    import_check.add_argument('--chunk-size', type=int, default=5_000)
+    import_check.set_defaults(func=bench_import)
+
+    snapshot = subparsers.add_parser('snapshot', help='Parquet snapshot reads vs. fetchall into DataFrames')
+    snapshot.add_argument('--rows', type=int, default=1_000_000)
+    snapshot.add_argument('--append', type=int, default=20_000)
+    snapshot.add_argument('--repeat', type=int, default=3)
+    snapshot.set_defaults(func=bench_snapshot)
+
+    analytics_check = subparsers.add_parser('analytics', help='Report frames from SQLite vs. DuckDB: equality and speed')
+    analytics_check.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000],
+                                 help='Dataset sizes, e.g. 10000 1000000 10000000')
+    analytics_check.add_argument('--repeat', type=int, default=3)
+    analytics_check.set_defaults(func=check_analytics)
+
+    columnar = subparsers.add_parser('columnar', help='Typed column fetch vs. fetchall tuples into a DataFrame')
+    columnar.add_argument('--rows', type=int, default=1_000_000)
+    columnar.add_argument('--repeat', type=int, default=3)
+    columnar.set_defaults(func=bench_columnar)
+
+    charts_bench = subparsers.add_parser('charts', help='Dashboard figure build and serialization, cached and not')
+    charts_bench.add_argument('--rows', type=int, default=100_000)
+    charts_bench.add_argument('--repeat', type=int, default=20)
+    charts_bench.set_defaults(func=bench_charts)
+
+    spending_check = subparsers.add_parser('spending', help='Running spending totals over multi-year ranges')
+    spending_check.add_argument('--rows', type=int, default=200_000)
+    spending_check.add_argument('--years', type=int, nargs='+', default=[1, 3, 10])
+    spending_check.add_argument('--repeat', type=int, default=5)
+    spending_check.set_defaults(func=bench_spending)
+
+    importtime = subparsers.add_parser('importtime', help='Fail if main.py imports are over budget or not deferred')
+    importtime.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    importtime.add_argument('--repeat', type=int, default=5)
+    importtime.add_argument('--top', type=int, default=10, help='Slowest direct imports of main to list')
+    importtime.set_defaults(func=check_importtime)
+
+    calendar_check = subparsers.add_parser('calendar', help='Calendar notes: per-date lookups vs. one window query')
+    calendar_check.add_argument('--years', type=int, nargs='+', default=[1, 10, 50], help='Note history lengths')
+    calendar_check.add_argument('--per-month', type=int, default=20)
+    calendar_check.add_argument('--repeat', type=int, default=3)
+    calendar_check.set_defaults(func=bench_calendar)
+
+    recurrence = subparsers.add_parser('recurrence', help='Recurring rule expansion: correctness and windowed cost')
+    recurrence.add_argument('--fuzz', type=int, default=5_000, help='Random rules to compare with dateutil')
+    recurrence.add_argument('--rules', type=int, default=50)
+    recurrence.add_argument('--years', type=int, default=10)
+    recurrence.add_argument('--repeat', type=int, default=5)
+    recurrence.add_argument('--seed', type=int, default=1)
+    recurrence.set_defaults(func=bench_recurrence)
+
+    categorizer = subparsers.add_parser('categorizer', help='Local item categorization accuracy and latency')
+    categorizer.add_argument('--history', type=int, default=1_000, help='Synthetic past purchases')
+    categorizer.add_argument('--samples', type=int, default=2_000)
+    categorizer.add_argument('--min-confidence', type=float, default=0.7)
+    categorizer.add_argument('--min-precision', type=float, default=0.95)
+    categorizer.add_argument('--seed', type=int, default=1)
+    categorizer.set_defaults(func=bench_categorizer)
+
+    receipts = subparsers.add_parser('receipts', help='Batch receipt extraction against the local stub server')
+    receipts.add_argument('--files', type=int, default=24)
+    receipts.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    receipts.add_argument('--latency', type=float, default=0.5)
+    receipts.add_argument('--fail-rate', type=float, default=0.1)
+    receipts.add_argument('--image', default='recipts/rec1.jpg')
+    receipts.set_defaults(func=bench_receipts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
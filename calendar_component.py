@@ -1,31 +1,71 @@
 import streamlit as st
 import streamlit_calendar as st_calendar
-from datetime import datetime, timedelta
-from database import Database
+from datetime import date, timedelta
+from database import get_database
+
+REPEATS = {'Daily': 'DAILY', 'Weekly': 'WEEKLY', 'Monthly': 'MONTHLY', 'Yearly': 'YEARLY'}
+SPENDING_COLOR = '#9E9E9E'
+
+
+def add_months(day, months):
+    """First day of the month `months` after the month of day."""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def show_month(month):
+    st.session_state.calendar_month = month
+
 
 def calendar_page():
     st.title("Calendar")
 
-    db = Database()
+    db = get_database()
+
+    if 'calendar_month' not in st.session_state:
+        st.session_state.calendar_month = date.today().replace(day=1)
+    month = st.session_state.calendar_month
+
+    # One range query for the month shown and the months either side, whose
+    # first and last days appear in the month grid. Other months are loaded
+    # when they are navigated to.
+    window_start, window_end = add_months(month, -1), add_months(month, 2) - timedelta(days=1)
+    notes_by_date = db.get_notes_in_range(window_start, window_end)
+    # Recurring rules are expanded and cached a month at a time.
+    recurring = {}
+    for shown in (add_months(month, -1), month, add_months(month, 1)):
+        recurring.update(db.get_recurring_occurrences(shown))
 
     col1, col2 = st.columns([2, 3])
 
     with col1:
-        st.subheader("Existing Events")
-        dates_with_notes = db.get_dates_with_notes()
-        for date in dates_with_notes:
-            notes = db.get_notes(date)
-            st.write(f"**{date.strftime('%Y-%m-%d')}**")
+        st.subheader(f"Events in {month.strftime('%B %Y')}")
+        for day, notes in notes_by_date.items():
+            if (day.year, day.month) != (month.year, month.month):
+                continue
+            st.write(f"**{day.strftime('%Y-%m-%d')}**")
             for note in notes:
                 col_note, col_delete = st.columns([4, 1])
                 with col_note:
                     st.markdown(f"<span style='color:{note['color']};'>- {note['text']}</span>", unsafe_allow_html=True)
                 with col_delete:
-                    if st.button("Delete", key=f"delete_{date}_{note['id']}"):
+                    if st.button("Delete", key=f"delete_{day}_{note['id']}"):
                         db.delete_note(note['id'])
                         st.rerun()
             st.write("---")
 
+        st.subheader("Recurring Events")
+        for rule in db.get_recurring_rules():
+            col_rule, col_delete = st.columns([4, 1])
+            with col_rule:
+                amount = f" €{rule['amount']:.2f}" if rule['amount'] is not None else ''
+                st.markdown(f"<span style='color:{rule['color']};'>- {rule['title']}{amount}</span> "
+                            f"<small>{rule['rule']} from {rule['start_date']}</small>", unsafe_allow_html=True)
+            with col_delete:
+                if st.button("Delete", key=f"delete_rule_{rule['id']}"):
+                    db.delete_recurring_rule(rule['id'])
+                    st.rerun()
+
         st.subheader("Add New Event")
         with st.form("add_event_form"):
             event_title = st.text_input("Event Title")
@@ -33,31 +73,83 @@ def calendar_page():
             event_color = st.color_picker("Event Color", "#3DD56D")
             if st.form_submit_button("Add Event"):
                 db.add_note(event_date, event_title, event_color)
+                show_month(event_date.replace(day=1))
                 st.rerun()
 
+        st.subheader("Add Recurring Event")
+        with st.form("add_recurring_form"):
+            rule_title = st.text_input("Title", key="rule_title")
+            rule_kind = st.radio("Type", ["Note", "Transaction"], horizontal=True, key="rule_kind")
+            repeats = st.selectbox("Repeats", list(REPEATS), index=2, key="rule_repeats")
+            interval = st.number_input("Every (days, weeks, months or years)", min_value=1, value=1, step=1,
+                                       key="rule_interval")
+            rule_start = st.date_input("Starting", key="rule_start")
+            rule_end = st.date_input("Ending (optional)", value=None, key="rule_end")
+            rule_amount = st.number_input("Amount (€, transactions only)", min_value=0.0, step=0.01,
+                                          format="%.2f", key="rule_amount")
+            rule_category = st.selectbox("Category (transactions only)", db.get_categories(), key="rule_category")
+            rule_color = st.color_picker("Color", "#3D8BD5", key="rule_color")
+            custom_rule = st.text_input("Custom rule (optional)", placeholder="FREQ=WEEKLY;BYDAY=MO,TH",
+                                        key="rule_custom")
+            if st.form_submit_button("Add Recurring Event"):
+                rule = custom_rule.strip() or f"FREQ={REPEATS[repeats]};INTERVAL={interval}"
+                if rule_end:
+                    rule += f";UNTIL={rule_end.strftime('%Y%m%d')}"
+                transaction = rule_kind == "Transaction"
+                try:
+                    db.add_recurring_rule(rule_title, rule, rule_start, kind=rule_kind.lower(), color=rule_color,
+                                          amount=rule_amount if transaction else None,
+                                          category=rule_category if transaction else None)
+                except ValueError as e:
+                    st.error(f"Could not add the rule: {e}")
+                else:
+                    show_month(rule_start.replace(day=1))
+                    st.rerun()
+
     with col2:
-        events = []
-        for date in dates_with_notes:
-            notes = db.get_notes(date)
-            for note in notes:
-                events.append({
-                    "title": note['text'],
-                    "start": date.isoformat(),
-                    "backgroundColor": note['color'],
-                    "borderColor": note['color']
-                })
+        col_previous, col_today, col_next = st.columns(3)
+        col_previous.button("◀ Previous", on_click=show_month, args=(add_months(month, -1),),
+                            use_container_width=True)
+        col_today.button("Today", on_click=show_month, args=(date.today().replace(day=1),),
+                         use_container_width=True)
+        col_next.button("Next ▶", on_click=show_month, args=(add_months(month, 1),), use_container_width=True)
+
+        events = [{
+            "title": note['text'],
+            "start": day.isoformat(),
+            "backgroundColor": note['color'],
+            "borderColor": note['color']
+        } for day, notes in notes_by_date.items() for note in notes]
+        events += [{
+            "title": f"{entry['title']} €{entry['amount']:.2f}" if entry['amount'] is not None else entry['title'],
+            "start": day.isoformat(),
+            "backgroundColor": entry['color'],
+            "borderColor": entry['color']
+        } for day, entries in recurring.items() for entry in entries]
+
+        if st.checkbox("Show daily spending", value=True, key="calendar_spending"):
+            events += [{
+                "title": f"Spent €{total:.2f}",
+                "start": day.isoformat(),
+                "backgroundColor": SPENDING_COLOR,
+                "borderColor": SPENDING_COLOR
+            } for day, total in db.get_daily_spending(window_start, window_end, type='expense')]
 
+        # Month navigation is done with the buttons above, since the widget
+        # does not report which dates it shows.
         calendar = st_calendar.calendar(
             events=events,
             options={
                 "initialView": "dayGridMonth",
+                "initialDate": month.isoformat(),
                 "headerToolbar": {
-                    "left": "prev,next today",
+                    "left": "",
                     "center": "title",
                     "right": "dayGridMonth,timeGridWeek,timeGridDay"
                 },
             },
-            callbacks=["eventClick", "select"]
+            callbacks=["eventClick", "select"],
+            key=f"calendar_{month.isoformat()}"
         )
 
         if calendar.get("eventClick"):
@@ -65,4 +157,4 @@ def calendar_page():
             st.write(f"Event clicked: {clicked_event['title']}")
 
         if calendar.get("select"):
-            st.write("Date range selected:", calendar["select"]["startStr"], "to", calendar["select"]["endStr"])
\ No newline at end of file
+            st.write("Date range selected:", calendar["select"]["startStr"], "to", calendar["select"]["endStr"])
@@ -0,0 +1,194 @@
+"""Categorize receipt items locally from the transaction history.
+
+Three layers are tried in order:
+- an exact match on the normalized item name,
+- a match on the item's words, ignoring order, case, sizes and
+  percentages ("PENNY MILCH 3,5%" and "Penny Milch 3.5 %"),
+- a multinomial naive Bayes classifier over words and character
+  trigrams, which copes with abbreviations ("ROSTBR.") and new spellings.
+
+Every prediction carries a confidence. categorize_items only asks the
+model about items that fall below the threshold.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from tags import split_tags
+
+DEFAULT_MIN_CONFIDENCE = 0.7
+# The extraction prompt's catch-all, used when nothing else is available.
+FALLBACK_CATEGORY = 'Groceries'
+
+_WORD = re.compile(r'[^\W\d_]{2,}')
+
+
+def normalize_item(name):
+    return ' '.join(unicodedata.normalize('NFKC', name or '').casefold().split())
+
+
+def item_tokens(name):
+    return _WORD.findall(normalize_item(name))
+
+
+def item_features(name):
+    tokens = item_tokens(name)
+    features = [f'w:{token}' for token in tokens]
+    for token in tokens:
+        padded = f' {token} '
+        features.extend(f'c:{padded[i:i + 3]}' for i in range(len(padded) - 2))
+    return features
+
+
+@dataclass
+class Prediction:
+    category: str = None
+    item_type: str = ''
+    confidence: float = 0.0
+    # 'exact', 'tokens', 'classifier', or None when nothing matched.
+    source: str = None
+
+
+class NaiveBayes:
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.priors = {}
+        self.likelihoods = {}
+        self.unseen = {}
+        self.vocabulary = set()
+
+    def fit(self, samples):
+        """samples is an iterable of (features, label, weight)."""
+        class_weights = Counter()
+        feature_weights = defaultdict(Counter)
+        for features, label, weight in samples:
+            class_weights[label] += weight
+            for feature in features:
+                feature_weights[label][feature] += weight
+        self.vocabulary = {feature for counts in feature_weights.values() for feature in counts}
+        total = sum(class_weights.values())
+        for label, weight in class_weights.items():
+            counts = feature_weights[label]
+            denominator = math.log(sum(counts.values()) + self.alpha * len(self.vocabulary))
+            self.priors[label] = math.log(weight / total)
+            self.likelihoods[label] = {feature: math.log(count + self.alpha) - denominator
+                                       for feature, count in counts.items()}
+            self.unseen[label] = math.log(self.alpha) - denominator
+        return self
+
+    def predict(self, features):
+        """Return (label, posterior probability), or (None, 0.0) if none of
+        the features were seen in training."""
+        features = [feature for feature in features if feature in self.vocabulary]
+        if not features:
+            return None, 0.0
+        scores = {}
+        for label, prior in self.priors.items():
+            likelihoods, unseen = self.likelihoods[label], self.unseen[label]
+            scores[label] = prior + sum(likelihoods.get(feature, unseen) for feature in features)
+        best = max(scores, key=scores.get)
+        return best, 1.0 / sum(math.exp(score - scores[best]) for score in scores.values())
+
+
+def _majority(labels):
+    # One earlier purchase is good evidence but not proof, hence the 0.25.
+    (label, count), = labels.most_common(1)
+    return label, count / (sum(labels.values()) + 0.25)
+
+
+class Categorizer:
+    def __init__(self):
+        self.exact = defaultdict(Counter)
+        self.tokens = defaultdict(Counter)
+        self.categories = NaiveBayes()
+        self.item_types = NaiveBayes()
+
+    @classmethod
+    def train(cls, rows):
+        """rows are (item, category, tag, count), as returned by
+        Database.get_item_labels."""
+        categorizer = cls()
+        samples = []
+        for item, category, tag, count in rows:
+            if not category:
+                continue
+            label = (category, ','.join(split_tags(tag)))
+            categorizer.exact[normalize_item(item)][label] += count
+            tokens = item_tokens(item)
+            if tokens:
+                categorizer.tokens[' '.join(sorted(set(tokens)))][label] += count
+            samples.append((item_features(item), label, 1 + math.log(count)))
+        categorizer.categories.fit((features, category, weight) for features, (category, _), weight in samples)
+        categorizer.item_types.fit((features, item_type, weight) for features, (_, item_type), weight in samples)
+        return categorizer
+
+    @classmethod
+    def from_database(cls, db):
+        return cls.train(db.get_item_labels())
+
+    def predict(self, item):
+        labels = self.exact.get(normalize_item(item))
+        if labels:
+            (category, item_type), confidence = _majority(labels)
+            return Prediction(category, item_type, confidence, 'exact')
+
+        tokens = item_tokens(item)
+        labels = self.tokens.get(' '.join(sorted(set(tokens))))
+        if labels:
+            (category, item_type), confidence = _majority(labels)
+            return Prediction(category, item_type, 0.95 * confidence, 'tokens')
+
+        features = item_features(item)
+        category, category_confidence = self.categories.predict(features)
+        if category is None:
+            return Prediction()
+        item_type, item_type_confidence = self.item_types.predict(features)
+        # Naive Bayes is confidently wrong about products it has never seen,
+        # so scale by how much of the name occurred in training at all.
+        seen = sum(feature in self.categories.vocabulary for feature in features) / len(features)
+        confidence = min(category_confidence, item_type_confidence) * seen
+        return Prediction(category, item_type or '', confidence, 'classifier')
+
+
+def categorize_items(items, categorizer, min_confidence=DEFAULT_MIN_CONFIDENCE, ask_model=None):
+    """Fill in 'Category' and 'Item Type' on extracted receipt items, in
+    place, and return a Counter of where each label came from.
+
+    Items below min_confidence keep a category the extraction already
+    supplied; otherwise they are sent in one batch to ask_model, a function
+    from item names to {name: (category, item type)}. If that is missing
+    or fails, the local best guess is used.
+    """
+    sources = Counter()
+    unsure = []
+    for item in items:
+        prediction = categorizer.predict(item.get('Item'))
+        if prediction.confidence >= min_confidence:
+            item['Category'], item['Item Type'] = prediction.category, prediction.item_type
+            sources[prediction.source] += 1
+        elif item.get('Category'):
+            sources['extraction'] += 1
+        else:
+            unsure.append((item, prediction))
+
+    answers = {}
+    if unsure and ask_model is not None:
+        try:
+            answers = ask_model(list(dict.fromkeys(item.get('Item') or '' for item, _ in unsure)))
+        except Exception:
+            answers = {}
+    for item, prediction in unsure:
+        answer = answers.get(item.get('Item') or '')
+        if answer:
+            item['Category'], item['Item Type'] = answer
+            sources['model'] += 1
+        elif prediction.category:
+            item['Category'], item['Item Type'] = prediction.category, prediction.item_type
+            sources['guess'] += 1
+        else:
+            item['Category'] = FALLBACK_CATEGORY
+            item.setdefault('Item Type', '')
+            sources['default'] += 1
+    return sources
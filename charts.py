@@ -1,45 +1,33 @@
+import json
 import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta, date
+from plotly.colors import qualitative
+import plotly.io as pio
+import numpy as np
 import pandas as pd
+from query_cache import QueryCache
 
-def create_monthly_expense_chart(data):
-    if not data:
+def create_monthly_expense_chart(series, title='Cumulative Monthly Expenses'):
+    """Line chart of a spending.SpendingSeries total, one point per day."""
+    if not len(series.dates):
         fig = go.Figure()
-        fig.add_annotation(text="No expense data available for this month", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+        fig.add_annotation(text="No expense data available for this period", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
     else:
-        # Convert data to DataFrame
-        df = pd.DataFrame(data, columns=['day', 'cumulative_total'])
-        df['day'] = df['day'].astype(int)
-        
-        # Get the current month and year
-        current_date = date.today()
-        year, month = current_date.year, current_date.month
-        
-        # Create a date range for the entire month
-        start_date = date(year, month, 1)
-        end_date = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-        date_range = pd.date_range(start=start_date, end=end_date)
-        
-        # Create a full DataFrame with all days of the month
-        full_df = pd.DataFrame({'date': date_range, 'day': date_range.day})
-        
-        # Merge with the expense data and fill missing values
-        df = pd.merge(full_df, df, on='day', how='left').ffill().fillna(0)
-        
+        # Long ranges are drawn with WebGL and without per-day markers.
+        long_range = len(series.dates) > WEBGL_THRESHOLD
         fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df['date'], 
-            y=df['cumulative_total'], 
-            mode='lines+markers',
+        fig.add_trace((go.Scattergl if long_range else go.Scatter)(
+            x=series.dates,
+            y=series.total,
+            mode='lines' if long_range else 'lines+markers',
             line=dict(color='#1E90FF', width=2),
-            hovertemplate='Date: %{x|%Y-%m-%d}<br>Cumulative Amount: $%{y:.2f}<extra></extra>'
+            hovertemplate='Date: %{x|%Y-%m-%d}<br>Amount: €%{y:.2f}<extra></extra>'
         ))
-    
+
     fig.update_layout(
-        title='Cumulative Monthly Expenses',
+        template='none',
+        title=title,
         xaxis_title='Date',
-        yaxis_title='Cumulative Amount ($)',
+        yaxis_title='Amount (€)',
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)',
         yaxis=dict(gridcolor='rgba(200,200,200,0.2)'),
@@ -63,12 +51,13 @@ def create_expense_category_chart(data):
         fig = go.Figure()
         fig.add_annotation(text="No expense data available for this period", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
     else:
+        import plotly.express as px
         categories, amounts = zip(*data)
         fig = px.pie(
             names=categories,
             values=amounts,
             title='Expenses by Category',
-            color_discrete_sequence=px.colors.qualitative.Set3
+            color_discrete_sequence=qualitative.Set3
         )
         fig.update_traces(textposition='inside', textinfo='percent+label')
     
@@ -78,4 +67,94 @@ def create_expense_category_chart(data):
         paper_bgcolor='rgba(0,0,0,0)',
         margin=dict(l=20, r=20, t=40, b=20),
     )
-    return fig
\ No newline at end of file
+    return fig
+
+
+# Lean figures for the dashboard and report page. They take pre-aggregated
+# arrays and use graph_objects directly, which is much cheaper than
+# plotly.express. Labels use one texttemplate instead of a per-bar text
+# array and are dropped past TEXT_LABEL_LIMIT bars, where they would
+# overlap anyway. Ranges longer than WEBGL_THRESHOLD points are drawn as a
+# WebGL line. No template is embedded, since Streamlit applies its own theme.
+TEXT_LABEL_LIMIT = 400
+WEBGL_THRESHOLD = 366
+FIGURE_CACHE_BYTES = 8 * 1024 * 1024
+
+figure_cache = QueryCache(max_bytes=FIGURE_CACHE_BYTES)
+
+
+def _layout(**layout):
+    return dict(template='none', plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', **layout)
+
+
+def daily_expenses_figure(dates, amounts, title, height=400):
+    amounts = np.asarray(amounts, dtype=float)
+    if len(amounts) > WEBGL_THRESHOLD:
+        trace = go.Scattergl(x=dates, y=amounts, mode='lines', line=dict(color='#1E90FF'),
+                             hovertemplate='%{x|%d %b %Y}<br>€%{y:.2f}<extra></extra>')
+    else:
+        trace = go.Bar(x=dates, y=amounts,
+                       marker=dict(color=amounts, colorscale=qualitative.Set3),
+                       hovertemplate='%{x|%d %b}<br>€%{y:.2f}<extra></extra>')
+        if len(amounts) <= TEXT_LABEL_LIMIT:
+            trace.update(texttemplate='%{y:.2f}€', textposition='outside')
+    return go.Figure(trace, layout=_layout(
+        title=title, height=height, bargap=0.2, font=dict(color='black'),
+        xaxis=dict(title='Date', tickformat='%d %b'), yaxis=dict(title='Total Spent (€)'),
+    ))
+
+
+def category_pie_figure(categories, amounts, height=400):
+    return go.Figure(go.Pie(
+        labels=categories, values=amounts, marker=dict(colors=qualitative.Set3),
+        textposition='inside', texttemplate='%{label}<br>€%{value:.2f}',
+        hovertemplate='<b>%{label}</b><br>Amount: €%{value:.2f}<br>%{percent}<extra></extra>',
+    ), layout=_layout(title='Expenses by Category', height=height, showlegend=False,
+                      margin=dict(l=20, r=20, t=40, b=20)))
+
+
+def monthly_expenses_figure(months, amounts, title):
+    months = pd.DatetimeIndex(months)
+    trace = go.Bar(x=months, y=amounts, opacity=0.8,
+                   marker=dict(color='royalblue', line=dict(color='darkblue', width=1.5)))
+    if len(months) <= TEXT_LABEL_LIMIT:
+        trace.update(texttemplate='%{y:.2f}', textposition='outside')
+    return go.Figure(trace, layout=_layout(
+        title=title, font=dict(family='Arial', size=14), yaxis=dict(title='Total Expenses (€)'),
+        xaxis=dict(title='Month', tickmode='array', tickvals=months,
+                   ticktext=months.strftime('%b %Y'), tickangle=45),
+    ))
+
+
+def stacked_monthly_figure(frame, title, legend_title):
+    """Stacked bars of a months x names frame, one trace per column."""
+    months = pd.DatetimeIndex(frame.index)
+    labelled = frame.size <= TEXT_LABEL_LIMIT
+    traces = []
+    for name, values in zip(frame.columns, frame.to_numpy(dtype=float).T):
+        trace = go.Bar(x=months, y=values, name=name)
+        if labelled:
+            trace.update(texttemplate='%{y:.2f}', textposition='inside')
+        traces.append(trace)
+    return go.Figure(traces, layout=_layout(
+        title=title, barmode='stack', legend_title=legend_title, font=dict(family='Arial', size=14),
+        yaxis=dict(title='Total Amount (€)'),
+        xaxis=dict(title='Month', tickmode='array', tickvals=months, ticktext=months.strftime('%b %Y')),
+    ))
+
+
+def cached_figure(db, name, params, build):
+    """The figure build() returns, as a dict ready for st.plotly_chart.
+
+    Its JSON is cached under (name, params, data generation) until the next
+    write, like the query cache, so reruns without new data skip both
+    building and serializing it. Every call returns a fresh dict.
+    """
+    generation = db.pool.generation
+    key = (name, params, db.pool.db_name, generation)
+    found, payload = figure_cache.get(key)
+    if not found:
+        payload = pio.to_json(build(), validate=False)
+        if db.pool.generation == generation:
+            figure_cache.put(key, payload)
+    return json.loads(payload)
@@ -0,0 +1,77 @@
+"""Read query results straight into typed column arrays.
+
+fetch_frame pulls rows from a cursor in batches of fetchmany and copies
+each batch into growing NumPy arrays, one per column, so only one batch
+of row tuples is alive at a time. Column kinds:
+
+    'date'      datetime64, from days since 1970-01-01 as selected by
+                epoch_days(column), so no date strings are parsed
+    'float'     float64, NULL as NaN
+    'int'       int64
+    'category'  pandas Categorical, each distinct string stored once
+    'str'       object array of str/None
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_BATCH_SIZE = 10_000
+
+_DTYPES = {'date': np.int64, 'float': np.float64, 'int': np.int64, 'category': np.int32, 'str': object}
+
+
+class _Column:
+    def __init__(self, kind, capacity):
+        self.kind = kind
+        self.values = np.empty(capacity, dtype=_DTYPES[kind])
+        # For 'category': value -> code, in order of first appearance.
+        self.codes = {} if kind == 'category' else None
+
+    def grow(self, capacity):
+        values = np.empty(capacity, dtype=self.values.dtype)
+        values[:len(self.values)] = self.values
+        self.values = values
+
+    def fill(self, start, batch):
+        end = start + len(batch)
+        if self.kind == 'category':
+            # Factorize the batch in C, then map its few distinct values to
+            # codes for the whole result; index -1 (NULL) picks the final -1.
+            batch_codes, uniques = pd.factorize(np.array(batch, dtype=object))
+            lookup = [self.codes.setdefault(value, len(self.codes)) for value in uniques]
+            self.values[start:end] = np.array(lookup + [-1], dtype=np.int32)[batch_codes]
+        else:
+            self.values[start:end] = batch
+
+    def finish(self, size):
+        values = self.values[:size]
+        if self.kind == 'category':
+            return pd.Categorical.from_codes(values, categories=list(self.codes))
+        if self.kind == 'date':
+            return values.astype('datetime64[D]').astype('datetime64[ns]')
+        return values
+
+
+def epoch_days(column):
+    """SQL for a DATE column as whole days since 1970-01-01."""
+    return f"CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+
+def fetch_frame(cursor, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """Build a DataFrame from the rows left on an executed cursor.
+
+    columns maps each result column, in order, to its name in the frame
+    and one of the kinds above: {'Amount': 'float', 'Date': 'date', ...}.
+    """
+    arrays = [_Column(kind, batch_size) for kind in columns.values()]
+    size = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if size + len(rows) > len(arrays[0].values):
+            for column in arrays:
+                column.grow(max(2 * len(column.values), size + len(rows)))
+        for column, batch in zip(arrays, zip(*rows)):
+            column.fill(size, batch)
+        size += len(rows)
+    return pd.DataFrame({name: column.finish(size) for name, column in zip(columns, arrays)}, copy=False)
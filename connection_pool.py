@@ -0,0 +1,203 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.request import pathname2url
+
+
+@dataclass
+class ConnectionProfile:
+    """PRAGMA settings applied to every pooled connection."""
+    journal_mode: str = 'WAL'
+    synchronous: str = 'NORMAL'
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -20000  # negative values are KiB
+    read_only_readers: bool = True
+
+    def apply(self, conn, writer):
+        # journal_mode is persistent and needs write access, so only the
+        # writer sets it; readers pick it up from the database file.
+        if writer:
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+
+
+# Seconds between checks of PRAGMA data_version when reading generation.
+DATA_VERSION_INTERVAL = 0.25
+
+# SQLite's defaults, kept for comparison in benchmarks.
+ROLLBACK_JOURNAL_PROFILE = ConnectionProfile(
+    journal_mode='DELETE', synchronous='FULL', mmap_size=0, cache_size=-2000, read_only_readers=False
+)
+
+
+class ConnectionPool:
+    """Thread-safe SQLite connections: a bounded set of reader connections
+    handed out one per thread at a time, and a single writer serialized
+    behind a lock."""
+
+    def __init__(self, db_name, max_readers=8, timeout=10.0, profile=None):
+        self.db_name = db_name
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self.profile = profile or ConnectionProfile()
+
+        self._idle_readers = queue.LifoQueue()
+        self._readers_open = 0
+        self._readers_lock = threading.Lock()
+
+        self._writer = self._connect(writer=True)
+        self._write_lock = threading.Lock()
+        # Bumped on every commit, so readers can tell whether data changed.
+        self._generation = 0
+        self._data_version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+        self._data_version_checked = time.monotonic()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'read_checkouts': 0,
+            'read_wait_total': 0.0,
+            'read_wait_max': 0.0,
+            'writes': 0,
+            'write_wait_total': 0.0,
+            'write_wait_max': 0.0,
+            'version_checks': 0,
+        }
+
+    def _connect(self, writer=False):
+        target, uri = self.db_name, False
+        if not writer and self.profile.read_only_readers:
+            target, uri = f"file:{pathname2url(os.path.abspath(self.db_name))}?mode=ro", True
+        conn = sqlite3.connect(
+            target,
+            uri=uri,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=self.profile.busy_timeout_ms / 1000,
+        )
+        self.profile.apply(conn, writer=writer)
+        return conn
+
+    def _checkout_reader(self):
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if self._readers_open < self.max_readers:
+                self._readers_open += 1
+                return self._connect()
+        try:
+            return self._idle_readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No reader connection became free within {self.timeout}s")
+
+    def _record_wait(self, kind, waited):
+        with self._stats_lock:
+            self._stats[f'{kind}_wait_total'] += waited
+            self._stats[f'{kind}_wait_max'] = max(self._stats[f'{kind}_wait_max'], waited)
+
+    @contextmanager
+    def reader(self):
+        # In-memory databases are private to their connection, so every
+        # query has to go through the writer to see the same data.
+        if self.db_name == ':memory:':
+            with self.writer(commit=False) as cursor:
+                yield cursor
+            return
+
+        started = time.perf_counter()
+        conn = self._checkout_reader()
+        self._record_wait('read', time.perf_counter() - started)
+        with self._stats_lock:
+            self._stats['read_checkouts'] += 1
+        try:
+            yield conn.cursor()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self, commit=True):
+        started = time.perf_counter()
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Writer connection not released within {self.timeout}s")
+        self._record_wait('write', time.perf_counter() - started)
+        try:
+            cursor = self._writer.cursor()
+            try:
+                yield cursor
+            except BaseException:
+                self._writer.rollback()
+                raise
+            if commit:
+                self._writer.commit()
+                self._generation += 1
+                with self._stats_lock:
+                    self._stats['writes'] += 1
+        finally:
+            self._write_lock.release()
+
+    @property
+    def generation(self):
+        """A counter that changes whenever the database may have changed.
+
+        Commits through this pool bump it directly. Commits from other
+        connections (another Database, another Streamlit worker, manage.py)
+        are found by check_external_writes, which runs here at most every
+        DATA_VERSION_INTERVAL seconds, so a burst of cached getters costs
+        no SQL at all.
+        """
+        if time.monotonic() - self._data_version_checked >= DATA_VERSION_INTERVAL:
+            self.check_external_writes()
+        return self._generation
+
+    def check_external_writes(self):
+        """Bump generation if another connection has committed since the
+        last check, judged by the writer's PRAGMA data_version, and return
+        it. If a write is in progress its commit bumps the counter anyway,
+        so the check is skipped rather than waiting for the lock."""
+        if self._write_lock.acquire(blocking=False):
+            try:
+                version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+                self._data_version_checked = time.monotonic()
+                with self._stats_lock:
+                    self._stats['version_checks'] += 1
+                if version != self._data_version:
+                    self._data_version = version
+                    self._generation += 1
+            finally:
+                self._write_lock.release()
+        return self._generation
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['max_readers'] = self.max_readers
+        stats['readers_open'] = self._readers_open
+        stats['readers_idle'] = self._idle_readers.qsize()
+        stats['readers_in_use'] = stats['readers_open'] - stats['readers_idle']
+        if stats['read_checkouts']:
+            stats['read_wait_avg'] = stats['read_wait_total'] / stats['read_checkouts']
+        else:
+            stats['read_wait_avg'] = 0.0
+        return stats
+
+    def close(self):
+        with self._readers_lock:
+            while True:
+                try:
+                    self._idle_readers.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._readers_open -= 1
+        with self._write_lock:
+            self._writer.close()
@@ -1,153 +1,284 @@
-import sqlite3
+import math
+import re
+import threading
 from datetime import datetime, timedelta, date
+from columnar import epoch_days, fetch_frame
+from connection_pool import ConnectionPool
+from dedup import transaction_hash
+from migrations import run_migrations
+from query_cache import QueryCache, cached_query
+from recurrence import KINDS, MAX_COUNT, Rule
+from rollups import rebuild_rollups, rollup_drift
+from tags import link_tags, split_tags
+
+_shared_databases = {}
+_shared_lock = threading.Lock()
+
+
+def get_database(db_name='expense_tracker.db', profile=None):
+    """Return the process-wide Database for db_name, creating it on first use.
+
+    Pages call this at the start of every script run, so commits made by
+    other processes since the last run are noticed before any getter reads
+    its cache.
+    """
+    with _shared_lock:
+        db = _shared_databases.get(db_name)
+        if db is None:
+            db = Database(db_name, profile=profile)
+            _shared_databases[db_name] = db
+    db.pool.check_external_writes()
+    return db
+
+
+# Column names and kinds (see columnar.py) for getters called with
+# columnar=True.
+TRANSACTION_COLUMNS = {'Item': 'str', 'Tags': 'str', 'Amount': 'float', 'Category': 'category',
+                       'Store Name': 'category', 'Date': 'date'}
+DAILY_SPENDING_COLUMNS = {'Date': 'date', 'Amount': 'float'}
+CATEGORY_TOTAL_COLUMNS = {'Category': 'category', 'Amount': 'float'}
+
+
+def parse_quantity(quantity_str):
+    if isinstance(quantity_str, (int, float)):
+        return float(quantity_str)
+    # Extract the numeric part of the quantity
+    match = re.match(r'^([\d.]+)', quantity_str)
+    if match:
+        return float(match.group(1))
+    return 1.0  # Default to 1 if parsing fails
+
 
 class Database:
-    def __init__(self, db_name='expense_tracker.db'):
-        self.conn = sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-        self.add_columns()
-        self.insert_categories()
-        self.update_date_format()
-        self.rename_item_type_to_tag()
+    def __init__(self, db_name='expense_tracker.db', max_readers=8, profile=None, cache_bytes=64 * 1024 * 1024):
+        # Getters run on the pool's read-only reader connections, so the
+        # dashboard and report pages never take a write lock.
+        self.pool = ConnectionPool(db_name, max_readers=max_readers, profile=profile)
+        self.applied_migrations = run_migrations(self.pool)
+        # Getter results are reused until the next commit on this Database.
+        self.query_cache = QueryCache(max_bytes=cache_bytes)
+
+    def _fetchall(self, query, params=()):
+        with self.pool.reader() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def _fetch_frame(self, query, params, columns):
+        with self.pool.reader() as cursor:
+            cursor.execute(query, params)
+            return fetch_frame(cursor, columns)
+
+    def _fetchone(self, query, params=()):
+        with self.pool.reader() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+
+    def _execute(self, query, params=()):
+        with self.pool.writer() as cursor:
+            cursor.execute(query, params)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def cache_stats(self):
+        return self.query_cache.stats()
+
+    def rebuild_rollups(self):
+        """Recompute daily/monthly totals from transactions and return the
+        drift that was found beforehand, per rollup table."""
+        with self.pool.writer() as cursor:
+            drift = rollup_drift(cursor)
+            rebuild_rollups(cursor)
+        return drift
     
-    def rename_item_type_to_tag(self):
-        self.cursor.execute("PRAGMA table_info(transactions)")
-        columns = [column[1] for column in self.cursor.fetchall()]
-        if 'item_type' in columns:
-            self.cursor.execute("ALTER TABLE transactions RENAME COLUMN item_type TO tag")
-        self.conn.commit()
+    def _insert_transactions(self, cursor, rows):
+        # Rows are written under the single writer lock, so the new ids are
+        # exactly those above the previous maximum, in insertion order.
+        # A ninth element, if present, is the row hash computed by the caller.
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+        last_id = cursor.fetchone()[0]
+        cursor.executemany('''
+            INSERT INTO transactions (item, tag, quantity, category, date, type, store_name, amount, row_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row if len(row) > 8 else (*row, transaction_hash(row[4], row[7], row[6], row[0])) for row in rows])
+        cursor.execute('SELECT id FROM transactions WHERE id > ? ORDER BY id', (last_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        link_tags(cursor, [(id, row[4], row[7], split_tags(row[1])) for id, row in zip(ids, rows)])
 
     def add_transaction(self, amount, category, date, type, store_name, item, tags, quantity=1):
         date_obj = self._parse_date(date)
-        self.cursor.execute('''
-            INSERT INTO transactions (item, tag, quantity, category, date, type, store_name, amount)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (item, ','.join(tags), float(quantity), category, date_obj, type, store_name, float(amount)))
-        self.conn.commit()
+        with self.pool.writer() as cursor:
+            self._insert_transactions(cursor, [
+                (item, ','.join(tags), float(quantity), category, date_obj, type, store_name, float(amount))
+            ])
+
+    def _normalize_transaction(self, record):
+        item = record.get('item')
+        category = record.get('category')
+        if not item:
+            raise ValueError("Item is required.")
+        if not category:
+            raise ValueError("Category is required.")
+        amount = float(record['amount'])
+        if not math.isfinite(amount):
+            raise ValueError(f"Invalid amount: {record['amount']!r}")
+        row = (
+            item,
+            ','.join(split_tags(record.get('tags'))),
+            parse_quantity(record.get('quantity', 1)),
+            category,
+            self._parse_date(record['date']),
+            record.get('type') or 'expense',
+            record.get('store_name'),
+            amount,
+        )
+        return row if record.get('row_hash') is None else (*row, record['row_hash'])
 
-    def get_transactions(self):
-        self.cursor.execute('''
-            SELECT item, tag, amount, category, store_name, date
+    def add_transactions_bulk(self, records):
+        """Insert many transactions in a single write transaction.
+
+        Each record is a dict with the keyword arguments of add_transaction
+        (`type` defaults to 'expense'), and optionally the `row_hash` of
+        dedup.transaction_hash if the caller already has it. Rows that fail validation are skipped
+        and reported as (index, message) pairs instead of aborting the batch.
+        Returns (inserted_count, errors).
+        """
+        rows, errors = [], []
+        for index, record in enumerate(records):
+            try:
+                rows.append(self._normalize_transaction(record))
+            except (KeyError, TypeError, ValueError) as e:
+                message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+                errors.append((index, message))
+
+        if rows:
+            with self.pool.writer() as cursor:
+                self._insert_transactions(cursor, rows)
+        return len(rows), errors
+
+    def get_row_hash_counts(self, hashes, max_id=None):
+        """Return {row_hash: number of transactions} for the given hashes,
+        counting only transactions with id <= max_id when it is given."""
+        counts = {}
+        hashes = list(hashes)
+        id_filter = 'AND id <= ?' if max_id is not None else ''
+        # Stay below SQLite's default limit of 999 bound parameters.
+        for start in range(0, len(hashes), 900):
+            batch = hashes[start:start + 900]
+            params = (*batch, max_id) if max_id is not None else batch
+            counts.update(self._fetchall(f'''
+                SELECT row_hash, COUNT(*) FROM transactions
+                WHERE row_hash IN ({','.join('?' * len(batch))}) {id_filter}
+                GROUP BY row_hash
+            ''', params))
+        return counts
+
+    def get_last_transaction_id(self):
+        return self._fetchone('SELECT COALESCE(MAX(id), 0) FROM transactions')[0]
+
+    @cached_query
+    def get_transactions(self, columnar=False):
+        """Every transaction, newest first, as tuples or, with columnar=True,
+        as a DataFrame with TRANSACTION_COLUMNS."""
+        query = '''
+            SELECT item, tag, amount, category, store_name, {date}
             FROM transactions
             ORDER BY date DESC
-        ''')
-        return self.cursor.fetchall()
-
-    def create_tables(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-        ''')
+        '''
+        if columnar:
+            return self._fetch_frame(query.format(date=epoch_days('date')), (), TRANSACTION_COLUMNS)
+        return self._fetchall(query.format(date='date'))
 
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item TEXT NOT NULL,
-                item_type TEXT,
-                quantity REAL DEFAULT 1,
-                category TEXT NOT NULL,
-                date DATE NOT NULL,
-                type TEXT NOT NULL,
-                store_name TEXT,
-                amount REAL NOT NULL
-            )
-        ''')
+    @cached_query
+    def get_transactions_page(self, start_date=None, end_date=None, category=None, store=None,
+                              tag=None, text=None, after=None, limit=100, columnar=False):
+        """Return one page of transactions, newest first, and the cursor for
+        the next page (None when there are no more rows). With columnar=True
+        the page is a DataFrame with TRANSACTION_COLUMNS.
 
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS balances (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL NOT NULL,
-                date DATE NOT NULL
-            )
-        ''')
+        Pages are keyed on (date, id) rather than OFFSET, so each page costs
+        the same no matter how deep into the history it is. Pass the returned
+        cursor back as `after` to fetch the following page.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append('date >= ?')
+            params.append(self._parse_date(start_date))
+        if end_date:
+            conditions.append('date <= ?')
+            params.append(self._parse_date(end_date))
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+        if store:
+            conditions.append('store_name = ?')
+            params.append(store)
+        if tag:
+            conditions.append('''id IN (
+                SELECT transaction_tags.transaction_id
+                FROM tags JOIN transaction_tags ON transaction_tags.tag_id = tags.id
+                WHERE tags.name = ?
+            )''')
+            params.append(tag)
+        if text:
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("(item LIKE ? ESCAPE '\\' OR store_name LIKE ? ESCAPE '\\')")
+            params.extend([f'%{escaped}%'] * 2)
+        if after:
+            conditions.append('(date, id) < (?, ?)')
+            params.extend(after)
 
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS loans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL NOT NULL,
-                date DATE NOT NULL
-            )
-        ''')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f'''
+            SELECT id, item, tag, amount, category, store_name, {{date}}
+            FROM transactions
+            {where}
+            ORDER BY date DESC, id DESC
+            LIMIT ?
+        '''
+        if columnar:
+            frame = self._fetch_frame(query.format(date=epoch_days('date')), (*params, limit + 1),
+                                      {'id': 'int', **TRANSACTION_COLUMNS})
+            next_cursor = None
+            if len(frame) > limit:
+                frame = frame.iloc[:limit]
+                next_cursor = (frame['Date'].iloc[-1].date(), int(frame['id'].iloc[-1]))
+            return frame.drop(columns='id'), next_cursor
 
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS savings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL NOT NULL,
-                date DATE NOT NULL
-            )
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL,
-                note TEXT NOT NULL,
-                color TEXT DEFAULT '#3DD56D'
-            )
-        ''')
-        
-        # Add color column to existing notes table if it doesn't exist
-        self.cursor.execute("PRAGMA table_info(notes)")
-        columns = [column[1] for column in self.cursor.fetchall()]
-        if 'color' not in columns:
-            self.cursor.execute("ALTER TABLE notes ADD COLUMN color TEXT DEFAULT '#3DD56D'")
-        
-        self.conn.commit()
-
-    def add_columns(self):
-        for table in ['transactions', 'balances', 'loans', 'savings']:
-            self.cursor.execute(f"PRAGMA table_info({table})")
-            columns = [column[1] for column in self.cursor.fetchall()]
-            if 'date' not in columns:
-                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN date DATE")
-        self.conn.commit()
-
-    def insert_categories(self):
-        categories = [
-            'Housing', 'Utilities', 'Transportation', 'Groceries', 'Healthcare', 'Insurance',
-            'Savings and Investments', 'Debt Repayment', 'Personal Care', 'Entertainment and Leisure',
-            'Income', 'Other'
-        ]
-        self.cursor.executemany('''
-            INSERT OR IGNORE INTO categories (name) VALUES (?)
-        ''', [(category,) for category in categories])
-        self.conn.commit()
-
-    def update_date_format(self):
-        for table in ['transactions', 'balances', 'loans', 'savings']:
-            self.cursor.execute(f"SELECT id, date FROM {table}")
-            rows = self.cursor.fetchall()
-            for row in rows:
-                id, old_date = row
-                if isinstance(old_date, str):
-                    try:
-                        new_date = datetime.strptime(old_date, '%d-%m-%Y').date()
-                    except ValueError:
-                        try:
-                            new_date = datetime.strptime(old_date, '%Y-%m-%d').date()
-                        except ValueError:
-                            continue
-                    self.cursor.execute(f"UPDATE {table} SET date = ? WHERE id = ?", (new_date, id))
-        self.conn.commit()
+        rows = self._fetchall(query.format(date='date'), (*params, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][6], rows[-1][0])
+        return [row[1:] for row in rows], next_cursor
+
+    @cached_query
+    def get_stores(self):
+        return [row[0] for row in self._fetchall('''
+            SELECT DISTINCT store_name FROM transactions
+            WHERE store_name IS NOT NULL AND store_name != ''
+            ORDER BY store_name
+        ''')]
+
+    @cached_query
+    def get_tags(self):
+        return [row[0] for row in self._fetchall('SELECT name FROM tags ORDER BY name')]
 
+    @cached_query
     def get_transaction_for_this_month(self):
         current_date = datetime.now()
         start_date = current_date.replace(day=1).date()
         end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        self.cursor.execute('''
+        return self._fetchall('''
         SELECT item, category, amount, date
         FROM transactions
         WHERE date BETWEEN ? AND ?
         ''', (start_date, end_date))
-        
-        return self.cursor.fetchall()
 
+    @cached_query
     def get_balance(self):
-        self.cursor.execute('SELECT amount FROM balances ORDER BY date DESC LIMIT 1')
-        result = self.cursor.fetchone()
+        result = self._fetchone('SELECT amount FROM balances ORDER BY date DESC LIMIT 1')
         return result[0] if result else 0
     
     def get_loan(self):
@@ -155,42 +286,53 @@ class Database:
     def get_savings(self):
         return 8000
 
+    @cached_query
     def get_categories(self):
-        self.cursor.execute('SELECT name FROM categories')
-        return [category[0] for category in self.cursor.fetchall()]
+        return [category[0] for category in self._fetchall('SELECT name FROM categories')]
 
-    def get_expenses_by_category(self, start_date, end_date):
+    @cached_query
+    def get_item_labels(self):
+        # How often each expense item was filed under each category and tag.
+        return self._fetchall('''
+            SELECT item, category, tag, COUNT(*)
+            FROM transactions
+            WHERE type = 'expense' AND item IS NOT NULL AND item != ''
+            GROUP BY item, category, tag
+        ''')
+
+    @cached_query
+    def get_expenses_by_category(self, start_date, end_date, columnar=False):
         start_date = self._parse_date(start_date)
         end_date = self._parse_date(end_date)
-        self.cursor.execute('''
+        query = '''
             SELECT category, SUM(amount)
-            FROM transactions
+            FROM daily_totals
             WHERE type = 'expense' AND date BETWEEN ? AND ?
             GROUP BY category
-        ''', (start_date, end_date))
-        return self.cursor.fetchall()
+        '''
+        if columnar:
+            return self._fetch_frame(query, (start_date, end_date), CATEGORY_TOTAL_COLUMNS)
+        return self._fetchall(query, (start_date, end_date))
 
+    @cached_query
     def get_cumulative_spending(self, year, month):
         start_date = date(year, month, 1)
         end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        self.cursor.execute('''
-            SELECT strftime('%d', date) as day, SUM(amount) OVER (ORDER BY date) as cumulative_total
-            FROM transactions
+        return self._fetchall('''
+            SELECT strftime('%d', date) as day, SUM(SUM(amount)) OVER (ORDER BY date) as cumulative_total
+            FROM daily_totals
             WHERE date BETWEEN ? AND ?
-            GROUP BY day
-            ORDER BY day
+            GROUP BY date
+            ORDER BY date
         ''', (start_date, end_date))
-        return self.cursor.fetchall()
 
+    @cached_query
     def get_monthly_spending(self, year, month):
-        start_date = date(year, month, 1)
-        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        self.cursor.execute('''
+        result = self._fetchone('''
             SELECT COALESCE(SUM(amount), 0) as total_spending
-            FROM transactions
-            WHERE date BETWEEN ? AND ?
-        ''', (start_date, end_date))
-        result = self.cursor.fetchone()
+            FROM monthly_totals
+            WHERE month = ?
+        ''', (f'{year:04d}-{month:02d}',))
         return result[0] if result else 0
 
     def _parse_date(self, date_input):
@@ -207,83 +349,176 @@ class Database:
             raise ValueError("Invalid date type. Use string, datetime, or date object.")
 
     def close(self):
-        self.conn.close()
+        self.pool.close()
 
+    @cached_query
     def get_notes(self, date):
-        self.cursor.execute('SELECT id, note, color FROM notes WHERE date = ?', (date,))
-        return [{'id': row[0], 'text': row[1], 'color': row[2]} for row in self.cursor.fetchall()]
+        rows = self._fetchall('SELECT id, note, color FROM notes WHERE date = ?', (date,))
+        return [{'id': row[0], 'text': row[1], 'color': row[2]} for row in rows]
 
     def add_note(self, date, text, color="#3DD56D"):
-        self.cursor.execute('INSERT INTO notes (date, note, color) VALUES (?, ?, ?)', (date, text, color))
-        self.conn.commit()
+        self._execute('INSERT INTO notes (date, note, color) VALUES (?, ?, ?)', (date, text, color))
     
     def delete_note(self, note_id):
-        self.cursor.execute('DELETE FROM notes WHERE id = ?', (note_id,))
-        self.conn.commit()
+        self._execute('DELETE FROM notes WHERE id = ?', (note_id,))
     
 
+    @cached_query
     def has_note(self, date):
-        self.cursor.execute('SELECT COUNT(*) FROM notes WHERE date = ?', (date,))
-        return self.cursor.fetchone()[0] > 0
+        return self._fetchone('SELECT COUNT(*) FROM notes WHERE date = ?', (date,))[0] > 0
     
+    @cached_query
     def get_dates_with_notes(self):
-        self.cursor.execute('SELECT DISTINCT date FROM notes')
-        return [row[0] for row in self.cursor.fetchall()]
+        return [row[0] for row in self._fetchall('SELECT DISTINCT date FROM notes')]
 
+    @cached_query
+    def get_notes_in_range(self, start_date, end_date):
+        """Notes dated start_date to end_date, grouped by date in date order,
+        as {date: [{'id', 'text', 'color'}, ...]}, from one query."""
+        notes = {}
+        for note_id, note_date, text, color in self._fetchall('''
+            SELECT id, date, note, color
+            FROM notes
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, id
+        ''', (start_date, end_date)):
+            notes.setdefault(note_date, []).append({'id': note_id, 'text': text, 'color': color})
+        return notes
+
+    def add_recurring_rule(self, title, rule, start_date, kind='note', color="#3DD56D", amount=None, category=None):
+        """Save a recurring note or transaction. rule is an RRULE string
+        (see recurrence.py); raises ValueError if it is not supported."""
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        start_date = self._parse_date(start_date)
+        parsed = Rule.parse(rule, start_date)
+        if parsed.count and parsed.count > MAX_COUNT:
+            raise ValueError(f"COUNT must be at most {MAX_COUNT:,}")
+        end_date = parsed.last_date()
+        self._execute('''
+            INSERT INTO recurring_rules (kind, title, rule, start_date, end_date, color, amount, category)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (kind, title, rule.upper(), start_date, end_date, color, amount, category))
 
+    def delete_recurring_rule(self, rule_id):
+        self._execute('DELETE FROM recurring_rules WHERE id = ?', (rule_id,))
+
+    @cached_query
+    def get_recurring_rules(self):
+        columns = ['id', 'kind', 'title', 'rule', 'start_date', 'end_date', 'color', 'amount', 'category']
+        rows = self._fetchall(f"SELECT {', '.join(columns)} FROM recurring_rules ORDER BY start_date, id")
+        return [dict(zip(columns, row)) for row in rows]
+
+    @cached_query
+    def get_recurring_occurrences(self, month):
+        """Occurrences of recurring rules in the month holding `month`, as
+        {date: [{'rule_id', 'kind', 'title', 'color', 'amount', 'category'}]}.
+
+        Only rules active in the month are read, and each is expanded for
+        that month alone. Results are cached per month, so paging through
+        the calendar expands one new month at a time.
+        """
+        start_date = self._parse_date(month).replace(day=1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        occurrences = {}
+        for rule_id, kind, title, rule, rule_start, color, amount, category in self._fetchall('''
+            SELECT id, kind, title, rule, start_date, color, amount, category
+            FROM recurring_rules
+            WHERE start_date <= ? AND (end_date IS NULL OR end_date >= ?)
+        ''', (end_date, start_date)):
+            entry = {'rule_id': rule_id, 'kind': kind, 'title': title, 'color': color,
+                     'amount': amount, 'category': category}
+            for day in Rule.parse(rule, rule_start).occurrences(start_date, end_date):
+                occurrences.setdefault(day, []).append(entry)
+        return dict(sorted(occurrences.items()))
+
+
+    @cached_query
     def get_expenses_by_month(self, months):
-        self.cursor.execute('''
-            SELECT strftime('%Y-%m-01', date) as Month, SUM(amount) as Expenses
-            FROM transactions
-            WHERE date >= date('now', 'start of month', '-' || ? || ' months')
+        return self._fetchall('''
+            SELECT month || '-01' as Month, SUM(amount) as Expenses
+            FROM monthly_totals
+            WHERE month >= strftime('%Y-%m', date('now', 'start of month', '-' || ? || ' months'))
             GROUP BY Month
             ORDER BY Month DESC
         ''', (months,))
-        return self.cursor.fetchall()
 
+    @cached_query
     def get_expenses_by_category_and_month(self, start_date, end_date):
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT 
                 strftime('%Y-%m', date) as Month,
                 category,
                 SUM(amount) as Expenses
-            FROM transactions
+            FROM daily_totals
             WHERE date BETWEEN ? AND ?
             GROUP BY Month, category
             ORDER BY Month, Expenses DESC
         ''', (start_date, end_date))
-        return self.cursor.fetchall()
     
+    @cached_query
     def get_transactions_with_tags(self, start_date, end_date):
-        self.cursor.execute('''
+        return self._fetchall('''
             SELECT strftime('%Y-%m', date) as Month, tag, amount
             FROM transactions
             WHERE date BETWEEN ? AND ?
         ''', (start_date, end_date))
-        return self.cursor.fetchall() 
+    @cached_query
     def get_expenses_by_tag(self, months):
-        self.cursor.execute('''
-            SELECT tag, amount
-            FROM transactions
-            WHERE date >= date('now', '-' || ? || ' months')
+        return self._fetchall('''
+            SELECT tags.name, totals.Expenses
+            FROM (
+                SELECT tag_id, SUM(amount) as Expenses
+                FROM transaction_tags INDEXED BY idx_transaction_tags_date
+                WHERE date >= date('now', '-' || ? || ' months')
+                GROUP BY tag_id
+            ) totals
+            JOIN tags ON tags.id = totals.tag_id
+            ORDER BY totals.Expenses DESC
         ''', (months,))
-        transactions = self.cursor.fetchall()
-        
-        tag_expenses = {}
-        for tag, amount in transactions:
-            if tag:
-                for t in tag.split(','):
-                    t = t.strip()
-                    tag_expenses[t] = tag_expenses.get(t, 0) + amount
-        
-        return sorted(tag_expenses.items(), key=lambda x: x[1], reverse=True)
+
+    @cached_query
+    def get_expenses_by_tag_and_month(self, start_date, end_date):
+        return self._fetchall('''
+            SELECT totals.Month, tags.name, totals.Expenses
+            FROM (
+                SELECT strftime('%Y-%m', date) as Month, tag_id, SUM(amount) as Expenses
+                FROM transaction_tags
+                WHERE date BETWEEN ? AND ?
+                GROUP BY Month, tag_id
+            ) totals
+            JOIN tags ON tags.id = totals.tag_id
+            ORDER BY totals.Month, tags.name
+        ''', (start_date, end_date))
+
+    @cached_query
+    def get_transactions_by_tag(self, tag, columnar=False):
+        query = '''
+            SELECT transactions.item, transactions.tag, transactions.amount, transactions.category,
+                   transactions.store_name, {date}
+            FROM tags
+            JOIN transaction_tags ON transaction_tags.tag_id = tags.id
+            JOIN transactions ON transactions.id = transaction_tags.transaction_id
+            WHERE tags.name = ?
+            ORDER BY transactions.date DESC
+        '''
+        if columnar:
+            return self._fetch_frame(query.format(date=epoch_days('transactions.date')), (tag,), TRANSACTION_COLUMNS)
+        return self._fetchall(query.format(date='transactions.date'), (tag,))
     
-    def get_daily_spending(self, start_date, end_date):
-        self.cursor.execute('''
-            SELECT date, SUM(amount) as total_amount
-            FROM transactions
-            WHERE date BETWEEN ? AND ?
+    @cached_query
+    def get_daily_spending(self, start_date, end_date, columnar=False, type=None):
+        # type, e.g. 'expense', limits the totals to one transaction type.
+        query = '''
+            SELECT {date}, SUM(amount) as total_amount
+            FROM daily_totals
+            WHERE date BETWEEN ? AND ? {type}
             GROUP BY date
             ORDER BY date
-        ''', (start_date, end_date))
-        return self.cursor.fetchall()
\ No newline at end of file
+        '''
+        params = (start_date, end_date) if type is None else (start_date, end_date, type)
+        type_filter = '' if type is None else 'AND type = ?'
+        if columnar:
+            return self._fetch_frame(query.format(date=epoch_days('date'), type=type_filter), params,
+                                     DAILY_SPENDING_COLUMNS)
+        return self._fetchall(query.format(date='date', type=type_filter), params)
@@ -0,0 +1,29 @@
+"""Content hashes of transactions, used to skip rows that were imported before.
+
+Every transaction stores a 64-bit hash of (date, amount, store, item) in
+`transactions.row_hash`. Importers look candidate rows up through
+idx_transactions_row_hash instead of comparing four columns.
+"""
+import hashlib
+
+
+def _text(value):
+    return ' '.join(str(value or '').casefold().split())
+
+
+def transaction_hash(date, amount, store_name, item):
+    # Dates may come back from SQLite as 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'.
+    key = '\x1f'.join((str(date)[:10], f'{float(amount):.2f}', _text(store_name), _text(item)))
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def add_row_hashes(cursor):
+    cursor.execute('PRAGMA table_info(transactions)')
+    if 'row_hash' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE transactions ADD COLUMN row_hash INTEGER')
+    cursor.execute('SELECT id, date, amount, store_name, item FROM transactions WHERE row_hash IS NULL')
+    cursor.executemany('UPDATE transactions SET row_hash = ? WHERE id = ?', [
+        (transaction_hash(date, amount, store_name, item), id)
+        for id, date, amount, store_name, item in cursor.fetchall()
+    ])
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_row_hash ON transactions (row_hash)')
@@ -0,0 +1,132 @@
+"""Persistent cache of receipt extraction responses.
+
+Entries are keyed by a SHA-256 of the normalized (re-encoded JPEG) image
+together with the prompt and model that produced them, so re-uploading a
+receipt skips the vision call while any prompt or model change misses.
+Each entry is one JSON file; the directory is kept under a byte budget by
+evicting the least recently used entries.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+CACHE_DIR = os.path.join('extracted_data', 'cache')
+
+
+def extraction_key(image_data, prompt, model):
+    digest = hashlib.sha256()
+    for part in (model, prompt, image_data):
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        # mtime doubles as the last-used time for LRU eviction. The entry
+        # may have been evicted since it was read; a missed touch is harmless.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry['response']
+
+    def put(self, key, response):
+        os.makedirs(self.directory, exist_ok=True)
+        # A uniquely named temporary file, so writers in other threads or
+        # processes (Streamlit workers, manage.py) never share one.
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, prefix=f'{key}.', suffix='.tmp',
+                                         delete=False) as f:
+            try:
+                json.dump({'key': key, 'created': time.time(), 'response': response}, f)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, self._path(key))
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def iter_saved_responses(directory='extracted_data'):
+    """Yield (source, response) for every raw response saved in directory
+    and every entry in its cache subdirectory."""
+    for path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+        with open(path) as f:
+            yield path, f.read()
+    for path in sorted(glob.glob(os.path.join(directory, 'cache', '*.json'))):
+        try:
+            with open(path) as f:
+                yield path, json.load(f)['response']
+        except (OSError, ValueError, KeyError):
+            continue
+
+
+@lru_cache(maxsize=1)
+def get_extraction_cache():
+    return ExtractionCache()
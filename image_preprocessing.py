@@ -0,0 +1,114 @@
+"""Shrink receipt photos before they are sent to the vision model.
+
+Phone photos are several megapixels, but receipt text stays legible at a
+much smaller size. Each upload is rotated according to its EXIF
+orientation, flattened to grayscale, cropped to the bright paper area,
+downscaled so its longest edge is at most `max_edge` pixels, and
+re-encoded as JPEG at `quality`.
+"""
+import io
+import os
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    max_edge: int = 1600
+    quality: int = 70
+    grayscale: bool = True
+    crop: bool = True
+    # Padding kept around the detected receipt, as a fraction of each side.
+    crop_margin: float = 0.02
+
+    @classmethod
+    def from_env(cls):
+        defaults = cls()
+        return cls(
+            max_edge=int(os.environ.get('RECEIPT_MAX_EDGE', defaults.max_edge)),
+            quality=int(os.environ.get('RECEIPT_JPEG_QUALITY', defaults.quality)),
+            grayscale=os.environ.get('RECEIPT_GRAYSCALE', '1') != '0',
+            crop=os.environ.get('RECEIPT_CROP', '1') != '0',
+        )
+
+
+def otsu_threshold(histogram):
+    """Grey level that best separates a 256-bin histogram into two classes."""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 0, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def receipt_bounds(image, margin=0.02, sample_edge=256):
+    """Bounding box of the receipt paper in image, or None if the paper
+    cannot be told apart from the background."""
+    sample = image.convert('L')
+    sample.thumbnail((sample_edge, sample_edge))
+    threshold = otsu_threshold(sample.histogram())
+    # Paper is the bright class.
+    bbox = sample.point(lambda level: 255 if level > threshold else 0).getbbox()
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    width, height = sample.size
+    area = (right - left) * (bottom - top)
+    if area < 0.2 * width * height or area > 0.95 * width * height:
+        return None
+
+    scale_x, scale_y = image.width / width, image.height / height
+    pad_x, pad_y = margin * image.width, margin * image.height
+    return (
+        max(0, int(left * scale_x - pad_x)),
+        max(0, int(top * scale_y - pad_y)),
+        min(image.width, int(right * scale_x + pad_x)),
+        min(image.height, int(bottom * scale_y + pad_y)),
+    )
+
+
+def preprocess_receipt(image, options=None):
+    """Return a new PIL image ready to be JPEG-encoded for the model."""
+    options = options or PreprocessOptions()
+    image = ImageOps.exif_transpose(image)
+    if options.grayscale:
+        image = image.convert('L')
+    elif image.mode != 'RGB':
+        # JPEG has no alpha channel; RGBA and palette PNGs are flattened.
+        image = image.convert('RGB')
+    if options.crop:
+        bounds = receipt_bounds(image, options.crop_margin)
+        if bounds:
+            image = image.crop(bounds)
+    if options.max_edge and max(image.size) > options.max_edge:
+        image.thumbnail((options.max_edge, options.max_edge), Image.LANCZOS)
+    return image
+
+
+def receipt_jpeg_bytes(uploaded_file, options=None):
+    options = options or PreprocessOptions()
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    image = Image.open(uploaded_file)
+    if options.max_edge:
+        # Lets the JPEG decoder skip detail that would be thrown away by the
+        # resize anyway; the result is still at least max_edge on each side.
+        image.draft('L' if options.grayscale else 'RGB', (options.max_edge, options.max_edge))
+    image = preprocess_receipt(image, options)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=options.quality, optimize=True)
+    return buffer.getvalue()
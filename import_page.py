@@ -0,0 +1,33 @@
+import streamlit as st
+import pandas as pd
+from database import get_database
+from importer import PROFILES, import_transactions
+
+
+def import_page():
+    st.markdown("<h1 style='text-align: center;'>Import Transactions</h1>", unsafe_allow_html=True)
+
+    uploaded_file = st.file_uploader("Bank statement or CSV export", type=["csv", "txt", "xml"])
+    profile_name = st.selectbox("Format", list(PROFILES), format_func=lambda name: PROFILES[name].name)
+    dry_run = st.checkbox("Dry run (check the file without importing)")
+
+    if uploaded_file is None or not st.button("Import"):
+        return
+
+    progress = st.empty()
+    try:
+        report = import_transactions(
+            get_database(), uploaded_file, PROFILES[profile_name], dry_run=dry_run,
+            on_chunk=lambda report: progress.info(report.summary()),
+        )
+    except ValueError as e:
+        progress.error(f"Could not import {uploaded_file.name}: {e}")
+        return
+
+    progress.success(report.summary())
+    if report.failures:
+        st.warning(f"{report.failed:,} rows could not be read" +
+                   (f"; the first {len(report.failures)} are listed" if report.failed > len(report.failures) else ''))
+        st.dataframe(pd.DataFrame(report.failures, columns=['Row', 'Problem']), hide_index=True)
+    if report.inserted and not dry_run:
+        st.session_state.data_changed = True
@@ -0,0 +1,253 @@
+"""Import bank and CSV exports into transactions.
+
+Files are read in chunks, so memory use depends on the chunk size and not
+on the length of the export. Each chunk is:
+- mapped onto transaction fields through an ImportProfile,
+- checked against existing transactions by row hash (see dedup.py),
+- written in a single write transaction.
+
+CSV exports and ISO 20022 camt.053 statements are supported. Profiles for
+other banks can be loaded from a JSON file with the fields of ImportProfile.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from dedup import transaction_hash
+from receipt_normalization import parse_numbers
+
+FIELDS = ['date', 'amount', 'item', 'store_name', 'category', 'tags', 'quantity', 'type']
+DEFAULT_CHUNK_SIZE = 5_000
+# Only the first failures are kept for the report; the rest are counted.
+MAX_REPORTED_FAILURES = 100
+
+
+@dataclass
+class ImportProfile:
+    name: str
+    # Transaction field -> column header in the file. date and amount are
+    # required; item falls back to store_name.
+    columns: dict = field(default_factory=dict)
+    format: str = 'csv'
+    delimiter: str = ','
+    encoding: str = 'utf-8'
+    date_format: str = '%Y-%m-%d'
+    # Bank exports sign amounts: negative for money spent, positive for income.
+    signed: bool = False
+    skip_rows: int = 0
+    default_category: str = 'Other'
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+
+PROFILES = {
+    # The columns the app itself shows.
+    'generic': ImportProfile('generic', columns={
+        'date': 'Date', 'amount': 'Amount', 'item': 'Item', 'store_name': 'Store Name',
+        'category': 'Category', 'tags': 'Tags',
+    }),
+    # Sparkasse "CSV-CAMT" export.
+    'sparkasse': ImportProfile('sparkasse', columns={
+        'date': 'Buchungstag', 'amount': 'Betrag', 'item': 'Verwendungszweck',
+        'store_name': 'Beguenstigter/Zahlungspflichtiger',
+    }, delimiter=';', encoding='latin-1', date_format='%d.%m.%y', signed=True),
+    'camt053': ImportProfile('camt053', format='camt', signed=True),
+}
+
+
+def get_profile(name):
+    """A built-in profile by name, or a profile loaded from a JSON file."""
+    if name in PROFILES:
+        return PROFILES[name]
+    if os.path.exists(name):
+        return ImportProfile.from_file(name)
+    raise ValueError(f"Unknown import profile {name!r}; choose one of {', '.join(PROFILES)} or a JSON file")
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    # (row number, message), at most MAX_REPORTED_FAILURES of them.
+    failures: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def add_failures(self, failures):
+        self.failed += len(failures)
+        self.failures.extend(failures[:MAX_REPORTED_FAILURES - len(self.failures)])
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.rows:,} rows: {self.inserted:,} imported, {self.duplicates:,} already present, "
+                f"{self.failed:,} failed, {self.rows_per_second:,.0f} rows/s")
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find_text(element, path):
+    # Namespace-agnostic lookup of the first descendant along path, so
+    # camt.053 versions that nest names differently (Cdtr/Nm, Cdtr/Pty/Nm)
+    # are read alike.
+    for name in path.split('/'):
+        element = next((child for child in element.iter()
+                        if child is not element and _local(child.tag) == name), None)
+        if element is None:
+            return None
+    return (element.text or '').strip()
+
+
+def iter_camt_entries(source):
+    """Yield one raw record per booked entry (Ntry) of a camt.053 statement."""
+    # The elements still open, so each entry can be detached from its
+    # parent once read; otherwise the tree keeps every entry until the end.
+    open_elements = []
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        if _local(element.tag) != 'Ntry':
+            continue
+        credit = _find_text(element, 'CdtDbtInd') == 'CRDT'
+        amount = _find_text(element, 'Amt') or ''
+        party = _find_text(element, 'Dbtr/Nm' if credit else 'Cdtr/Nm') or ''
+        booked = _find_text(element, 'BookgDt/Dt') or _find_text(element, 'BookgDt/DtTm') or ''
+        yield {
+            'date': booked[:10],
+            'amount': amount if credit else f'-{amount}',
+            'store_name': party,
+            'item': _find_text(element, 'RmtInf/Ustrd') or _find_text(element, 'AddtlNtryInf') or party,
+        }
+        if open_elements:
+            open_elements[-1].remove(element)
+
+
+def read_chunks(source, profile, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrames of raw strings with transaction field names as
+    columns, indexed by row number in the file from 0."""
+    if profile.format == 'camt':
+        entries = iter_camt_entries(source)
+        start = 0
+        while True:
+            try:
+                chunk = list(islice(entries, chunk_size))
+            except ElementTree.ParseError as e:
+                # ParseError is not a ValueError; callers report ValueErrors.
+                raise ValueError(f"Not a readable camt.053 statement: {e}") from None
+            if not chunk:
+                return
+            yield pd.DataFrame(chunk, index=range(start, start + len(chunk)), dtype=str)
+            start += len(chunk)
+
+    headers = {header: name for name, header in profile.columns.items()}
+    # Only date and amount must be present; prepare_chunk fills in any other
+    # field the file leaves out.
+    with pd.read_csv(source, sep=profile.delimiter, encoding=profile.encoding, skiprows=profile.skip_rows,
+                     usecols=lambda column: column in headers, dtype=str, keep_default_na=False,
+                     chunksize=chunk_size) as reader:
+        for chunk in reader:
+            for name in ('date', 'amount'):
+                header = profile.columns.get(name)
+                if header not in chunk.columns:
+                    raise ValueError(f"The file has no {header!r} column for the transaction {name}")
+            yield chunk.rename(columns=headers)
+
+
+def prepare_chunk(frame, profile):
+    """Turn a chunk from read_chunks into add_transactions_bulk records.
+
+    Returns (records, failures). Each record carries its 1-based row number
+    under 'row' and its row hash under 'row_hash'.
+    """
+    frame = frame.reindex(columns=FIELDS).fillna('').astype(str)
+    amounts = parse_numbers(frame['amount'].str.replace(r'[^\d,.\-]', '', regex=True))
+    dates = pd.to_datetime(frame['date'], format=profile.date_format, errors='coerce')
+    items = frame['item'].str.strip().where(frame['item'].str.strip() != '', frame['store_name'].str.strip())
+
+    categories = frame['category'].str.strip()
+    if profile.signed:
+        types = pd.Series('income', index=frame.index).where(amounts >= 0, 'expense')
+        amounts = amounts.abs()
+    else:
+        types = frame['type'].str.strip().str.lower()
+        types = types.where(types != '', 'expense').where(categories != 'Income', 'income')
+    categories = categories.where(categories != '',
+                                  types.map({'income': 'Income'}).fillna(profile.default_category))
+
+    # One message per failed row, naming the first problem found.
+    failures = {}
+    for name, bad in (('date', dates.isna()), ('amount', amounts.isna())):
+        for index, value in frame.loc[bad, name].items():
+            failures.setdefault(index + 1, f"unreadable {name} {value!r}")
+    for index in frame.index[items == '']:
+        failures.setdefault(index + 1, "no item or payee")
+    ok = dates.notna() & amounts.notna() & (items != '')
+
+    records = []
+    for row, date, amount, item, store_name, category, tags, quantity, type in zip(
+            frame.index[ok] + 1, dates[ok].dt.date, amounts[ok], items[ok], frame.loc[ok, 'store_name'],
+            categories[ok], frame.loc[ok, 'tags'], frame.loc[ok, 'quantity'], types[ok]):
+        records.append({
+            'row': row, 'date': date, 'amount': amount, 'item': item, 'store_name': store_name or None,
+            'category': category, 'tags': tags, 'quantity': quantity or 1, 'type': type,
+            'row_hash': transaction_hash(date, amount, store_name, item),
+        })
+    return records, sorted(failures.items())
+
+
+def import_transactions(db, source, profile, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, on_chunk=None):
+    """Import a CSV or camt.053 file (a path or a binary file object) into
+    db and return an ImportReport. on_chunk, if given, is called with the
+    report after every chunk.
+
+    A row counts as already present when the database held a transaction
+    with the same date, amount, store and item before the import started.
+    Each such transaction matches one row, so a purchase that appears twice
+    in the file but once in the database is imported once more. Only the
+    hashes of matched transactions are kept between chunks.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    last_id = db.get_last_transaction_id()
+    unmatched = {}
+    for frame in read_chunks(source, profile, chunk_size):
+        records, failures = prepare_chunk(frame, profile)
+        report.rows += len(frame)
+        report.add_failures(failures)
+
+        unseen = {record['row_hash'] for record in records} - unmatched.keys()
+        unmatched.update(db.get_row_hash_counts(unseen, max_id=last_id))
+        new = []
+        for record in records:
+            if unmatched.get(record['row_hash']):
+                unmatched[record['row_hash']] -= 1
+                report.duplicates += 1
+            else:
+                new.append(record)
+
+        if dry_run:
+            report.inserted += len(new)
+        elif new:
+            inserted, errors = db.add_transactions_bulk(new)
+            report.inserted += inserted
+            report.add_failures([(new[index]['row'], message) for index, message in errors])
+        report.seconds = time.perf_counter() - started
+        if on_chunk:
+            on_chunk(report)
+    report.seconds = time.perf_counter() - started
+    return report
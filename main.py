@@ -1,27 +1,29 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from database import Database
+from database import get_database, parse_quantity
 from ui_components import create_metric_card, create_sidebar, create_add_transaction_form, set_background
-from charts import create_monthly_expense_chart, create_expense_category_chart
+from charts import cached_figure, daily_expenses_figure, category_pie_figure, create_monthly_expense_chart
 from datetime import date, timedelta
 import os
-from transactions_page import transactions_page
-from receipt_analysis import receipt_analysis_page, parse_quantity
-from calendar_component import calendar_page
-from report_page import report_page
+from page_registry import PAGES, get_page, preload
+import spending
 
 
 
 st.set_page_config(layout="wide", page_title="Expense Tracker")
 
-db = Database()
+db = get_database()
 
 def reset_data():
     db.clear_all_data()
     st.success("Data has been reset!")
     st.session_state.data_changed = True
 
+SPENDING_VIEWS = {
+    'Cumulative this month': lambda today: spending.month_to_date(db, today),
+    'Cumulative this year': lambda today: spending.year_to_date(db, today),
+    'Rolling 30 days': lambda today: spending.rolling_spending(db, today - timedelta(days=364), today, window=30),
+}
+
 def main_dashboard():
     st.markdown("<h1 style='text-align: center;'>Expense Tracker Dashboard</h1>", unsafe_allow_html=True)
 
@@ -51,56 +53,34 @@ def main_dashboard():
         start_date = current_date.replace(day=1)
         end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        daily_expenses = db.get_daily_spending(start_date, end_date)
-        
-        df = pd.DataFrame(daily_expenses, columns=['Date', 'Amount'])
-        df['Date'] = pd.to_datetime(df['Date'])
-        
-        fig = px.bar(df, x='Date', y='Amount',
-                    title=f"Daily Expenses for {current_date.strftime('%B %Y')}",
-                    labels={'Date': 'Date', 'Amount': 'Total Spent (€)'},
-                    text='Amount',
-                    height=chart_height,
-                    color='Amount',
-                    color_continuous_scale=px.colors.qualitative.Set3)
-        
-        fig.update_traces(texttemplate='%{text:.2f}€', textposition='outside')
-        fig.update_xaxes(tickformat='%d %b')
-        fig.update_layout(
-            bargap=0.2,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='black'),
-            coloraxis_showscale=False
-        )
-        
+        def build():
+            df = db.get_daily_spending(start_date, end_date, columnar=True, type='expense')
+            return daily_expenses_figure(df['Date'], df['Amount'],
+                                         f"Daily Expenses for {current_date.strftime('%B %Y')}",
+                                         height=chart_height)
+
+        fig = cached_figure(db, 'daily_expenses', (start_date, end_date, chart_height), build)
         st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
     with col_right:
         st.subheader("Expenses by Category")
         start_date = current_date - timedelta(days=30)
         end_date = current_date
-        expenses_by_category = db.get_expenses_by_category(start_date, end_date)
-        
-        df_category = pd.DataFrame(expenses_by_category, columns=['Category', 'Amount'])
-        
-        fig_category = px.pie(df_category, values='Amount', names='Category', 
-                            title='Expenses by Category',
-                            height=chart_height,
-                            color_discrete_sequence=px.colors.qualitative.Set3)
-        
-        fig_category.update_traces(textposition='inside', 
-                                texttemplate='%{label}<br>€%{value:.2f}',
-                                hovertemplate='<b>%{label}</b><br>Amount: €%{value:.2f}<br>%{percent}')
-        
-        fig_category.update_layout(
-            showlegend=False,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=40, b=20),
-        )
-        
+
+        def build_category():
+            df_category = db.get_expenses_by_category(start_date, end_date, columnar=True)
+            return category_pie_figure(df_category['Category'], df_category['Amount'], height=chart_height)
+
+        fig_category = cached_figure(db, 'expenses_by_category', (start_date, end_date, chart_height),
+                                     build_category)
         st.plotly_chart(fig_category, use_container_width=True)
 
+    st.subheader("Spending Over Time")
+    view = st.radio("Show", list(SPENDING_VIEWS), horizontal=True, key="spending_view",
+                    label_visibility="collapsed")
+    fig_spending = cached_figure(db, 'spending_over_time', (view, current_date),
+                                 lambda: create_monthly_expense_chart(SPENDING_VIEWS[view](current_date), title=view))
+    st.plotly_chart(fig_spending, use_container_width=True, config={'displayModeBar': False})
+
 def add_transaction_callback():
     st.session_state.transaction_submitted = True
 
@@ -112,7 +92,6 @@ def add_transaction_page():
     submitted, item, tags, amount, category, store_name, date, quantity = create_add_transaction_form()
     
     if submitted:
-        db = Database()
         transaction_type = 'income' if category == 'Income' else 'expense'
         db.add_transaction(amount, category, date, transaction_type, store_name, item, tags, parse_quantity(quantity))
         
@@ -143,14 +122,12 @@ def main():
         add_transaction_page()
     elif st.session_state.page == 'dashboard':
         main_dashboard()
-    elif st.session_state.page == 'transactions':
-        transactions_page()
-    elif st.session_state.page == 'receipt_analysis':
-        receipt_analysis_page()
-    elif st.session_state.page == 'calendar':
-        calendar_page()
-    elif st.session_state.page == 'expense_report':
-        report_page()
+    elif st.session_state.page in PAGES:
+        get_page(st.session_state.page)()
+
+    # The other pages' modules are imported in the background once this
+    # page has been drawn.
+    preload()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
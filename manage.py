@@ -0,0 +1,110 @@
+"""Maintenance commands for the expense tracker.
+
+    python manage.py rebuild-rollups [--db expense_tracker.db]
+    python manage.py replay-extractions [--dir extracted_data]
+    python manage.py import-transactions statement.csv [--profile sparkasse]
+    python manage.py snapshot [--dir snapshots] [--full]
+"""
+import argparse
+import sys
+
+from database import Database
+from extraction_cache import get_extraction_cache, iter_saved_responses
+from importer import DEFAULT_CHUNK_SIZE, PROFILES, get_profile, import_transactions
+from receipt_normalization import normalize_receipt_records
+from receipt_parser import parse_receipt_items
+from snapshot import DEFAULT_DIRECTORY, write_snapshot
+
+
+def rebuild_rollups(args):
+    db = Database(args.db)
+    drift = db.rebuild_rollups()
+    db.close()
+    for table, rows in drift.items():
+        print(f"{table}: {rows} drifted row(s) reconciled")
+
+
+def replay_extractions(args):
+    # Re-parse every saved model response offline, without any API calls.
+    files = items = failures = 0
+    for source, response in iter_saved_responses(args.dir):
+        files += 1
+        transactions, errors = parse_receipt_items(response)
+        problems = [f"item {index + 1}: {message}" for index, message in errors]
+        _, normalization = normalize_receipt_records(transactions)
+        problems += [f"{transactions[index].get('Item', 'item')}: unreadable {column} {value!r}"
+                     for index, column, value in normalization.failures]
+        failures += len(problems)
+        items += len(transactions)
+        print(f"{source}: {len(transactions)} items, {len(problems)} malformed")
+        for problem in problems:
+            print(f"    {problem}")
+    print(f"Replayed {files} responses: {items} line items, {failures} malformed")
+
+
+def extraction_cache_stats(args):
+    for name, value in get_extraction_cache().stats().items():
+        print(f"{name}: {value}")
+
+
+def import_file(args):
+    db = Database(args.db)
+    try:
+        report = import_transactions(
+            db, args.file, get_profile(args.profile), chunk_size=args.chunk_size, dry_run=args.dry_run,
+            on_chunk=lambda report: print(f"\r{report.summary()}", end='', flush=True),
+        )
+    except ValueError as e:
+        # Unknown profile, or columns the profile expects are missing.
+        sys.exit(f"Import failed: {e}")
+    finally:
+        db.close()
+    print(f"\r{report.summary()}" + (' (dry run, nothing written)' if args.dry_run else ''))
+    for row, message in report.failures:
+        print(f"    row {row}: {message}")
+    if report.failed > len(report.failures):
+        print(f"    ... and {report.failed - len(report.failures):,} more")
+
+
+def snapshot(args):
+    db = Database(args.db)
+    try:
+        print(write_snapshot(db, args.dir, full=args.full).summary())
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='expense_tracker.db', help='Path to the SQLite database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rollups = subparsers.add_parser('rebuild-rollups', help='Recompute daily/monthly totals from transactions')
+    rollups.set_defaults(func=rebuild_rollups)
+
+    replay = subparsers.add_parser('replay-extractions', help='Re-parse saved receipt responses offline')
+    replay.add_argument('--dir', default='extracted_data')
+    replay.set_defaults(func=replay_extractions)
+
+    cache_stats = subparsers.add_parser('extraction-cache-stats', help='Size of the receipt extraction cache')
+    cache_stats.set_defaults(func=extraction_cache_stats)
+
+    importer = subparsers.add_parser('import-transactions', help='Import a bank or CSV export')
+    importer.add_argument('file')
+    importer.add_argument('--profile', default='generic',
+                          help=f"One of {', '.join(PROFILES)}, or a JSON profile file")
+    importer.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    importer.add_argument('--dry-run', action='store_true', help='Parse and deduplicate without writing')
+    importer.set_defaults(func=import_file)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='Write changed months to the Parquet snapshot')
+    snapshot_parser.add_argument('--dir', default=DEFAULT_DIRECTORY)
+    snapshot_parser.add_argument('--full', action='store_true', help='Rewrite every month')
+    snapshot_parser.set_defaults(func=snapshot)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
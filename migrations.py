@@ -0,0 +1,214 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from dedup import add_row_hashes
+from recurrence import create_recurring_rules
+from rollups import create_rollups
+from tags import create_tag_tables
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item TEXT NOT NULL,
+            item_type TEXT,
+            quantity REAL DEFAULT 1,
+            category TEXT NOT NULL,
+            date DATE NOT NULL,
+            type TEXT NOT NULL,
+            store_name TEXT,
+            amount REAL NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS balances (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount REAL NOT NULL,
+            date DATE NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS loans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount REAL NOT NULL,
+            date DATE NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS savings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount REAL NOT NULL,
+            date DATE NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            note TEXT NOT NULL,
+            color TEXT DEFAULT '#3DD56D'
+        )
+    ''')
+
+    # Add color column to existing notes table if it doesn't exist
+    cursor.execute("PRAGMA table_info(notes)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'color' not in columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN color TEXT DEFAULT '#3DD56D'")
+
+
+def add_columns(cursor):
+    for table in ['transactions', 'balances', 'loans', 'savings']:
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'date' not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN date DATE")
+
+
+def insert_categories(cursor):
+    categories = [
+        'Housing', 'Utilities', 'Transportation', 'Groceries', 'Healthcare', 'Insurance',
+        'Savings and Investments', 'Debt Repayment', 'Personal Care', 'Entertainment and Leisure',
+        'Income', 'Other'
+    ]
+    cursor.executemany('''
+        INSERT OR IGNORE INTO categories (name) VALUES (?)
+    ''', [(category,) for category in categories])
+
+
+def update_date_format(cursor):
+    for table in ['transactions', 'balances', 'loans', 'savings']:
+        cursor.execute(f"SELECT id, date FROM {table}")
+        rows = cursor.fetchall()
+        for row in rows:
+            id, old_date = row
+            if isinstance(old_date, str):
+                try:
+                    new_date = datetime.strptime(old_date, '%d-%m-%Y').date()
+                except ValueError:
+                    try:
+                        new_date = datetime.strptime(old_date, '%Y-%m-%d').date()
+                    except ValueError:
+                        continue
+                cursor.execute(f"UPDATE {table} SET date = ? WHERE id = ?", (new_date, id))
+
+
+def rename_item_type_to_tag(cursor):
+    cursor.execute("PRAGMA table_info(transactions)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'item_type' in columns:
+        cursor.execute("ALTER TABLE transactions RENAME COLUMN item_type TO tag")
+
+
+def add_query_indexes(cursor):
+    # Every dashboard and report query filters transactions by date; the
+    # category breakdown also filters on type and groups by category.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_type_date_category
+        ON transactions (type, date, category)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notes_date ON notes (date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_balances_date ON balances (date)')
+    cursor.execute('ANALYZE')
+
+
+def add_filter_indexes(cursor):
+    # Transactions page filters, each paired with date for the keyset order.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions (category, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_store_date ON transactions (store_name, date)')
+
+
+def add_item_label_index(cursor):
+    # Covers the categorizer's training query (Database.get_item_labels).
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_type_item ON transactions (type, item, category, tag)')
+
+
+# Append new steps with the next version number; never renumber or edit a
+# step that has shipped, since existing databases have already recorded it.
+MIGRATIONS = [
+    (1, 'create_tables', create_tables),
+    (2, 'add_columns', add_columns),
+    (3, 'insert_categories', insert_categories),
+    (4, 'update_date_format', update_date_format),
+    (5, 'rename_item_type_to_tag', rename_item_type_to_tag),
+    (6, 'add_query_indexes', add_query_indexes),
+    (7, 'create_rollups', create_rollups),
+    (8, 'create_tag_tables', create_tag_tables),
+    (9, 'add_filter_indexes', add_filter_indexes),
+    (10, 'add_item_label_index', add_item_label_index),
+    (11, 'add_row_hashes', add_row_hashes),
+    (12, 'create_recurring_rules', create_recurring_rules),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+
+@contextmanager
+def _migration_transaction(pool):
+    # Python's sqlite3 only opens transactions before DML, so DDL would
+    # commit statement by statement. With isolation_level None the whole
+    # step is one explicit transaction, and BEGIN IMMEDIATE takes the write
+    # lock up front, so another process cannot apply the same step at once.
+    with pool.writer() as cursor:
+        conn = cursor.connection
+        isolation_level, conn.isolation_level = conn.isolation_level, None
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+        finally:
+            conn.isolation_level = isolation_level
+
+
+def run_migrations(pool):
+    """Apply every migration newer than the recorded schema version, each in
+    its own transaction. Returns the names of the steps that ran."""
+    with pool.writer() as cursor:
+        version = current_version(cursor)
+    if version >= LATEST_VERSION:
+        return []
+
+    applied = []
+    for step_version, name, migrate in MIGRATIONS:
+        if step_version <= version:
+            continue
+        with _migration_transaction(pool) as cursor:
+            # Another process may have applied it since the check above.
+            version = current_version(cursor)
+            if step_version <= version:
+                continue
+            migrate(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                (step_version, name, datetime.now())
+            )
+        applied.append(name)
+    return applied
@@ -0,0 +1,53 @@
+"""Pages of the app, imported on first navigation.
+
+Page modules pull in heavy dependencies (the receipt page imports the
+OpenAI client and PIL, the calendar streamlit_calendar, the report page
+pyarrow and duckdb), so importing them all in main.py made every session
+start pay for pages it may never open. get_page imports a page's module the
+first time it is shown. preload imports the rest on a background thread
+once the first page has been drawn, so later navigation is instant.
+"""
+import importlib
+import os
+import threading
+
+# page key: (module, page function)
+PAGES = {
+    'transactions': ('transactions_page', 'transactions_page'),
+    'receipt_analysis': ('receipt_analysis', 'receipt_analysis_page'),
+    'calendar': ('calendar_component', 'calendar_page'),
+    'expense_report': ('report_page', 'report_page'),
+    'import': ('import_page', 'import_page'),
+}
+
+_preload_lock = threading.Lock()
+_preload_thread = None
+
+
+def get_page(name):
+    """The render function of page `name`, importing its module if needed."""
+    module, function = PAGES[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def _import_all(names):
+    for name in names:
+        try:
+            importlib.import_module(PAGES[name][0])
+        except ImportError:
+            # Reported when the page is opened instead.
+            pass
+
+
+def preload(names=None):
+    """Import page modules on a daemon thread, once per process. Set
+    EXPENSE_PRELOAD_PAGES=0 to only import pages when they are opened."""
+    global _preload_thread
+    if os.environ.get('EXPENSE_PRELOAD_PAGES', '1') == '0':
+        return None
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_import_all, args=(list(names or PAGES),),
+                                               name='page-preload', daemon=True)
+            _preload_thread.start()
+        return _preload_thread
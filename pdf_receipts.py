@@ -0,0 +1,158 @@
+"""Split PDF receipts and statements into pages for extraction.
+
+Pages with an embedded text layer are sent to the model as text, so no
+image has to be uploaded. Scanned pages are rendered to an image with
+pypdfium2 when it is installed, otherwise the page's own embedded scan is
+used. Multi-page documents are read in a process pool so long statements
+are not limited to one core.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# Fewer visible characters than this means the page is a scan, possibly
+# with a few stray text objects such as a page number.
+MIN_TEXT_CHARS = 40
+# 2x the PDF's 72 dpi; receipts are downscaled again before upload.
+RENDER_SCALE = 2.0
+# Streamlit runs many threads, which fork() does not copy safely, so page
+# workers start from a fresh interpreter instead.
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# One pool of page workers for every PDF read in this process, so starting
+# them (a new interpreter importing pypdf) is paid once.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class PdfPage:
+    receipt: str
+    number: int
+    text: str = None
+    image: bytes = None
+
+    @property
+    def name(self):
+        return f"{self.receipt} (page {self.number})"
+
+
+def is_pdf(name):
+    return name.lower().endswith('.pdf')
+
+
+def _reader(data):
+    if pypdf is None:
+        raise ImportError("PDF receipts need pypdf (pip install pypdf)")
+    return pypdf.PdfReader(io.BytesIO(data))
+
+
+def page_count(data):
+    return len(_reader(data).pages)
+
+
+def _open(data):
+    # (pypdf reader, pypdfium2 document or None) for the PDF in data.
+    return _reader(data), pypdfium2.PdfDocument(data) if pypdfium2 is not None else None
+
+
+def _page_image(document, index):
+    reader, rendered = document
+    if rendered is not None:
+        image = rendered[index].render(scale=RENDER_SCALE).to_pil()
+    else:
+        images = [embedded.image for embedded in reader.pages[index].images]
+        if not images:
+            return None
+        image = max(images, key=lambda image: image.width * image.height)
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _read_page(document, index):
+    text = document[0].pages[index].extract_text() or ''
+    if sum(not char.isspace() for char in text) >= MIN_TEXT_CHARS:
+        return text, None
+    return None, _page_image(document, index)
+
+
+def read_page(data, index):
+    """Return (text, image bytes) for one page; exactly one is set, or
+    neither if the page is blank."""
+    return _read_page(_open(data), index)
+
+
+def _read_pages(data, start, stop):
+    # One task per worker: the PDF is sent and parsed once for a run of pages.
+    document = _open(data)
+    return [_read_page(document, index) for index in range(start, stop)]
+
+
+def _page_pool(max_workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(START_METHOD))
+            _pool_workers = max_workers
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def iter_pdf_pages(name, data, max_workers=None):
+    """Yield a PdfPage for every page of the PDF in data, in page order,
+    as soon as each one is ready."""
+    document = _open(data)
+    pages = len(document[0].pages)
+    max_workers = min(pages, max_workers or os.cpu_count() or 1)
+    if max_workers <= 1:
+        for index in range(pages):
+            yield PdfPage(name, index + 1, *_read_page(document, index))
+        return
+
+    pool = _page_pool(max_workers)
+    step = -(-pages // max_workers)
+    futures = [pool.submit(_read_pages, data, start, min(start + step, pages)) for start in range(0, pages, step)]
+    try:
+        number = 0
+        for future in futures:
+            for text, image in future.result():
+                number += 1
+                yield PdfPage(name, number, text, image)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def read_upload(uploaded_file):
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as f:
+            return f.read()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
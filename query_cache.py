@@ -0,0 +1,106 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a query result in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class QueryCache:
+    """LRU cache of query results, bounded by estimated memory use.
+
+    The last element of every key is the data generation it was read at.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            generation = key[-1]
+            if generation > self._generation:
+                self._evict_generations_before(generation)
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _evict_generations_before(self, generation):
+        # Entries keyed on an older data generation can never be hit again.
+        for key in [key for key in self._entries if key[-1] < generation]:
+            self._bytes -= self._entries.pop(key)[1]
+        self._generation = generation
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def cached_query(method):
+    """Cache a Database getter's result until the next write.
+
+    Keys are (method, args, today, data generation); the date is included
+    because some queries are relative to date('now'). Cached results are
+    shared between callers and must not be mutated.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        generation = self.pool.generation
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), date.today(), generation)
+        found, value = self.query_cache.get(key)
+        if found:
+            return value
+        value = method(self, *args, **kwargs)
+        # A write that landed while the query ran may not be reflected in
+        # the result, so only keep it if the generation is unchanged.
+        if self.pool.generation == generation:
+            self.query_cache.put(key, value)
+        return value
+    return wrapper
@@ -1,18 +1,15 @@
 import streamlit as st
 import pandas as pd
-from database import Database
+from database import get_database
 from PIL import Image
-from vision import extract_recipt_info
-import json
-import re
-from datetime import datetime, date
-
-def parse_quantity(quantity_str):
-    # Extract the numeric part of the quantity
-    match = re.match(r'^([\d.]+)', quantity_str)
-    if match:
-        return float(match.group(1))
-    return 1.0  # Default to 1 if parsing fails
+from vision import categorize_with_model, stream_receipt_info
+from categorizer import Categorizer, categorize_items
+from receipt_pipeline import BatchReport, extract_receipts
+from receipt_parser import ItemStreamParser, iter_receipt_items, merge_receipt_pages, parse_receipt_items
+from receipt_normalization import normalize_receipt_records
+from pdf_receipts import is_pdf, page_count
+import os
+from datetime import date
 
 def save_azure_response(azure_response):
     current_date = date.today().strftime("%d-%Y-%m")
@@ -21,18 +18,6 @@ def save_azure_response(azure_response):
     with open(os.path.join("extracted_data", filename), "w") as f:
         f.write(azure_response)
 
-def process_receipt(receipt_json):
-    pattern = r'\[\s*\{[^]]*\}\s*\]'
-    matches = re.findall(pattern, receipt_json, re.DOTALL)
-    
-    for match in matches:
-        try:
-            return json.loads(match)
-        except json.JSONDecodeError:
-            continue
-    
-    return None
-
 def display_editable_transactions(transactions):
     st.subheader("Receipt Analysis Results")
     
@@ -44,77 +29,149 @@ def display_editable_transactions(transactions):
         st.write("Edited DataFrame:", edited_df)
         update_transactions(edited_df.to_dict('records'))
 
-def extract_json_array(text):
-    pattern = r'\[\s*\{[^]]*\}\s*\]'
-    matches = re.findall(pattern, text, re.DOTALL)
-    
-    for match in matches:
-        try:
-            json_array = json.loads(match)
-            return json_array
-        except json.JSONDecodeError:
-            continue
-    
-    return None
+def receipt_rows_to_records(rows):
+    # Receipt rows use the extraction column names; the LLM's "Item Type"
+    # is stored as the transaction's tag.
+    return [{
+        'amount': row.get('Amount'),
+        'category': row.get('Category'),
+        'date': row.get('Date'),
+        'type': 'expense',
+        'store_name': row.get('Store Name'),
+        'item': row.get('Item'),
+        'tags': row.get('Tags') or row.get('Item Type') or '',
+        'quantity': row.get('Quantity', 1),
+    } for row in rows]
 
 def update_transactions(transactions):
-    db = Database()
-    updated_count = 0
-    for transaction in transactions:
-        try:
-            st.write(f"Updating transaction: {transaction}")
-            db.add_transaction(
-                amount=float(transaction['Amount']),
-                category=transaction['Category'],
-                date=datetime.strptime(transaction['Date'], '%d-%m-%Y').date(),
-                type='expense',
-                store_name=transaction['Store Name'],
-                item=transaction['Item'],
-                tags=transaction.get('Tags', '').split(','),
-                quantity=parse_quantity(transaction['Quantity'])
-            )
-            updated_count += 1
-        except Exception as e:
-            st.error(f"Error updating transaction: {str(e)}")
+    db = get_database()
+    updated_count, errors = db.add_transactions_bulk(receipt_rows_to_records(transactions))
+    for index, message in errors:
+        st.error(f"Error updating transaction {index + 1}: {message}")
     
     if updated_count > 0:
         st.success(f"Added {updated_count} transactions to the database.")
     else:
         st.warning("No transactions were updated.")
 
+def get_categorizer():
+    # Retrained from the transaction history whenever it changes.
+    db = get_database()
+    if st.session_state.get('categorizer_generation') != db.pool.generation:
+        st.session_state.categorizer = Categorizer.from_database(db)
+        st.session_state.categorizer_generation = db.pool.generation
+    return st.session_state.categorizer
+
+def categorize(items):
+    sources = categorize_items(items, get_categorizer(), ask_model=categorize_with_model)
+    if sources:
+        st.caption("Categories: " + ", ".join(f"{count} {source}" for source, count in sources.most_common()))
+
+def upload_job_count(uploaded_file):
+    if not is_pdf(uploaded_file.name):
+        return 1
+    try:
+        return page_count(uploaded_file.getvalue())
+    except Exception:
+        return 1
+
+def analyze_uploads(uploaded_files, max_workers):
+    # Images and PDF pages are extracted concurrently; the pages of each
+    # PDF are merged back into one receipt afterwards.
+    total = sum(upload_job_count(f) for f in uploaded_files)
+    progress = st.progress(0.0)
+    status = st.container()
+    report = BatchReport()
+    pages = {}
+    try:
+        results = extract_receipts([(f.name, f) for f in uploaded_files], max_workers=max_workers, report=report)
+        for done, result in enumerate(results, start=1):
+            progress.progress(min(done / total, 1.0), text=f"{done}/{total} receipts and pages")
+            if not result.ok:
+                status.error(f"{result.name}: {result.error}")
+                continue
+            extracted, errors = parse_receipt_items(result.response)
+            for index, message in errors:
+                status.warning(f"{result.name}: item {index + 1} skipped, {message}")
+            if not extracted:
+                status.error(f"{result.name}: failed to extract transactions from the receipt.")
+                continue
+            pages.setdefault(result.receipt, {})[result.page or 0] = extracted
+            status.success(f"{result.name}: {len(extracted)} items in {result.seconds:.1f}s")
+    except Exception as e:
+        st.error(f"An error occurred during analysis: {str(e)}")
+        st.error("Please check your API key and internet connection, then try again.")
+
+    transactions = []
+    for receipt, extracted_pages in pages.items():
+        items = merge_receipt_pages([extracted_pages[page] for page in sorted(extracted_pages)])
+        categorize(items)
+        records, normalization = normalize_receipt_records(items)
+        for index, column, value in normalization.failures:
+            status.warning(f"{receipt}: skipped {items[index].get('Item', 'an item')}, unreadable {column} {value!r}.")
+        transactions.extend(records)
+        if len(extracted_pages) > 1:
+            status.info(f"{receipt}: {len(items)} items from {len(extracted_pages)} pages")
+    st.info(report.summary())
+    return transactions
+
+def batch_receipt_analysis():
+    uploaded_files = st.file_uploader("Choose receipt images or PDFs...", type=["jpg", "jpeg", "png", "pdf"],
+                                      accept_multiple_files=True)
+    max_workers = st.slider("Parallel requests", min_value=1, max_value=8, value=4)
+
+    if uploaded_files and st.button(f'Analyze {len(uploaded_files)} Receipts'):
+        transactions = analyze_uploads(uploaded_files, max_workers)
+        if transactions:
+            st.session_state.transactions = transactions
+
 def receipt_analysis_page():
     st.markdown("<h1 style='text-align: center;'>Receipt Analysis</h1>", unsafe_allow_html=True)
+
+    mode = st.radio("Mode", ["Single receipt", "Batch"], horizontal=True)
+    if mode == "Batch":
+        batch_receipt_analysis()
+        uploaded_file = None
+    else:
+        uploaded_file = st.file_uploader("Choose a receipt image or PDF...", type=["jpg", "jpeg", "png", "pdf"])
     
-    uploaded_file = st.file_uploader("Choose a receipt image...", type=["jpg", "jpeg", "png"])
-    
-    if uploaded_file is not None:
+    if uploaded_file is not None and is_pdf(uploaded_file.name):
+        st.caption(f"{uploaded_file.name}: {upload_job_count(uploaded_file)} page(s)")
+        if st.button('Analyze Receipt'):
+            transactions = analyze_uploads([uploaded_file], max_workers=4)
+            if transactions:
+                st.session_state.transactions = transactions
+                st.success("Receipt analyzed successfully!")
+    elif uploaded_file is not None:
         image = Image.open(uploaded_file)
         st.image(image, caption='Uploaded Receipt', use_column_width=True)
         
         if st.button('Analyze Receipt'):
-            with st.spinner('Analyzing receipt...'):
-                try:
-                    azure_response = extract_recipt_info(uploaded_file)
-                    # file_path = 'extracted_data/receipt_07-2024-08.txt'
+            # Items are shown as soon as the model finishes writing each one.
+            table = st.empty()
+            parser = ItemStreamParser()
+            items = []
+            try:
+                with st.spinner('Analyzing receipt...'):
+                    for item in iter_receipt_items(stream_receipt_info(uploaded_file), parser):
+                        items.append(item)
+                        table.dataframe(pd.DataFrame(items))
+                table.empty()
+                for index, message in parser.errors:
+                    st.warning(f"Item {index + 1} skipped: {message}")
+                categorize(items)
+                transactions, normalization = normalize_receipt_records(items)
+                for index, column, value in normalization.failures:
+                    st.warning(f"{items[index].get('Item', 'An item')} skipped: unreadable {column} {value!r}")
 
-                    # with open(file_path, 'r') as file:
-                    #     azure_response = file.read()
-                    transactions = process_receipt(azure_response)
-                    
-                    if transactions:
-                        # Convert quantities and amounts to numeric values, and dates to datetime.date objects
-                        for transaction in transactions:
-                            transaction['Quantity'] = float(parse_quantity(transaction['Quantity']))
-                            transaction['Amount'] = float(parse_quantity(transaction['Amount']))
-                            transaction['Date'] = datetime.strptime(transaction['Date'], '%d-%m-%Y').date()
-                        
-                        st.session_state.transactions = transactions
-                        st.success("Receipt analyzed successfully!")
-                    else:
-                        st.error("Failed to extract transactions from the receipt.")
-                except Exception as e:
-                    st.error(f"An error occurred during analysis: {str(e)}")
-                    st.error("Please check your API key and internet connection, then try again.")
+                if transactions:
+                    st.session_state.transactions = transactions
+                    st.success("Receipt analyzed successfully!")
+                else:
+                    st.error("Failed to extract transactions from the receipt.")
+            except Exception as e:
+                st.error(f"An error occurred during analysis: {str(e)}")
+                st.error("Please check your API key and internet connection, then try again.")
     
     
     if 'transactions' in st.session_state:
@@ -130,7 +187,7 @@ def receipt_analysis_page():
                 "Item Type": st.column_config.TextColumn("Item Type"),
                 "Quantity": st.column_config.NumberColumn("Quantity", min_value=0, format="%.2f"),
                 "Amount": st.column_config.NumberColumn("Amount", min_value=0, format="%.2f"),
-                "Category": st.column_config.SelectboxColumn("Category", options=['Groceries', 'Personal Care', 'Other']),
+                "Category": st.column_config.SelectboxColumn("Category", options=get_database().get_categories()),
                 "Store Name": st.column_config.TextColumn("Store Name"),
                 "Date": st.column_config.DateColumn("Date"),
             },
@@ -138,24 +195,12 @@ def receipt_analysis_page():
         )
         
         if st.button("Update Transactions in Database"):
-            db = Database()
-            updated_count = 0
-            
-            for _, row in edited_df.iterrows():
-                try:
-                    db.add_transaction(
-                        amount=float(row['Amount']),
-                        category=row['Category'],
-                        date=row['Date'],
-                        type='expense',
-                        store_name=row['Store Name'],
-                        item=row['Item'],
-                        item_type=row['Item Type'],
-                        quantity=float(row['Quantity'])
-                    )
-                    updated_count += 1
-                except Exception as e:
-                    st.error(f"Error updating transaction: {str(e)}")
+            db = get_database()
+            updated_count, errors = db.add_transactions_bulk(
+                receipt_rows_to_records(edited_df.to_dict('records'))
+            )
+            for index, message in errors:
+                st.error(f"Error updating transaction {index + 1}: {message}")
             
             if updated_count > 0:
                 st.success(f"Added {updated_count} transactions to the database.")
@@ -0,0 +1,158 @@
+"""Column-wise normalization of extracted receipt lines.
+
+The model returns Quantity and Amount as free text, for example
+"0,334 kg", "2 Stk", "1.19 EUR/kg", "€ 1,29" or "1.234,50". Whole columns
+are parsed at once with pandas string methods. Amounts given per unit are
+multiplied by the quantity, converted to the same unit, to give the line
+total.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Item', 'Item Type', 'Quantity', 'Amount', 'Category', 'Store Name', 'Date']
+
+CURRENCIES = {'€': 'EUR', 'eur': 'EUR', '$': 'USD', 'usd': 'USD', '£': 'GBP', 'gbp': 'GBP',
+              'chf': 'CHF', 'fr': 'CHF'}
+
+# Every unit in terms of a base unit of the same dimension.
+UNITS = {
+    'kg': ('kg', 1.0), 'g': ('kg', 0.001), 'gr': ('kg', 0.001), '100g': ('kg', 0.1),
+    'l': ('l', 1.0), 'ltr': ('l', 1.0), 'ml': ('l', 0.001), '100ml': ('l', 0.1),
+    'stk': ('pc', 1.0), 'st': ('pc', 1.0), 'pc': ('pc', 1.0), 'pcs': ('pc', 1.0), 'x': ('pc', 1.0),
+}
+BASE_UNITS = {unit: base for unit, (base, _) in UNITS.items()}
+UNIT_FACTORS = {unit: factor for unit, (_, factor) in UNITS.items()}
+
+_NUMBER = r'-?\d[\d.,\s]*\d|-?\d'
+_QUANTITY = rf'^\s*(?P<number>{_NUMBER})?\s*(?P<unit>[a-zA-Z]+)?'
+_AMOUNT = (rf'(?P<before>[€$£]|eur|usd|gbp|chf)?\s*(?P<number>{_NUMBER})\s*'
+           r'(?P<after>[€$£]|eur|usd|gbp|chf|fr)?\s*(?:/\s*(?P<per>\d*\s*[a-z]+))?')
+
+
+@dataclass
+class NormalizationReport:
+    rows: int = 0
+    failures: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def failed(self):
+        return len({index for index, _, _ in self.failures})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.rows - self.failed}/{self.rows} lines normalized, {self.failed} failed, "
+                f"{self.rows_per_second:,.0f} lines/s")
+
+
+def parse_numbers(numbers):
+    """Convert number strings with either decimal convention to floats.
+
+    The separator that comes last is the decimal point when both appear
+    ("1.234,50", "1,234.50"); a lone comma is a decimal comma ("0,334"),
+    and a separator that repeats is a thousands separator ("1.234.567").
+    """
+    numbers = numbers.str.replace(r'\s', '', regex=True)
+    values = pd.to_numeric(numbers, errors='coerce').astype(float)
+    # Only numbers with a comma or a repeated separator need more work.
+    rest = numbers[values.isna() & numbers.notna()]
+    if rest.empty:
+        return values
+    last_comma = rest.str.rfind(',')
+    last_dot = rest.str.rfind('.')
+    comma_decimal = (last_comma > last_dot) & (rest.str.count(',') == 1)
+    dot_decimal = (last_dot > last_comma) & (rest.str.count(r'\.') == 1)
+    cleaned = rest.where(~comma_decimal, rest.str.replace('.', '', regex=False).str.replace(',', '.'))
+    cleaned = cleaned.where(comma_decimal | dot_decimal,
+                            cleaned.str.replace('.', '', regex=False).str.replace(',', '', regex=False))
+    cleaned = cleaned.where(~dot_decimal, cleaned.str.replace(',', '', regex=False))
+    values[rest.index] = pd.to_numeric(cleaned, errors='coerce').astype(float)
+    return values
+
+
+def _parse_distinct(column, parse):
+    # Receipt columns repeat the same few strings ("1", "1 Stk", "0.99"),
+    # so each distinct value is parsed once and the results spread back.
+    codes, uniques = pd.factorize(column.astype('string').str.strip().str.lower(), use_na_sentinel=False)
+    parts = parse(pd.Series(uniques, dtype='string'))
+    return tuple(pd.Series(part.to_numpy(dtype=float if pd.api.types.is_float_dtype(part) else object,
+                                         na_value=np.nan)[codes], index=column.index)
+                 for part in parts)
+
+
+def _parse_quantities(values):
+    parts = values.str.extract(_QUANTITY)
+    quantity = parse_numbers(parts['number']).fillna(1.0)
+    factor = parts['unit'].map(UNIT_FACTORS).fillna(1.0).astype(float)
+    return quantity * factor, parts['unit'].map(BASE_UNITS).fillna('pc')
+
+
+def parse_quantities(column):
+    """Return (quantity in its base unit, base unit) columns. Counts
+    without a recognised unit are pieces."""
+    return _parse_distinct(column, _parse_quantities)
+
+
+def _parse_amounts(values):
+    parts = values.str.extract(_AMOUNT)
+    currency = parts['before'].fillna(parts['after']).map(CURRENCIES)
+    per = parts['per'].str.replace(r'\s', '', regex=True)
+    return (parse_numbers(parts['number']), currency, per.map(BASE_UNITS),
+            per.map(UNIT_FACTORS).astype(float))
+
+
+def parse_amounts(column):
+    """Return (amount, currency, per-unit base unit, per-unit factor)
+    columns; the last two are NaN for line totals."""
+    return _parse_distinct(column, _parse_amounts)
+
+
+def normalize_receipt_frame(df):
+    """Normalize a DataFrame of extracted line items in one pass.
+
+    Returns (frame, report). The frame keeps the extraction columns, with
+    Quantity, Amount (the line total) and Date parsed, plus Unit, Unit Price
+    and Currency. Rows whose amount or date cannot be parsed are dropped
+    and listed in report.failures as (row, column, raw value).
+    """
+    started = time.perf_counter()
+    df = df.reindex(columns=list(dict.fromkeys(COLUMNS + list(df.columns))))
+    report = NormalizationReport(rows=len(df))
+
+    quantity, unit = parse_quantities(df['Quantity'])
+    amount, currency, per_unit, per_factor = parse_amounts(df['Amount'])
+    is_unit_price = per_unit.notna()
+    # "0,334 kg" at "1,29 EUR/kg", or "500 g" at "0,99 EUR/100g": express
+    # the quantity in the unit the price is quoted in.
+    same_dimension = is_unit_price & (per_unit == unit)
+    priced_quantity = (quantity / per_factor).where(same_dimension, quantity)
+    line_total = (amount * priced_quantity).where(is_unit_price, amount).round(2)
+    dates = pd.to_datetime(df['Date'].astype('string'), format='%d-%m-%Y', errors='coerce')
+
+    result = df.copy()
+    result['Quantity'] = quantity
+    result['Unit'] = unit
+    result['Amount'] = line_total
+    result['Unit Price'] = amount.where(is_unit_price)
+    result['Currency'] = currency
+    result['Date'] = dates.dt.date
+
+    for name, bad in (('Amount', line_total.isna()), ('Date', dates.isna())):
+        report.failures.extend((index, name, value) for index, value in df.loc[bad, name].items())
+    ok = line_total.notna() & dates.notna()
+    report.seconds = time.perf_counter() - started
+    return result[ok], report
+
+
+def normalize_receipt_records(transactions):
+    """normalize_receipt_frame for a list of item dicts; returns (records,
+    report) with the extraction columns only."""
+    frame, report = normalize_receipt_frame(pd.DataFrame(list(transactions)))
+    frame = frame[COLUMNS].astype(object)
+    return frame.where(frame.notna(), None).to_dict('records'), report
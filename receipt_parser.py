@@ -0,0 +1,202 @@
+import json
+import re
+from collections import Counter
+
+# Characters that can change the parser's state outside strings, and the
+# rest of a string up to its closing quote; everything else is copied in
+# bulk.
+_SPECIAL = re.compile(r'[\[\]{}"]')
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# A whole object without nested brackets, the usual shape of a line item,
+# is matched in one step.
+_FLAT_OBJECT = re.compile(r'\{[^{}\[\]"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}\[\]"]*)*\}', re.DOTALL)
+_SEPARATORS = ' \t\r\n,'
+
+
+class ItemStreamParser:
+    """Incremental parser for the JSON array of line items in a model reply.
+
+    Feed it the reply in chunks of any size; feed() returns each item as
+    soon as its object closes. Text before the array (prose, a ```json
+    fence) and after it is ignored. An item that is not valid JSON is
+    recorded in `errors` as (item index, message) and skipped, so one bad
+    item does not lose the rest of the receipt.
+    """
+
+    SEEK, OPEN, ARRAY, OBJECT, DONE = range(5)
+
+    def __init__(self):
+        self.state = self.SEEK
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.parts = []
+        self.gap = ''
+        self.index = 0
+        self.errors = []
+
+    def _skip_gap(self, text):
+        # Only separators belong between items; anything else is reported.
+        if text.strip(_SEPARATORS):
+            self.errors.append((self.index, f"unexpected text {text.strip(_SEPARATORS)[:40]!r}"))
+            self.index += 1
+
+    def _finish_item(self, raw=None):
+        if raw is None:
+            raw = ''.join(self.parts)
+            self.parts = []
+        index = self.index
+        self.index += 1
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors.append((index, f"invalid JSON: {e.msg} at column {e.colno}"))
+            return None
+        if not isinstance(item, dict):
+            self.errors.append((index, "not an object"))
+            return None
+        return item
+
+    def feed(self, chunk):
+        items = []
+        # position: start of the text not yet copied into parts or gap.
+        # scan: where to look for the next special character.
+        position = 0
+        scan = 1 if self.escape else 0
+        self.escape = False
+        while self.state != self.DONE:
+            if self.in_string:
+                match = _STRING_REST.match(chunk, scan)
+                if match is None:
+                    # The string continues in the next chunk, possibly
+                    # right after a backslash.
+                    tail = chunk[scan:]
+                    self.escape = (len(tail) - len(tail.rstrip('\\'))) % 2 == 1
+                    break
+                scan = match.end()
+                self.in_string = False
+                if self.depth == 0:
+                    # A bare string between items.
+                    self.parts.append(chunk[position:scan])
+                    position = scan
+                    self.state = self.ARRAY
+                    self._finish_item()
+                continue
+
+            match = _SPECIAL.search(chunk, scan)
+            if match is None:
+                break
+            start = match.start()
+            char = match.group()
+            scan = start + 1
+            if self.state == self.OBJECT:
+                if char == '"':
+                    self.in_string = True
+                elif char in '{[':
+                    self.depth += 1
+                elif char in '}]':
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.parts.append(chunk[position:scan])
+                        position = scan
+                        self.state = self.ARRAY
+                        item = self._finish_item()
+                        if item is not None:
+                            items.append(item)
+                continue
+
+            gap = self.gap + chunk[position:start]
+            self.gap = ''
+            position = scan
+            if self.state == self.SEEK:
+                if char == '[':
+                    self.state = self.OPEN
+            elif self.state == self.OPEN:
+                if char == '{' and not gap.strip():
+                    position = scan = self._begin_object(chunk, start, items)
+                elif char == '[':
+                    self.state = self.OPEN
+                else:
+                    # Not an array of objects, e.g. "[1]" or "[see below]".
+                    self.state = self.SEEK
+            elif self.state == self.ARRAY:
+                self._skip_gap(gap)
+                if char == '{':
+                    position = scan = self._begin_object(chunk, start, items)
+                elif char == ']':
+                    self.state = self.DONE
+                elif char == '"':
+                    self.state = self.OBJECT
+                    self.in_string = True
+                    self.depth = 0
+                    self.parts = [char]
+        if self.state == self.OBJECT:
+            self.parts.append(chunk[position:])
+        elif self.state in (self.OPEN, self.ARRAY):
+            self.gap += chunk[position:]
+        return items
+
+    def _begin_object(self, chunk, start, items):
+        """Start the item at chunk[start]; returns where scanning resumes."""
+        flat = _FLAT_OBJECT.match(chunk, start)
+        if flat is not None:
+            self.state = self.ARRAY
+            item = self._finish_item(flat.group())
+            if item is not None:
+                items.append(item)
+            return flat.end()
+        self.state = self.OBJECT
+        self.depth = 1
+        self.parts = ['{']
+        return start + 1
+
+    def close(self):
+        """Call once the reply is complete; records an unterminated item."""
+        if self.state == self.OBJECT:
+            self.errors.append((self.index, "unterminated item (response cut off?)"))
+            self.index += 1
+        elif self.state == self.ARRAY:
+            self._skip_gap(self.gap)
+        self.state = self.DONE
+        self.parts = []
+        self.gap = ''
+
+
+def iter_receipt_items(chunks, parser=None):
+    """Yield line items from an iterable of reply chunks as they complete."""
+    parser = parser or ItemStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
+
+
+def parse_receipt_items(text):
+    """Return (items, errors) for a complete model reply."""
+    parser = ItemStreamParser()
+    items = list(iter_receipt_items([text], parser))
+    return items, parser.errors
+
+
+def process_receipt(receipt_json):
+    items, _ = parse_receipt_items(receipt_json)
+    return items or None
+
+
+def extract_json_array(text):
+    items, _ = parse_receipt_items(text)
+    return items or None
+
+
+def merge_receipt_pages(pages):
+    """Combine the line items extracted from each page of one receipt, in
+    page order. Pages that lack the store name or date (typically every
+    page after the first) take the value most pages agree on."""
+    items = [dict(item) for page in pages for item in page or []]
+    for field in ('Store Name', 'Date'):
+        values = Counter(item[field] for item in items if item.get(field))
+        if values:
+            common = values.most_common(1)[0][0]
+            for item in items:
+                if not item.get(field):
+                    item[field] = common
+    return items
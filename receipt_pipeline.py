@@ -0,0 +1,188 @@
+"""Concurrent receipt extraction for multi-file uploads.
+
+Receipts are sent to the vision model from a bounded thread pool that
+shares one OpenAI client, transient API failures are retried with
+exponential backoff, and results are yielded as soon as each receipt
+finishes so the page can show progress. PDFs are split into pages (see
+pdf_receipts.py) and each page is extracted as its own request.
+"""
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from extraction_cache import extraction_key, get_extraction_cache
+from pdf_receipts import PdfPage, is_pdf, iter_pdf_pages, read_upload
+from vision import (MODEL, RECEIPT_PROMPT, encode_receipt_image, get_client, request_receipt_info,
+                    request_receipt_text_info)
+
+
+def retryable_errors():
+    # openai is imported on first use rather than with this module; see
+    # vision.get_client.
+    import openai
+    return (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+@dataclass
+class ExtractionResult:
+    name: str
+    receipt: str = None
+    page: int = None
+    response: str = None
+    error: str = None
+    attempts: int = 0
+    seconds: float = 0.0
+    cached: bool = False
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class BatchReport:
+    results: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self):
+        return sum(result.ok for result in self.results)
+
+    @property
+    def failed(self):
+        return len(self.results) - self.succeeded
+
+    @property
+    def cache_hits(self):
+        return sum(result.cached for result in self.results)
+
+    @property
+    def retries(self):
+        return sum(max(result.attempts - 1, 0) for result in self.results)
+
+    @property
+    def receipts_per_minute(self):
+        return len(self.results) / self.elapsed * 60 if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.succeeded}/{len(self.results)} receipts extracted in {self.elapsed:.1f}s "
+                f"({self.receipts_per_minute:.1f}/min, {self.cache_hits} from cache, {self.retries} retries, "
+                f"{self.failed} failed)")
+
+
+def prepare_request(uploaded_file):
+    """Return (cache key, function that sends the request with a client)."""
+    if isinstance(uploaded_file, Exception):
+        raise uploaded_file
+    if isinstance(uploaded_file, PdfPage):
+        if uploaded_file.text:
+            text = uploaded_file.text
+            return (extraction_key(text, RECEIPT_PROMPT, MODEL),
+                    lambda client: request_receipt_text_info(client, text))
+        if not uploaded_file.image:
+            raise ValueError("page has no text layer or image")
+        uploaded_file = io.BytesIO(uploaded_file.image)
+    encoded_image = encode_receipt_image(uploaded_file)
+    return (extraction_key(encoded_image, RECEIPT_PROMPT, MODEL),
+            lambda client: request_receipt_info(client, encoded_image))
+
+
+def extract_with_retry(name, uploaded_file, client=None, cache=None, retries=3, backoff=1.0):
+    started = time.perf_counter()
+    result = ExtractionResult(name=name, receipt=name)
+    if isinstance(uploaded_file, PdfPage):
+        result.receipt, result.page = uploaded_file.receipt, uploaded_file.number
+    try:
+        key, send = prepare_request(uploaded_file)
+    except Exception as e:
+        result.error = f"Could not read receipt: {e}"
+        result.seconds = time.perf_counter() - started
+        return result
+
+    if cache is not None:
+        result.response = cache.get(key)
+        if result.response is not None:
+            result.cached = True
+            result.seconds = time.perf_counter() - started
+            return result
+
+    try:
+        # The client's own retries are disabled so only our backoff applies.
+        client = (client or get_client()).with_options(max_retries=0)
+    except ValueError as e:
+        result.error = str(e)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    retryable = retryable_errors()
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        try:
+            result.response = send(client)
+            result.error = None
+            break
+        except retryable as e:
+            result.error = str(e)
+            if attempt < retries:
+                # Full jitter keeps parallel workers from retrying in lockstep.
+                time.sleep(random.uniform(0, backoff * 2 ** attempt))
+        except Exception as e:
+            result.error = str(e)
+            break
+    if result.ok and cache is not None:
+        cache.put(key, result.response)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def expand_uploads(files, max_workers=None):
+    """Yield (name, file-like or PdfPage) jobs, one per image and one per
+    PDF page. A PDF that cannot be read is passed on as its exception so it
+    is reported like any other failed receipt."""
+    for name, uploaded_file in files:
+        if is_pdf(name):
+            try:
+                for page in iter_pdf_pages(name, read_upload(uploaded_file), max_workers):
+                    yield page.name, page
+            except Exception as e:
+                yield name, e
+        else:
+            yield name, uploaded_file
+
+
+def extract_receipts(files, max_workers=4, retries=3, backoff=1.0, report=None, client=None,
+                     cache=None, use_cache=True):
+    """Extract many receipts concurrently, yielding an ExtractionResult for
+    each image or PDF page as it completes.
+
+    files is an iterable of (name, file-like) pairs. PDF pages are queued
+    as soon as they are read, so later pages are still being prepared
+    while earlier ones are extracted, and results that finish meanwhile
+    are yielded between pages rather than after the last one. If a
+    BatchReport is passed in, results and total elapsed time are recorded
+    on it.
+    """
+    if use_cache and cache is None:
+        cache = get_extraction_cache()
+    started = time.perf_counter()
+
+    def finished(future):
+        result = future.result()
+        if report is not None:
+            report.results.append(result)
+            report.elapsed = time.perf_counter() - started
+        return result
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for name, uploaded_file in expand_uploads(files):
+            pending.add(executor.submit(extract_with_retry, name, uploaded_file, client,
+                                        cache if use_cache else None, retries, backoff))
+            done = {future for future in pending if future.done()}
+            pending -= done
+            for future in done:
+                yield finished(future)
+        for future in as_completed(pending):
+            yield finished(future)
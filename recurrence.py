@@ -0,0 +1,189 @@
+"""Recurring calendar entries stored as RRULE-style rules.
+
+A rule such as 'FREQ=MONTHLY;BYMONTHDAY=1' plus a start date describes
+every occurrence, so nothing is stored per occurrence. Rule.occurrences
+expands a rule only inside a date window and starts at the first period
+that can fall in it, so a daily rule started ten years ago costs the same
+to show as one started last week.
+
+Supported parts, a subset of RFC 5545:
+- FREQ=DAILY|WEEKLY|MONTHLY|YEARLY
+- INTERVAL, COUNT, and UNTIL (YYYYMMDD)
+- BYDAY=MO,TU,... for weekly rules (weeks start on Monday)
+- BYMONTHDAY=1..31 or -1..-31 (counted from the month's end) for monthly rules
+
+Dates that do not exist in a period, such as the 31st in April or
+29 February in most years, are skipped as in RFC 5545.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+KINDS = ('note', 'transaction')
+# Largest COUNT accepted for a new rule; see Rule.last_date.
+MAX_COUNT = 10_000
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    start: date
+    interval: int = 1
+    count: int = None
+    until: date = None
+    # Weekday numbers (Monday is 0) for WEEKLY, days of the month for MONTHLY.
+    by_day: tuple = ()
+    by_month_day: tuple = ()
+
+    @classmethod
+    def parse(cls, text, start):
+        """Parse an RRULE string such as 'FREQ=WEEKLY;BYDAY=MO,TH' for a rule
+        starting on start. Raises ValueError for anything unsupported."""
+        parts = {}
+        for part in filter(None, (part.strip() for part in text.upper().removeprefix('RRULE:').split(';'))):
+            name, sep, value = part.partition('=')
+            if not sep or not value:
+                raise ValueError(f"Malformed rule part {part!r}")
+            parts[name] = value
+        unknown = parts.keys() - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY'}
+        if unknown:
+            raise ValueError(f"Unsupported rule parts: {', '.join(sorted(unknown))}")
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+        if 'BYDAY' in parts and freq != 'WEEKLY':
+            raise ValueError("BYDAY is only supported for weekly rules")
+        if 'BYMONTHDAY' in parts and freq != 'MONTHLY':
+            raise ValueError("BYMONTHDAY is only supported for monthly rules")
+        days = [day.strip() for day in parts.get('BYDAY', '').split(',') if day.strip()]
+        if set(days) - set(WEEKDAYS):
+            raise ValueError(f"BYDAY days must be among {','.join(WEEKDAYS)}")
+        by_day = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+        try:
+            interval = int(parts.get('INTERVAL', 1))
+            count = int(parts['COUNT']) if 'COUNT' in parts else None
+            until = datetime.strptime(parts['UNTIL'][:8], '%Y%m%d').date() if 'UNTIL' in parts else None
+            by_month_day = tuple(int(day) for day in parts['BYMONTHDAY'].split(',')) \
+                if 'BYMONTHDAY' in parts else ()
+        except ValueError as e:
+            raise ValueError(f"Invalid rule {text!r}: {e}") from None
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("INTERVAL and COUNT must be positive")
+        if any(day == 0 or abs(day) > 31 for day in by_month_day):
+            raise ValueError("BYMONTHDAY days must be 1..31 or -1..-31")
+        return cls(freq, start, interval, count, until, by_day, by_month_day)
+
+    def _period(self, day):
+        # Index of the period (day, week, month or year) holding day,
+        # counted from the one holding the start date.
+        if self.freq == 'DAILY':
+            return (day - self.start).days
+        if self.freq == 'WEEKLY':
+            return ((day - timedelta(days=day.weekday())) - (self.start - timedelta(days=self.start.weekday()))).days // 7
+        if self.freq == 'MONTHLY':
+            return (day.year - self.start.year) * 12 + day.month - self.start.month
+        return day.year - self.start.year
+
+    def _dates(self, period):
+        # The rule's dates in a period, in order, before the start date and
+        # COUNT are applied.
+        if self.freq == 'DAILY':
+            return [self.start + timedelta(days=period)]
+        if self.freq == 'WEEKLY':
+            monday = self.start - timedelta(days=self.start.weekday()) + timedelta(weeks=period)
+            return [monday + timedelta(days=day) for day in self.by_day or (self.start.weekday(),)]
+        if self.freq == 'MONTHLY':
+            year, month = divmod(self.start.month - 1 + period, 12)
+            year, month = self.start.year + year, month + 1
+            last = calendar.monthrange(year, month)[1]
+            days = {day if day > 0 else last + 1 + day for day in self.by_month_day or (self.start.day,)}
+            return [date(year, month, day) for day in sorted(days) if 1 <= day <= last]
+        try:
+            return [self.start.replace(year=self.start.year + period)]
+        except ValueError:
+            return []
+
+    def _count_before(self, period):
+        # Occurrences in the periods before `period`, a multiple of INTERVAL.
+        if period <= 0:
+            return 0
+        first = sum(day >= self.start for day in self._dates(0))
+        if self.freq in ('DAILY', 'WEEKLY'):
+            return first + (period // self.interval - 1) * len(self._dates(0))
+        # Months and years can skip dates, so they are counted one by one;
+        # ten years of a monthly rule is 120 small steps.
+        return first + sum(len(self._dates(p)) for p in range(self.interval, period, self.interval))
+
+    def occurrences(self, start_date, end_date):
+        """Dates of the rule from start_date to end_date inclusive."""
+        if self.until is not None:
+            end_date = min(end_date, self.until)
+        if end_date < max(start_date, self.start):
+            return []
+        first = self._period(max(start_date, self.start))
+        first -= first % self.interval
+        seen = self._count_before(first) if self.count else 0
+        result = []
+        for period in range(first, self._period(end_date) + 1, self.interval):
+            for day in self._dates(period):
+                if day < self.start:
+                    continue
+                seen += 1
+                if self.count and seen > self.count:
+                    return result
+                if start_date <= day <= end_date:
+                    result.append(day)
+        return result
+
+    def last_date(self):
+        """A date the rule never occurs after (UNTIL, or the last of COUNT
+        occurrences), or None if it never ends. Daily and weekly COUNT rules
+        without BYDAY are computed directly; others are walked to their end,
+        which is meant for saving a rule rather than rendering."""
+        if not self.count:
+            return self.until
+        if self.freq in ('DAILY', 'WEEKLY') and not self.by_day:
+            step = self.interval * (7 if self.freq == 'WEEKLY' else 1)
+            limit = self.until or date.max
+            if limit < self.start:
+                return None
+            steps = min(self.count - 1, (limit - self.start).days // step)
+            return self.start + timedelta(days=steps * step)
+        last, seen, period = None, 0, 0
+        try:
+            while seen < self.count:
+                for day in self._dates(period):
+                    if day < self.start:
+                        continue
+                    if self.until and day > self.until:
+                        return last
+                    seen, last = seen + 1, day
+                    if seen == self.count:
+                        break
+                period += self.interval
+        except (OverflowError, ValueError):
+            # Past date.max.
+            pass
+        return last
+
+
+def create_recurring_rules(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurring_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL DEFAULT 'note',
+            title TEXT NOT NULL,
+            rule TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE,
+            color TEXT DEFAULT '#3DD56D',
+            amount REAL,
+            category TEXT
+        )
+    ''')
+    # end_date is the last occurrence, or NULL for rules that never end, so
+    # the rules active in a month are found without expanding any.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recurring_rules_dates ON recurring_rules (start_date, end_date)')
@@ -0,0 +1,108 @@
+"""Pre-aggregated spending totals kept in step with `transactions`.
+
+daily_totals and monthly_totals hold SUM(amount)/COUNT(*) per
+(day or month, category, type). Triggers on transactions update them on
+every insert, update and delete, so the dashboard and report getters read a
+few rows per day in range instead of aggregating raw transactions.
+"""
+
+ROLLUPS = {
+    # table: (period column, period expression over a transactions row)
+    'daily_totals': ('date', '{row}.date'),
+    'monthly_totals': ('month', "substr({row}.date, 1, 7)"),
+}
+
+
+def _add_row(table, period_column, period, row):
+    return f'''
+        INSERT INTO {table} ({period_column}, category, type, amount, count)
+        VALUES ({period.format(row=row)}, {row}.category, {row}.type, {row}.amount, 1)
+        ON CONFLICT ({period_column}, category, type)
+        DO UPDATE SET amount = amount + excluded.amount, count = count + 1;
+    '''
+
+
+def _remove_row(table, period_column, period, row):
+    return f'''
+        UPDATE {table} SET amount = amount - {row}.amount, count = count - 1
+        WHERE {period_column} = {period.format(row=row)}
+          AND category = {row}.category AND type = {row}.type;
+        DELETE FROM {table}
+        WHERE {period_column} = {period.format(row=row)}
+          AND category = {row}.category AND type = {row}.type AND count <= 0;
+    '''
+
+
+def create_rollups(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            date DATE NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, category, type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, category, type)
+        ) WITHOUT ROWID
+    ''')
+
+    inserts = ''.join(_add_row(table, column, period, 'NEW') for table, (column, period) in ROLLUPS.items())
+    deletes = ''.join(_remove_row(table, column, period, 'OLD') for table, (column, period) in ROLLUPS.items())
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN {inserts} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN {deletes} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transactions_rollup_update
+        AFTER UPDATE OF date, category, type, amount ON transactions
+        BEGIN {deletes} {inserts} END
+    ''')
+    rebuild_rollups(cursor)
+
+
+def _fresh_totals(period, amount='SUM(amount)'):
+    return f'''
+        SELECT {period.format(row='transactions')}, category, type, {amount}, COUNT(*)
+        FROM transactions
+        GROUP BY 1, category, type
+    '''
+
+
+def rebuild_rollups(cursor):
+    """Recompute both rollup tables from transactions."""
+    for table, (column, period) in ROLLUPS.items():
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'''
+            INSERT INTO {table} ({column}, category, type, amount, count)
+            {_fresh_totals(period)}
+        ''')
+
+
+def rollup_drift(cursor, places=6):
+    """Count rollup rows that disagree with a fresh aggregate of transactions."""
+    drift = {}
+    for table, (column, period) in ROLLUPS.items():
+        fresh = _fresh_totals(period, amount=f'ROUND(SUM(amount), {places})')
+        stored = f'SELECT {column}, category, type, ROUND(amount, {places}), count FROM {table}'
+        # Stored rows that are wrong or stale, plus groups with no stored row.
+        cursor.execute(f'''
+            SELECT (SELECT COUNT(*) FROM ({stored} EXCEPT {fresh}))
+                 + (SELECT COUNT(*) FROM (
+                        SELECT {period.format(row='transactions')}, category, type FROM transactions
+                        EXCEPT SELECT {column}, category, type FROM {table}))
+        ''')
+        drift[table] = cursor.fetchone()[0]
+    return drift
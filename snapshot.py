@@ -0,0 +1,182 @@
+"""Columnar Parquet snapshot of the expense database.
+
+transactions, notes and balances are written to Parquet with Arrow types,
+one file per month, in a hive layout the Arrow dataset reader prunes by:
+
+    snapshots/transactions/year=2024/month=3/part-0.parquet
+
+A manifest keeps a fingerprint (row count, sum of ids, sum of amounts) of
+every month. Later snapshots rewrite only the months whose fingerprint
+changed, so appending a new month writes one file. Edits that keep all
+three the same (for example renaming an item) need `full=True`.
+
+read_table returns an Arrow table, and to_frame turns it into a pandas
+DataFrame backed by the same Arrow buffers without copying.
+"""
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_DIRECTORY = 'snapshots'
+MANIFEST = 'manifest.json'
+
+_category = pa.dictionary(pa.int32(), pa.string())
+_partitioning = pa.schema([('year', pa.int32()), ('month', pa.int32())])
+
+# table: (Arrow schema, fingerprint aggregate over the month's rows)
+TABLES = {
+    'transactions': (pa.schema([
+        ('id', pa.int64()), ('date', pa.date32()), ('item', pa.string()), ('tag', pa.string()),
+        ('quantity', pa.float64()), ('category', _category), ('type', _category),
+        ('store_name', pa.string()), ('amount', pa.float64()),
+    ]), 'COUNT(*), TOTAL(id), ROUND(TOTAL(amount), 2)'),
+    'notes': (pa.schema([
+        ('id', pa.int64()), ('date', pa.date32()), ('note', pa.string()), ('color', pa.string()),
+    ]), 'COUNT(*), TOTAL(id), TOTAL(length(note))'),
+    'balances': (pa.schema([
+        ('id', pa.int64()), ('date', pa.date32()), ('amount', pa.float64()),
+    ]), 'COUNT(*), TOTAL(id), ROUND(TOTAL(amount), 2)'),
+}
+
+
+@dataclass
+class SnapshotReport:
+    written: dict = field(default_factory=dict)
+    unchanged: dict = field(default_factory=dict)
+    removed: dict = field(default_factory=dict)
+    rows: int = 0
+    seconds: float = 0.0
+
+    def summary(self):
+        tables = ', '.join(f"{table} {self.written[table]} written/{self.unchanged[table]} unchanged"
+                           for table in TABLES)
+        return f"{self.rows:,} rows in {self.seconds:.2f}s; months: {tables}"
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _partition(directory, table, month):
+    year, number = month.split('-')
+    return os.path.join(directory, table, f'year={int(year)}', f'month={int(number)}')
+
+
+def _month_rows(cursor, table, schema, month):
+    # Dates are read as text and cast by Arrow, which is much faster than
+    # sqlite3's per-row date converter.
+    columns = ', '.join('substr(date, 1, 10)' if name == 'date' else name for name in schema.names)
+    cursor.execute(f'''
+        SELECT {columns} FROM {table}
+        WHERE date >= ? AND date < ?
+        ORDER BY id
+    ''', (f'{month}-01', f'{month}-32'))
+    rows = cursor.fetchall()
+    values = zip(*rows) if rows else [[] for _ in schema]
+    arrays = []
+    for column, value in zip(schema, values):
+        if column.name == 'date':
+            arrays.append(pa.array(value, pa.string()).cast(pa.date32()))
+        elif column.type == _category:
+            arrays.append(pa.array(value, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(value, column.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _state(cursor):
+    # Cheap test of whether a snapshot still matches the database.
+    cursor.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM transactions')
+    return list(cursor.fetchone())
+
+
+def write_snapshot(db, directory=DEFAULT_DIRECTORY, full=False):
+    """Bring the Parquet snapshot in directory up to date with db and
+    return a SnapshotReport."""
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    manifest = {} if full else _load_manifest(directory)
+    report = SnapshotReport()
+    with db.pool.reader() as cursor:
+        for table, (schema, fingerprint) in TABLES.items():
+            cursor.execute(f'''
+                SELECT substr(date, 1, 7) AS month, {fingerprint}
+                FROM {table} GROUP BY month
+            ''')
+            current = {month: list(values) for month, *values in cursor.fetchall() if month}
+            previous = manifest.get(table, {})
+            if full:
+                shutil.rmtree(os.path.join(directory, table), ignore_errors=True)
+            report.written[table] = report.unchanged[table] = report.removed[table] = 0
+
+            for month, values in current.items():
+                if previous.get(month) == values:
+                    report.unchanged[table] += 1
+                    continue
+                path = _partition(directory, table, month)
+                os.makedirs(path, exist_ok=True)
+                rows = _month_rows(cursor, table, schema, month)
+                pq.write_table(rows, os.path.join(path, 'part-0.parquet.tmp'))
+                os.replace(os.path.join(path, 'part-0.parquet.tmp'), os.path.join(path, 'part-0.parquet'))
+                report.written[table] += 1
+                report.rows += rows.num_rows
+
+            for month in previous.keys() - current.keys():
+                shutil.rmtree(_partition(directory, table, month), ignore_errors=True)
+                report.removed[table] += 1
+            manifest[table] = current
+        manifest['state'] = _state(cursor)
+
+    with open(os.path.join(directory, MANIFEST + '.tmp'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(directory, MANIFEST + '.tmp'), os.path.join(directory, MANIFEST))
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def is_current(db, directory=DEFAULT_DIRECTORY):
+    """Whether the snapshot has every transaction in db, judged by the
+    transaction count and highest id."""
+    state = _load_manifest(directory).get('state')
+    with db.pool.reader() as cursor:
+        return state == _state(cursor)
+
+
+def read_table(table, directory=DEFAULT_DIRECTORY, start_date=None, end_date=None, columns=None):
+    """Read a snapshot table as an Arrow table, optionally only the rows
+    dated between start_date and end_date inclusive. Months outside the
+    range are skipped without being opened."""
+    path = os.path.join(directory, table)
+    schema = TABLES[table][0]
+    if not os.path.isdir(path):
+        return schema.empty_table().select(columns or schema.names)
+    dataset = ds.dataset(path, schema=pa.unify_schemas([schema, _partitioning]), format='parquet',
+                         partitioning=ds.partitioning(_partitioning, flavor='hive'))
+    # The year/month terms let the reader skip whole files.
+    year_month = ds.field('year') * 100 + ds.field('month')
+    condition = None
+    for bound, compare in ((start_date, '__ge__'), (end_date, '__le__')):
+        if bound is None:
+            continue
+        bound = bound if isinstance(bound, date) else pd.Timestamp(bound).date()
+        term = (getattr(year_month, compare)(bound.year * 100 + bound.month)
+                & getattr(ds.field('date'), compare)(pa.scalar(bound, pa.date32())))
+        condition = term if condition is None else condition & term
+    return dataset.to_table(columns=columns or schema.names, filter=condition)
+
+
+def to_frame(table):
+    """A pandas DataFrame over the Arrow buffers of table, without a copy."""
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
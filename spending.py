@@ -0,0 +1,66 @@
+"""Running spending totals over any date range.
+
+Daily spending is read once per range from the daily_totals rollup (through
+the cached get_daily_spending) and spread over one slot per calendar day,
+so days without spending are zeros rather than gaps. Cumulative and rolling
+totals are then a NumPy cumsum over that array.
+
+Only expense transactions count as spending, as in the calendar's daily
+spending overlay; income does not lower a day's total.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class SpendingSeries:
+    # One entry per calendar day from start to end inclusive.
+    dates: np.ndarray
+    daily: np.ndarray
+    total: np.ndarray
+
+    def to_frame(self):
+        return pd.DataFrame({'Date': self.dates, 'Amount': self.daily, 'Total': self.total})
+
+
+def _day_range(start_date, end_date):
+    return np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+
+
+def daily_deltas(db, start_date, end_date):
+    """Days from start_date to end_date and the amount spent on each."""
+    days = _day_range(start_date, end_date)
+    frame = db.get_daily_spending(start_date, end_date, columnar=True, type='expense')
+    if not len(days):
+        return days, np.zeros(0)
+    offsets = (frame['Date'].to_numpy().astype('datetime64[D]') - days[0]).astype(np.int64)
+    daily = np.bincount(offsets, weights=frame['Amount'].to_numpy(), minlength=len(days))
+    return days, daily.astype(np.float64, copy=False)
+
+
+def cumulative_spending(db, start_date, end_date):
+    """Running total of spending from start_date, one value per day."""
+    days, daily = daily_deltas(db, start_date, end_date)
+    return SpendingSeries(days, daily, np.cumsum(daily))
+
+
+def month_to_date(db, today=None):
+    today = today or date.today()
+    return cumulative_spending(db, today.replace(day=1), today)
+
+
+def year_to_date(db, today=None):
+    today = today or date.today()
+    return cumulative_spending(db, today.replace(month=1, day=1), today)
+
+
+def rolling_spending(db, start_date, end_date, window=30):
+    """Spending over the `window` days up to and including each day."""
+    # Reading window - 1 extra days keeps the first totals complete.
+    days, daily = daily_deltas(db, start_date - timedelta(days=window - 1), end_date)
+    running = np.concatenate(([0.0], np.cumsum(daily)))
+    total = running[window:] - running[:-window]
+    return SpendingSeries(days[window - 1:], daily[window - 1:], total)
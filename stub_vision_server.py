@@ -0,0 +1,134 @@
+"""Local stand-in for the OpenAI chat-completions endpoint.
+
+Replies to POST /v1/chat/completions with a saved receipt extraction from
+extracted_data/, after an optional delay, and can inject 429/500 errors so
+retries can be exercised offline. --upload-kbps adds the time a request of
+that size would take to upload, so payload size shows up in latency.
+Streaming requests are answered as server-sent events in small pieces,
+--stream-delay seconds apart:
+
+    python stub_vision_server.py --port 8765 --latency 0.5 --fail-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub streamlit run main.py
+"""
+import argparse
+import glob
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def load_responses(pattern='extracted_data/*.txt'):
+    responses = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            responses.append(f.read())
+    return responses or ['[]']
+
+
+def make_handler(responses, latency=0.0, fail_rate=0.0, seed=None, upload_kbps=None, stream_delay=0.0,
+                 stream_chunk=16):
+    next_response = itertools.cycle(responses).__next__
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_stream(self, request, content):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            pieces = [content[i:i + stream_chunk] for i in range(0, len(content), stream_chunk)]
+            for index, piece in enumerate(pieces + [None]):
+                if index:
+                    time.sleep(stream_delay)
+                event = {
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'stub'),
+                    'choices': [{
+                        'index': 0,
+                        'delta': {'content': piece} if piece is not None else {},
+                        'finish_reason': None if piece is not None else 'stop',
+                    }],
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            request = json.loads(body or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+                return
+            time.sleep(latency + (len(body) * 8 / 1000 / upload_kbps if upload_kbps else 0))
+            with lock:
+                fail = rng.random() < fail_rate
+                content = next_response()
+            if fail:
+                status = rng.choice([429, 500])
+                self._send_json(status, {'error': {'message': 'Injected failure', 'type': 'stub', 'code': status}})
+                return
+            if request.get('stream'):
+                self._send_stream(request, content)
+                return
+            self._send_json(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+
+    return StubHandler
+
+
+def start_stub_server(port=0, latency=0.0, fail_rate=0.0, responses=None, seed=None, upload_kbps=None,
+                      stream_delay=0.0):
+    """Start the stub in a background thread. Returns (server, base_url);
+    call server.shutdown() to stop it."""
+    handler = make_handler(responses or load_responses(), latency, fail_rate, seed, upload_kbps, stream_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each reply')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 429/500')
+    parser.add_argument('--upload-kbps', type=float, help='Simulated client upload bandwidth')
+    parser.add_argument('--stream-delay', type=float, default=0.0, help='Seconds between streamed pieces')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.fail_rate, upload_kbps=args.upload_kbps,
+                                         stream_delay=args.stream_delay)
+    print(f"Stub chat-completions endpoint at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Normalized transaction tags.
+
+`transactions.tag` keeps the comma-joined string for display, while `tags`
+and `transaction_tags` form an inverted index from each tag to the
+transactions that carry it, so tag reports are a single indexed GROUP BY.
+"""
+
+
+def split_tags(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    tags = []
+    for tag in value:
+        tag = tag.strip() if isinstance(tag, str) else ''
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def link_tags(cursor, tagged_transactions):
+    """Record the tags of newly inserted transactions.
+
+    tagged_transactions is an iterable of
+    (transaction_id, date, amount, [tag, ...]).
+    """
+    tagged_transactions = [row for row in tagged_transactions if row[3]]
+    names = {tag for *_, tags in tagged_transactions for tag in tags}
+    if not names:
+        return
+    cursor.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(name,) for name in names])
+    cursor.execute('SELECT id, name FROM tags')
+    tag_ids = {name: id for id, name in cursor.fetchall()}
+    cursor.executemany(
+        'INSERT OR IGNORE INTO transaction_tags (transaction_id, tag_id, date, amount) VALUES (?, ?, ?, ?)',
+        [(id, tag_ids[tag], date, amount) for id, date, amount, tags in tagged_transactions for tag in tags]
+    )
+
+
+def create_tag_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    # date and amount are copied from the transaction so tag reports can be
+    # answered from idx_transaction_tags_date alone.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_tags (
+            transaction_id INTEGER NOT NULL REFERENCES transactions (id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            date DATE NOT NULL,
+            amount REAL NOT NULL,
+            PRIMARY KEY (transaction_id, tag_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_tags_tag
+        ON transaction_tags (tag_id, transaction_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transaction_tags_date
+        ON transaction_tags (date, tag_id, amount)
+    ''')
+    # foreign_keys is off by default, so keep links in step explicitly.
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_tags_delete AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM transaction_tags WHERE transaction_id = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transactions_tags_update AFTER UPDATE OF date, amount ON transactions
+        BEGIN
+            UPDATE transaction_tags SET date = NEW.date, amount = NEW.amount
+            WHERE transaction_id = NEW.id;
+        END
+    ''')
+
+    cursor.execute("SELECT id, date, amount, tag FROM transactions WHERE tag IS NOT NULL AND tag != ''")
+    link_tags(cursor, [(id, date, amount, split_tags(tag)) for id, date, amount, tag in cursor.fetchall()])
@@ -0,0 +1,103 @@
+"""SqliteReports and DuckDBReports must build the same report frames."""
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import analytics
+from benchmarks import synthetic_records
+from database import Database
+
+duckdb = pytest.importorskip('duckdb')
+
+TODAY = date.today()
+THIS_MONTH = TODAY.replace(day=1)
+
+
+def months_before(months):
+    # First day of the month `months` before this one.
+    month = THIS_MONTH.month - 1 - months
+    return date(THIS_MONTH.year + month // 12, month % 12 + 1, 1)
+
+
+def month_end(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+# Two years of history with nothing booked five months ago, so ranges can
+# cover empty months inside the data as well as before and after it.
+FIRST_DAY = months_before(24)
+GAP_MONTH = months_before(5)
+RANGES = {
+    'this month': (THIS_MONTH, month_end(THIS_MONTH)),
+    'last 3 months': (months_before(2), month_end(THIS_MONTH)),
+    'last 12 months': (months_before(11), month_end(THIS_MONTH)),
+    'all history': (FIRST_DAY, month_end(THIS_MONTH)),
+    'empty month': (GAP_MONTH, month_end(GAP_MONTH)),
+    'around the empty month': (months_before(6), month_end(months_before(4))),
+    'before any data': (months_before(36), month_end(months_before(30))),
+    'future months': (months_before(-2), month_end(months_before(-4))),
+    'mid-month dates': (months_before(3) + timedelta(days=14), THIS_MONTH + timedelta(days=9)),
+}
+MONTH_COUNTS = [1, 3, 6, 12, 36]
+
+BACKENDS = [
+    pytest.param('duckdb', id='duckdb'),
+    # DuckDB loads its sqlite extension from disk or downloads it.
+    pytest.param('duckdb-sqlite', id='duckdb-sqlite', marks=pytest.mark.duckdb_sqlite_extension),
+]
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db = Database(str(tmp_path_factory.mktemp('analytics') / 'analytics.db'))
+    records = [record for record in synthetic_records(20_000, days=(TODAY - FIRST_DAY).days)
+               if record['date'].replace(day=1) != GAP_MONTH]
+    db.add_transactions_bulk(records)
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope='module')
+def sqlite_reports(db):
+    return analytics.SqliteReports(db)
+
+
+@pytest.fixture(scope='module', params=BACKENDS)
+def duckdb_reports(request, db, tmp_path_factory):
+    if request.param == 'duckdb-sqlite':
+        try:
+            return analytics.DuckDBReports(db, source='sqlite')
+        except duckdb.IOException as e:
+            pytest.skip(f"DuckDB's sqlite extension is not available: {str(e).splitlines()[0]}")
+    return analytics.DuckDBReports(db, directory=str(tmp_path_factory.mktemp('snapshots')))
+
+
+def assert_same_frame(expected, actual):
+    pd.testing.assert_frame_equal(expected, actual, check_names=False, check_freq=False, check_dtype=False,
+                                  check_index_type=False, check_column_type=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('months', MONTH_COUNTS)
+def test_expenses_by_month(sqlite_reports, duckdb_reports, months):
+    assert_same_frame(sqlite_reports.expenses_by_month(months), duckdb_reports.expenses_by_month(months))
+
+
+@pytest.mark.parametrize('report', ['expenses_by_category', 'expenses_by_tag'])
+@pytest.mark.parametrize('period', list(RANGES))
+def test_monthly_pivots(sqlite_reports, duckdb_reports, report, period):
+    start_date, end_date = RANGES[period]
+    expected = getattr(sqlite_reports, report)(start_date, end_date)
+    actual = getattr(duckdb_reports, report)(start_date, end_date)
+    assert_same_frame(expected, actual)
+    if period in ('empty month', 'before any data', 'future months'):
+        assert not actual.to_numpy().any()
+
+
+def test_empty_month_is_a_row_of_zeros(sqlite_reports, duckdb_reports):
+    start_date, end_date = RANGES['around the empty month']
+    for report in ('expenses_by_category', 'expenses_by_tag'):
+        frame = getattr(duckdb_reports, report)(start_date, end_date)
+        assert list(frame.index) == list(pd.date_range(start_date, end_date, freq='MS'))
+        assert not frame.loc[pd.Timestamp(GAP_MONTH)].any()
+        assert frame.drop(index=pd.Timestamp(GAP_MONTH)).to_numpy().sum() > 0
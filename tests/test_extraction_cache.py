@@ -0,0 +1,43 @@
+"""The on-disk extraction cache under concurrent writers."""
+import multiprocessing
+import os
+
+from extraction_cache import ExtractionCache
+
+
+def write_entries(directory, writer):
+    cache = ExtractionCache(directory)
+    for i in range(50):
+        cache.put('shared', f'writer {writer}, response {i}')
+
+
+def test_writers_in_several_processes_do_not_clobber_each_other(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=write_entries, args=(str(tmp_path), writer)) for writer in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert os.listdir(tmp_path) == ['shared.json']
+    assert ExtractionCache(str(tmp_path)).get('shared').endswith('response 49')
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    try:
+        cache.put('key', object())
+    except TypeError:
+        pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_hit_survives_the_entry_being_evicted(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path))
+    cache.put('key', 'response')
+
+    def evicted(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, 'utime', evicted)
+    assert cache.get('key') == 'response'
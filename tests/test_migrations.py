@@ -0,0 +1,64 @@
+"""Schema migrations: each step is atomic and applied exactly once."""
+import multiprocessing
+
+import pytest
+
+import migrations
+from database import Database
+
+
+def open_database(path, barrier):
+    barrier.wait()
+    Database(path).close()
+
+
+def schema_versions(path):
+    db = Database(path)
+    with db.pool.reader() as cursor:
+        cursor.execute('SELECT version FROM schema_version ORDER BY version')
+        versions = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT name, COUNT(*) FROM categories GROUP BY name HAVING COUNT(*) > 1')
+        duplicates = cursor.fetchall()
+    db.close()
+    return versions, duplicates
+
+
+def test_concurrent_first_opens_apply_each_step_once(tmp_path):
+    path = str(tmp_path / 'expenses.db')
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(8)
+    processes = [context.Process(target=open_database, args=(path, barrier)) for _ in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+    assert [process.exitcode for process in processes] == [0] * 8
+    versions, duplicates = schema_versions(path)
+    assert versions == [version for version, _, _ in migrations.MIGRATIONS]
+    assert not duplicates
+
+
+def test_failed_step_leaves_nothing_behind(tmp_path, monkeypatch):
+    path = str(tmp_path / 'expenses.db')
+    Database(path).close()
+
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (id INTEGER PRIMARY KEY)')
+        cursor.execute("INSERT INTO categories (name) VALUES ('Half done')")
+        raise RuntimeError('migration failed')
+
+    next_version = migrations.LATEST_VERSION + 1
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [(next_version, 'broken', broken)])
+    monkeypatch.setattr(migrations, 'LATEST_VERSION', next_version)
+    with pytest.raises(RuntimeError, match='migration failed'):
+        Database(path)
+    monkeypatch.undo()
+
+    db = Database(path)
+    with db.pool.reader() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'")
+        assert cursor.fetchall() == []
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        assert cursor.fetchone()[0] == migrations.LATEST_VERSION
+    assert 'Half done' not in db.get_categories()
+    db.close()
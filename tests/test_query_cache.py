@@ -0,0 +1,67 @@
+"""Cached getters and commits from other connections."""
+from datetime import date
+
+import pytest
+
+import connection_pool
+import database
+from database import Database, get_database
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'expenses.db')
+
+
+def add_expense(db, amount):
+    db.add_transaction(amount, 'Groceries', date(2024, 1, 5), 'expense', 'PENNY', 'Milk', [])
+
+
+def test_cached_getters_run_no_sql_between_checks(path, monkeypatch):
+    monkeypatch.setattr(connection_pool, 'DATA_VERSION_INTERVAL', 3600)
+    db = Database(path)
+    db.get_monthly_spending(2024, 1)
+    before = db.pool_stats()
+    for _ in range(50):
+        db.get_monthly_spending(2024, 1)
+        db.get_categories()
+    after = db.pool_stats()
+    assert after['read_checkouts'] - before['read_checkouts'] == 1  # get_categories, once
+    assert after['version_checks'] == before['version_checks']
+    db.close()
+
+
+def test_commit_from_another_connection_is_seen_after_a_check(path, monkeypatch):
+    monkeypatch.setattr(connection_pool, 'DATA_VERSION_INTERVAL', 3600)
+    a, b = Database(path), Database(path)
+    assert a.get_monthly_spending(2024, 1) == 0
+    add_expense(b, 10)
+    a.pool.check_external_writes()
+    assert a.get_monthly_spending(2024, 1) == 10
+    add_expense(a, 5)
+    b.pool.check_external_writes()
+    assert b.get_monthly_spending(2024, 1) == 15
+    a.close()
+    b.close()
+
+
+def test_commit_from_another_connection_is_seen_after_the_interval(path, monkeypatch):
+    monkeypatch.setattr(connection_pool, 'DATA_VERSION_INTERVAL', 0)
+    a, b = Database(path), Database(path)
+    assert a.get_monthly_spending(2024, 1) == 0
+    add_expense(b, 10)
+    assert a.get_monthly_spending(2024, 1) == 10
+    a.close()
+    b.close()
+
+
+def test_get_database_checks_for_other_processes(path, monkeypatch):
+    monkeypatch.setattr(connection_pool, 'DATA_VERSION_INTERVAL', 3600)
+    monkeypatch.setattr(database, '_shared_databases', {})
+    shared = get_database(path)
+    assert shared.get_monthly_spending(2024, 1) == 0
+    other = Database(path)
+    add_expense(other, 7.5)
+    other.close()
+    assert get_database(path).get_monthly_spending(2024, 1) == 7.5
+    shared.close()
@@ -0,0 +1,145 @@
+"""Every Database getter must find its rows through an index.
+
+Each getter is called with every argument combination the app can pass,
+row and columnar, and each statement it runs is checked with EXPLAIN
+QUERY PLAN.
+"""
+import inspect
+import itertools
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from benchmarks import TAGS, seed_database
+from database import Database
+
+# Lookup tables small enough that scanning them is fine.
+SCAN_ALLOWED_TABLES = {'categories', 'tags', 'recurring_rules'}
+# Getters whose job is to return every row of a table.
+WHOLE_TABLE_GETTERS = {'get_transactions', 'get_dates_with_notes'}
+
+START, END = date.today() - timedelta(days=90), date.today()
+CALLS = {
+    'get_transactions': (),
+    'get_transactions_page': (),
+    'get_stores': (),
+    'get_tags': (),
+    'get_transaction_for_this_month': (),
+    'get_balance': (),
+    'get_loan': (),
+    'get_savings': (),
+    'get_categories': (),
+    'get_item_labels': (),
+    'get_row_hash_counts': ([0, 1, 2], 100),
+    'get_last_transaction_id': (),
+    'get_expenses_by_category': (START, END),
+    'get_cumulative_spending': (END.year, END.month),
+    'get_monthly_spending': (END.year, END.month),
+    'get_notes': (END,),
+    'has_note': (END,),
+    'get_dates_with_notes': (),
+    'get_notes_in_range': (START, END),
+    'get_recurring_rules': (),
+    'get_recurring_occurrences': (END,),
+    'get_expenses_by_month': (3,),
+    'get_expenses_by_category_and_month': (START, END),
+    'get_transactions_with_tags': (START, END),
+    'get_expenses_by_tag': (3,),
+    'get_expenses_by_tag_and_month': (START, END),
+    'get_transactions_by_tag': (TAGS[0],),
+    'get_daily_spending': (START, END),
+}
+PAGE_FILTERS = {'start_date': START, 'end_date': END, 'category': 'Groceries', 'store': 'REWE',
+                'tag': TAGS[0], 'text': 'Item 1', 'after': (END, 10 ** 9)}
+VARIANTS = {
+    'get_transactions_page': [{name: PAGE_FILTERS[name] for name in names}
+                              for size in range(len(PAGE_FILTERS) + 1)
+                              for names in itertools.combinations(PAGE_FILTERS, size)],
+    'get_daily_spending': [{'type': type} for type in (None, 'expense', 'income')],
+}
+
+
+def getter_calls():
+    for name, args in CALLS.items():
+        columnar = 'columnar' in inspect.signature(getattr(Database, name)).parameters
+        for kwargs in VARIANTS.get(name, [{}]):
+            for flag in (False, True) if columnar else (False,):
+                call_kwargs = {**kwargs, 'columnar': True} if flag else kwargs
+                label = ','.join(f'{key}={value}' if key in ('type', 'columnar') else key
+                                 for key, value in call_kwargs.items())
+                yield pytest.param(name, args, call_kwargs, id=f'{name}({label})')
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    seed_database(path, 5_000)
+    db = Database(path)
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope='module')
+def tables(db):
+    with db.pool.reader() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def explain_call(db, name, args, kwargs):
+    """Call one getter and return [(sql, [plan detail])] for each statement
+    it runs through _fetchall, _fetchone or _fetch_frame."""
+    statements = []
+
+    def explained(fetch):
+        def run(query, params=(), *rest):
+            with db.pool.reader() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+                statements.append((' '.join(query.split()), [row[3] for row in cursor.fetchall()]))
+            return fetch(query, params, *rest)
+        return run
+
+    for fetch in ('_fetchall', '_fetchone', '_fetch_frame'):
+        setattr(db, fetch, explained(getattr(db, fetch)))
+    try:
+        # The query cache would skip the statements of an earlier identical call.
+        db.query_cache.clear()
+        getattr(db, name)(*args, **kwargs)
+    finally:
+        for fetch in ('_fetchall', '_fetchone', '_fetch_frame'):
+            delattr(db, fetch)
+    return statements
+
+
+def full_scans(name, query, plan, tables):
+    scans = []
+    for detail in plan:
+        # Scans of materialized subqueries and CTEs are not table scans.
+        match = re.match(r'SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?$', detail)
+        if not match or match.group(1) not in tables or match.group(1) in SCAN_ALLOWED_TABLES:
+            continue
+        if match.group(2) and name in WHOLE_TABLE_GETTERS:
+            continue
+        # A walk in index order that stops at LIMIT reads one page, not the
+        # table: the unfiltered first page, the latest balance, and a text
+        # search, which no index can narrow.
+        if match.group(2) and re.search(r'\bLIMIT (\?|\d+)$', query) and \
+                not any('TEMP B-TREE FOR ORDER BY' in line for line in plan):
+            continue
+        scans.append(detail)
+    return scans
+
+
+def test_every_getter_is_checked():
+    getters = {name for name, _ in inspect.getmembers(Database, inspect.isfunction)
+               if name.startswith(('get_', 'has_'))}
+    assert getters <= set(CALLS), f"not covered by the plan check: {sorted(getters - set(CALLS))}"
+
+
+@pytest.mark.parametrize('name, args, kwargs', list(getter_calls()))
+def test_getter_uses_an_index(db, tables, name, args, kwargs):
+    statements = explain_call(db, name, args, kwargs)
+    failures = [f"{scan} in {query}" for query, plan in statements
+                for scan in full_scans(name, query, plan, tables)]
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,54 @@
+"""Recurring rules: last dates and the COUNT limit."""
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from dateutil.rrule import rrulestr
+
+from benchmarks import random_rule
+from database import Database
+from recurrence import MAX_COUNT, Rule
+
+# Rules with both COUNT and UNTIL are valid here; dateutil warns about them.
+pytestmark = pytest.mark.filterwarnings("ignore:Using both 'count' and 'until':DeprecationWarning")
+
+
+def dateutil_last(text, start):
+    occurrences = list(rrulestr(text, dtstart=datetime.combine(start, datetime.min.time())))
+    return occurrences[-1].date() if occurrences else None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_last_date_matches_dateutil(seed):
+    rng = random.Random(seed)
+    checked = 0
+    while checked < 200:
+        text, start = random_rule(rng)
+        if 'COUNT' not in text:
+            continue
+        assert Rule.parse(text, start).last_date() == dateutil_last(text, start), f"{text} from {start}"
+        checked += 1
+
+
+@pytest.mark.parametrize('text', ['FREQ=DAILY;COUNT=10', 'FREQ=DAILY;INTERVAL=3;COUNT=10;UNTIL=20240115',
+                                  'FREQ=WEEKLY;INTERVAL=2;COUNT=5', 'FREQ=WEEKLY;COUNT=5;UNTIL=20231231'])
+def test_last_date_edge_cases(text):
+    assert Rule.parse(text, date(2024, 1, 3)).last_date() == dateutil_last(text, date(2024, 1, 3))
+
+
+def test_large_counts_are_computed_directly():
+    started = time.perf_counter()
+    assert Rule.parse('FREQ=DAILY;COUNT=100000000', date(2024, 1, 1)).last_date() == date.max
+    fortnights = (date.max - date(2024, 1, 1)).days // 14
+    assert Rule.parse('FREQ=WEEKLY;INTERVAL=2;COUNT=100000000', date(2024, 1, 1)).last_date() == \
+        date(2024, 1, 1) + timedelta(days=14 * fortnights)
+    assert time.perf_counter() - started < 0.1
+
+
+def test_save_rejects_counts_over_the_limit():
+    db = Database(':memory:')
+    db.add_recurring_rule('Rent', f'FREQ=MONTHLY;COUNT={MAX_COUNT}', date(2024, 1, 1))
+    with pytest.raises(ValueError, match='COUNT'):
+        db.add_recurring_rule('Coffee', f'FREQ=DAILY;COUNT={MAX_COUNT + 1}', date(2024, 1, 1))
+    assert len(db.get_recurring_rules()) == 1
@@ -0,0 +1,23 @@
+"""main.py must import within budget and leave page dependencies for later."""
+import statistics
+
+import pytest
+
+from benchmarks import STARTUP_BUDGET_MS, measure_import_main
+
+
+@pytest.fixture(scope='module')
+def startup():
+    return measure_import_main(repeat=5)
+
+
+def test_page_dependencies_are_deferred(startup):
+    _, _, loaded = startup
+    assert not loaded, f"imported at startup but should be deferred: {', '.join(loaded)}"
+
+
+def test_import_main_within_budget(startup):
+    samples, main_children, _ = startup
+    slowest = ', '.join(f"{name} {ms:.0f} ms" for name, ms in sorted(main_children, key=lambda child: -child[1])[:5])
+    assert statistics.median(samples) <= STARTUP_BUDGET_MS, \
+        f"import main took {statistics.median(samples):.0f} ms (runs: {[round(ms) for ms in samples]}); slowest: {slowest}"
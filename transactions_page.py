@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
-from database import Database
+from database import get_database
 from datetime import datetime, timedelta, date
 import calendar
 
+PAGE_SIZE = 100
+
 def transactions_page():
     st.markdown("<h1 style='text-align: center; font-size: 2.5em; font-weight: bold;'>Transactions</h1>", unsafe_allow_html=True)
     
-    db = Database()
+    db = get_database()
     categories = db.get_categories()
     
     category_colors = {
@@ -58,35 +60,52 @@ def transactions_page():
     today = date.today()
     end_date = date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
     start_date = (end_date - timedelta(days=30*time_period)).replace(day=1)
-    
-    transactions = db.get_transactions()
 
-    if not transactions:
-        st.info("No transactions available. Add some transactions to see them here.")
+    col_store, col_tag, col_search = st.columns(3)
+    with col_store:
+        store = st.selectbox("Store", [''] + db.get_stores(), format_func=lambda x: x or 'All stores')
+    with col_tag:
+        tag = st.selectbox("Tag", [''] + db.get_tags(), format_func=lambda x: x or 'All tags')
+    with col_search:
+        search_text = st.text_input("Search items")
+
+    # Filtering happens in SQL; only the pages loaded so far are kept in the
+    # session, and they are dropped whenever a filter or the data changes.
+    filters = dict(start_date=start_date, end_date=end_date, category=selected_category or None,
+                   store=store or None, tag=tag or None, text=search_text or None)
+    window_key = (filters, db.pool.generation)
+    if st.session_state.get('transactions_window_key') != window_key:
+        rows, next_cursor = db.get_transactions_page(**filters, limit=PAGE_SIZE, columnar=True)
+        st.session_state.transactions_window_key = window_key
+        st.session_state.transactions_rows = rows
+        st.session_state.transactions_cursor = next_cursor
+
+    transactions = st.session_state.transactions_rows
+
+    if transactions.empty:
+        st.info(f"No transactions found for the selected period and filters.")
     else:
-        df = pd.DataFrame(transactions, columns=['Item', 'Tags', 'Amount', 'Category', 'Store Name', 'Date'])
-        df['Date'] = pd.to_datetime(df['Date'])
+        df = transactions
+
+        def color_categories(val):
+            return f'background-color: {category_colors.get(val, "#E0E0E0")}'
         
-        # Filter by date range
-        df = df[(df['Date'] >= pd.Timestamp(start_date)) & (df['Date'] <= pd.Timestamp(end_date))]
+        styled_df = df.style.applymap(color_categories, subset=['Category'])
+        styled_df = styled_df.format({'Date': lambda x: x.strftime('%Y-%m-%d')})
         
-        # Filter by selected category
-        if selected_category:
-            df = df[df['Category'] == selected_category]
+        st.dataframe(styled_df, height=600, use_container_width=True)
 
-        if df.empty:
-            st.info(f"No transactions found for the selected period and category.")
-        else:
-            def color_categories(val):
-                return f'background-color: {category_colors.get(val, "#E0E0E0")}'
-            
-            styled_df = df.style.applymap(color_categories, subset=['Category'])
-            styled_df = styled_df.format({'Date': lambda x: x.strftime('%Y-%m-%d')})
-            
-            st.dataframe(styled_df, height=600, use_container_width=True)
+        if st.session_state.transactions_cursor is not None:
+            if st.button(f"Load {PAGE_SIZE} more", use_container_width=True):
+                rows, next_cursor = db.get_transactions_page(
+                    **filters, after=st.session_state.transactions_cursor, limit=PAGE_SIZE, columnar=True
+                )
+                st.session_state.transactions_rows = pd.concat([transactions, rows], ignore_index=True)
+                st.session_state.transactions_cursor = next_cursor
+                st.rerun()
 
-        st.write(f"Current filter: {selected_category if selected_category else 'None'}")
-        st.write(f"Showing transactions from {start_date.strftime('%B %Y')} to {end_date.strftime('%B %Y')}")
+    st.write(f"Current filter: {selected_category if selected_category else 'None'}")
+    st.write(f"Showing {len(transactions)} transactions from {start_date.strftime('%B %Y')} to {end_date.strftime('%B %Y')}")
     
     if 'transactions_updated' in st.session_state and st.session_state.transactions_updated:
         st.success("Transactions have been updated!")
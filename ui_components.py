@@ -67,6 +67,8 @@ def create_sidebar(change_page_callback):
         
         if st.button("Add Transaction", key="sidebar_add_transaction"):
             change_page_callback('add_transaction')
+        if st.button("Import", key="sidebar_import"):
+            change_page_callback('import')
 
 def create_add_transaction_form():
     with st.form("add_transaction", clear_on_submit=True):
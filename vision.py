@@ -1,57 +1,184 @@
 import os
-from openai import OpenAI
+from functools import lru_cache
 import base64
-from PIL import Image
-import io
+import json
+from extraction_cache import extraction_key, get_extraction_cache
+from image_preprocessing import PreprocessOptions, receipt_jpeg_bytes
+from receipt_parser import parse_receipt_items
 
-def extract_recipt_info(uploaded_file):
+MODEL = "gpt-4o"
+
+SYSTEM_PROMPT = "You are an AI assistant that analyzes images and provides detailed descriptions."
+
+CATEGORIES = [
+    'Housing', 'Utilities', 'Transportation', 'Groceries', 'Healthcare', 'Insurance',
+    'Savings and Investments', 'Debt Repayment', 'Personal Care', 'Entertainment and Leisure',
+    'Income', 'Other']
+
+# Categories are assigned locally (categorizer.py); the model only reads
+# the lines.
+RECEIPT_PROMPT = '''Analyze this receipt and extract every purchased line in English.
+      If no date, assign current date.
+      Return the answer in JSON format [{"Item": "Item Name", "Quantity": "X", "Amount": "Y", "Store Name": "Store Name", "Date": "DD-MM-YYYY"}].
+      Do not include any explanations or other text only json.'''
+
+CATEGORY_PROMPT = f'''Categorize each of these receipt items into one of the following Categories = {CATEGORIES}.
+      If an item doesn't clearly fit into any category, assign it to 'Groceries' by default.
+      Item type can be Fruits, dairy, meat, vegetable, fastfood etc etc, These are like sub category.
+      Return the answer in JSON format [{{"Item": "Item Name", "Item Type": "type", "Category": "Category Name"}}].
+      Do not include any explanations or other text only json.'''
+
+@lru_cache(maxsize=1)
+def get_client():
+    # One client per process so its HTTP connection pool is reused across
+    # receipts. OPENAI_BASE_URL, if set, points it at another endpoint
+    # (for example stub_vision_server.py).
     API_KEY = os.environ.get("OPENAI_API_KEY")
     if not API_KEY:
         raise ValueError("OpenAI API key not found in environment variables")
+    # Imported here: openai is slow to import and only needed once a
+    # receipt is actually sent.
+    from openai import OpenAI
+    return OpenAI(api_key=API_KEY)
 
-    client = OpenAI(api_key=API_KEY)
+def encode_receipt_image(uploaded_file, options=None):
+    # Rotated, cropped and downscaled first; see image_preprocessing.py.
+    image_bytes = receipt_jpeg_bytes(uploaded_file, options or PreprocessOptions.from_env())
+    return base64.b64encode(image_bytes).decode('ascii')
 
-    img_byte_arr = io.BytesIO()
-    image = Image.open(uploaded_file)
-    image.save(img_byte_arr, format='JPEG')
-    img_byte_arr = img_byte_arr.getvalue()
+def extract_recipt_info(uploaded_file, cache=None):
+    encoded_image = encode_receipt_image(uploaded_file)
 
-    encoded_image = base64.b64encode(img_byte_arr).decode('ascii')
+    # A receipt we have already extracted with the same prompt and model
+    # is answered from disk without touching the network.
+    if cache is None:
+        cache = get_extraction_cache()
+    key = extraction_key(encoded_image, RECEIPT_PROMPT, MODEL)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
 
+    client = get_client()
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an AI assistant that analyzes images and provides detailed descriptions."
-                },
-                {
-                    "role": "user",
-                    "content": {
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{encoded_image}",
-                            "alt_text": "Receipt image for analysis"
-                        }
-                    }
-                },
-                {
-                    "role": "user",
-                    "content": '''Analyze this receipt and extract transaction details in English. 
-                        Categories = [
-                        'Housing', 'Utilities', 'Transportation', 'Groceries', 'Healthcare', 'Insurance', 
-                        'Savings and Investments', 'Debt Repayment', 'Personal Care', 'Entertainment and Leisure', 
-                        'Income', 'Other']. 
-                        Categorize each item from transaction into one of the following Categories. If an item doesn't clearly fit into any category, assign it to 'Groceries' by default.
-                        Item type can be Fruits, dairy, meat, vegetable, fastfood etc etc, These are like sub category. If no date, assign current date.
-                      Return the answer in JSON format [{"Item": "Item Name","Item Type": "type, "Quantity": "X", "Amount": "Y", "Category": "Category Name", "Store Name": "Store Name", "Date": "DD-MM-YYYY"}].
-                      Do not include any explanations or other text only json.'''
-                }
-            ],
-            max_tokens=800
-        )
-        
-        assistant_response = response.choices[0].message.content
-        return assistant_response
+        response = request_receipt_info(client, encoded_image)
+    except Exception as e:
+        raise Exception(f"Failed to make the request. Error: {e}") from e
+    cache.put(key, response)
+    return response
+
+def stream_receipt_info(uploaded_file, cache=None):
+    """Like extract_recipt_info, but yields the reply in pieces as the
+    model writes it. A cached reply is yielded whole."""
+    encoded_image = encode_receipt_image(uploaded_file)
+    if cache is None:
+        cache = get_extraction_cache()
+    key = extraction_key(encoded_image, RECEIPT_PROMPT, MODEL)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    client = get_client()
+    pieces = []
+    try:
+        for piece in request_receipt_stream(client, encoded_image):
+            pieces.append(piece)
+            yield piece
     except Exception as e:
-        raise Exception(f"Failed to make the request. Error: {e}")
\ No newline at end of file
+        raise Exception(f"Failed to make the request. Error: {e}") from e
+    cache.put(key, ''.join(pieces))
+
+def receipt_messages(encoded_image):
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": {
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{encoded_image}",
+                    "alt_text": "Receipt image for analysis"
+                }
+            }
+        },
+        {
+            "role": "user",
+            "content": RECEIPT_PROMPT
+        }
+    ]
+
+def request_receipt_info(client, encoded_image):
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=receipt_messages(encoded_image),
+        max_tokens=800
+    )
+
+    return response.choices[0].message.content
+
+def request_receipt_stream(client, encoded_image):
+    stream = client.chat.completions.create(
+        model=MODEL,
+        messages=receipt_messages(encoded_image),
+        max_tokens=800,
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def request_receipt_text_info(client, text):
+    # For PDFs with a text layer: the same prompt, without an image.
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"{RECEIPT_PROMPT}\n\nReceipt text:\n{text}"
+            }
+        ],
+        max_tokens=800
+    )
+
+    return response.choices[0].message.content
+
+def request_item_categories(client, item_names):
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"{CATEGORY_PROMPT}\n\nItems:\n{json.dumps(item_names, ensure_ascii=False)}"
+            }
+        ],
+        max_tokens=800
+    )
+
+    return response.choices[0].message.content
+
+def categorize_with_model(item_names, cache=None):
+    """Ask the model for the category and item type of each name; returns
+    {name: (category, item type)} for the names it answered."""
+    if cache is None:
+        cache = get_extraction_cache()
+    payload = json.dumps(item_names, ensure_ascii=False)
+    key = extraction_key(payload, CATEGORY_PROMPT, MODEL)
+    response = cache.get(key)
+    if response is None:
+        response = request_item_categories(get_client(), item_names)
+        cache.put(key, response)
+    answers = {}
+    for item in parse_receipt_items(response)[0]:
+        if item.get('Item') in item_names and item.get('Category') in CATEGORIES:
+            answers[item['Item']] = (item['Category'], item.get('Item Type') or '')
+    return answers